@@ -0,0 +1,57 @@
+"""
+Measures how long importing cml takes. Every measurement runs in a fresh interpreter, so nothing is cached in sys.modules.
+Exits with 1 if the median of a module is over its budget.
+
+    python benchmarks/bench_import.py [--repeat N]
+"""
+import subprocess
+import argparse
+import statistics
+import sys
+import os
+
+# Milliseconds. The lazy modules must not import minecraft_launcher_lib or requests.
+BUDGETS = {
+    "cml": 15,
+    "cml.command": 15,
+    "cml.utils": 30,
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = """
+import time, sys
+start = time.perf_counter()
+import {module}
+end = time.perf_counter()
+heavy = [i for i in ("minecraft_launcher_lib", "requests") if i in sys.modules]
+print((end - start) * 1000, ",".join(heavy))
+"""
+
+
+def measure(module, repeat):
+    times = []
+    heavy = ""
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", MEASURE.format(module=module)], cwd=ROOT, stdout=subprocess.PIPE, check=True)
+        elapsed, _, heavy = result.stdout.decode().strip().partition(" ")
+        times.append(float(elapsed))
+    return times, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    failed = False
+    for module, budget in BUDGETS.items():
+        times, heavy = measure(module, args.repeat)
+        median = statistics.median(times)
+        ok = median <= budget and heavy == ""
+        failed = failed or not ok
+        print(f"{module:<12} median {median:7.2f}ms  min {min(times):7.2f}ms  budget {budget}ms  {'ok' if ok else 'FAIL'}" + (f"  imports {heavy}" if heavy else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
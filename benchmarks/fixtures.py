@@ -0,0 +1,169 @@
+"""
+Synthetic data for the benchmarks. Nothing here needs the internet.
+"""
+import http.server
+import functools
+import threading
+import zipfile
+import hashlib
+import stat
+import json
+import sys
+import os
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _library(group, name, version):
+    artifact_path = f"{group.replace('.', '/')}/{name}/{version}/{name}-{version}.jar"
+    return {
+        "name": f"{group}:{name}:{version}",
+        "downloads": {"artifact": {"path": artifact_path, "sha1": hashlib.sha1(artifact_path.encode()).hexdigest(), "size": 1, "url": "https://libraries.example/" + artifact_path}},
+    }
+
+
+def make_version_tree(minecraft_directory, depth=6, libraries=320, prefix="bench"):
+    """
+    Creates a chain of version jsons where every version inherits from the one before. Returns the ids from the base version to the last one.
+    """
+    base = {
+        "id": f"{prefix}-0",
+        "type": "release",
+        "mainClass": "net.minecraft.client.main.Main",
+        "assets": "bench",
+        "assetIndex": {"id": "bench", "url": "https://assets.example/bench.json", "sha1": "0" * 40, "size": 1},
+        "javaVersion": {"component": "java-runtime-gamma", "majorVersion": 17},
+        "libraries": [_library(f"org.bench.group{i % 12}", f"lib{i}", f"1.{i}") for i in range(libraries)],
+        "logging": {"client": {"argument": "-Dlog4j.configurationFile=${path}", "file": {"id": "client-1.12.xml", "url": "https://logging.example/client.xml", "sha1": "0" * 40, "size": 1}, "type": "log4j2-xml"}},
+        "arguments": {
+            "game": [
+                "--username", "${auth_player_name}", "--version", "${version_name}", "--gameDir", "${game_directory}", "--assetsDir", "${assets_root}",
+                "--assetIndex", "${assets_index_name}", "--uuid", "${auth_uuid}", "--accessToken", "${auth_access_token}", "--versionType", "${version_type}",
+                {"rules": [{"action": "allow", "features": {"is_demo_user": True}}], "value": "--demo"},
+                {"rules": [{"action": "allow", "features": {"has_custom_resolution": True}}], "value": ["--width", "${resolution_width}", "--height", "${resolution_height}"]},
+            ],
+            "jvm": [
+                {"rules": [{"action": "allow", "os": {"name": "osx"}}], "value": ["-XstartOnFirstThread"]},
+                {"rules": [{"action": "allow", "os": {"name": "windows"}}], "value": "-XX:HeapDumpPath=MojangTricksIntelDriversForPerformance_javaw.exe_minecraft.exe.heapdump"},
+                "-Djava.library.path=${natives_directory}", "-Dminecraft.launcher.brand=${launcher_name}", "-Dminecraft.launcher.version=${launcher_version}",
+                "-cp", "${classpath}",
+            ],
+        },
+    }
+    _write_json(os.path.join(minecraft_directory, "versions", base["id"], base["id"] + ".json"), base)
+    for level in range(1, depth):
+        child = {
+            "id": f"{prefix}-{level}",
+            "inheritsFrom": f"{prefix}-{level - 1}",
+            "type": "release",
+            "mainClass": "cpw.mods.bootstraplauncher.BootstrapLauncher",
+            "libraries": [_library(f"net.bench.loader{level}", f"mod{i}", f"{level}.{i}") for i in range(10)],
+            "arguments": {"game": ["--launchTarget", "forgeclient", "--level", str(level)], "jvm": ["-DlibraryDirectory=${library_directory}", f"-Dbench.level={level}"]},
+        }
+        _write_json(os.path.join(minecraft_directory, "versions", child["id"], child["id"] + ".json"), child)
+    return [f"{prefix}-{level}" for level in range(depth)]
+
+
+def make_forge_metadata(builds_per_version=60, vanilla_versions=60):
+    """
+    Returns a maven-metadata.xml like the one of forge with thousands of builds
+    """
+    versions = []
+    for minor in range(vanilla_versions):
+        vanilla = f"1.{minor // 6 + 7}.{minor % 6}"
+        for build in range(builds_per_version):
+            versions.append(f"{vanilla}-{minor}.{build}.0")
+    body = "".join(f"<version>{i}</version>" for i in reversed(versions))
+    return f"<metadata><groupId>net.minecraftforge</groupId><artifactId>forge</artifactId><versioning><release>{versions[-1]}</release><latest>{versions[-1]}</latest><versions>{body}</versions></versioning></metadata>".encode()
+
+
+def make_fabric_game_versions(count=800):
+    return json.dumps([{"version": f"1.{i // 20}.{i % 20}", "stable": i % 3 == 0} for i in range(count)]).encode()
+
+
+def make_data_library_names(count=2000):
+    """
+    Returns the kind of [group:name:version:classifier@ext] values that the data section of an install_profile.json has
+    """
+    names = []
+    for i in range(count):
+        if i % 3 == 0:
+            names.append(f"[net.minecraft:client:1.20.{i % 7}-2023{i:04d}:mappings@txt]")
+        elif i % 3 == 1:
+            names.append(f"[net.minecraftforge:forge:1.20.1-47.{i}:client]")
+        else:
+            names.append(f"[de.oceanlabs.mcp:mcp_config:1.20.1-2023{i:04d}:mappings-merged@txt]")
+    return names
+
+
+STUB_JAVA = """#!{python}
+# Stub java for the benchmarks: java -cp <classpath> <main> [--out FILE] [--in FILE]
+import sys, os
+args = sys.argv[4:]
+if "--in" in args:
+    open(args[args.index("--in") + 1], "rb").close()
+if "--out" in args:
+    out = args[args.index("--out") + 1]
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        f.write(sys.argv[3])
+"""
+
+
+def make_stub_processors(minecraft_directory, work_dir, count=8):
+    """
+    Creates a stub java, a processor jar and an install_profile.json with processors that read each other's outputs.
+    Returns (install profile, path of the stub java).
+    """
+    java_path = os.path.join(work_dir, "java")
+    with open(java_path, "w", encoding="utf-8") as f:
+        f.write(STUB_JAVA.format(python=sys.executable))
+    os.chmod(java_path, os.stat(java_path).st_mode | stat.S_IEXEC)
+    jar_path = os.path.join(minecraft_directory, "libraries", "net", "bench", "processor", "1.0", "processor-1.0.jar")
+    os.makedirs(os.path.dirname(jar_path), exist_ok=True)
+    with zipfile.ZipFile(jar_path, "w") as zf:
+        zf.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\r\nMain-Class: net.bench.Processor\r\n\r\n")
+    processors = []
+    for i in range(count):
+        args = ["--out", "{ROOT}/out" + str(i) + ".txt"]
+        if i >= 2:
+            # Every processor after the first two needs the output of one of them
+            args += ["--in", "{ROOT}/out" + str(i % 2) + ".txt"]
+        processors.append({"jar": "net.bench:processor:1.0", "classpath": [], "args": args})
+    profile = {"minecraft": "bench-0", "data": {"MAPPINGS": {"client": "[net.minecraft:client:1.20.1-20230612:mappings@txt]", "server": ""}}, "processors": processors}
+    return profile, java_path
+
+
+class _Handler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_directory(directory):
+    """
+    Serves a directory on a random local port. Returns (server, base url).
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_Handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_download_files(directory, count=200, size=256 * 1024):
+    """
+    Creates files to download. Returns a list of (name, sha1, size).
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for i in range(count):
+        data = hashlib.sha256(str(i).encode()).digest() * (size // 32)
+        name = f"file{i}.bin"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        files.append((name, hashlib.sha1(data).hexdigest(), len(data)))
+    return files
@@ -0,0 +1,97 @@
+"""
+Timing, memory measurement and baseline comparison for the benchmarks
+"""
+import tracemalloc
+import statistics
+import time
+import json
+import gc
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round((len(values) - 1) * percent / 100)))]
+
+
+def measure(function, repeat=20, warmup=2, setup=None):
+    """
+    Runs function repeat times and returns latency percentiles in milliseconds and the peak of allocated memory in KiB.
+    setup runs before every call and is not timed.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        function()
+    times = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - start) * 1000)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    # Memory is measured in an extra run, because tracemalloc slows everything down
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "repeat": repeat,
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "p50": _percentile(times, 50),
+        "p90": _percentile(times, 90),
+        "p99": _percentile(times, 99),
+        "max": max(times),
+        "peak_kib": peak / 1024,
+    }
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold=0.25):
+    """
+    Compares the p50 latency and the memory peak with the baseline. Returns a list of (benchmark, metric, baseline, current) that got worse by more than threshold.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("p50", "peak_kib"):
+            before = baseline[name].get(metric)
+            if before is None:
+                continue
+            # Tiny values are mostly noise
+            floor = 0.05 if metric == "p50" else 16
+            if result[metric] > max(before, floor) * (1 + threshold):
+                regressions.append((name, metric, before, result[metric]))
+    return regressions
+
+
+def format_table(results, baseline=None):
+    lines = [f"{'benchmark':<34}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak KiB':>11}{'vs base':>9}"]
+    for name, result in results.items():
+        change = ""
+        if baseline is not None and name in baseline and baseline[name]["p50"] > 0:
+            change = f"{(result['p50'] / baseline[name]['p50'] - 1) * 100:+.0f}%"
+        lines.append(f"{name:<34}{result['p50']:>10.3f}{result['p90']:>10.3f}{result['p99']:>10.3f}{result['peak_kib']:>11.1f}{change:>9}")
+        if "extra" in result:
+            lines.append(" " * 4 + ", ".join(f"{key}={value}" for key, value in result["extra"].items()))
+    return "\n".join(lines)
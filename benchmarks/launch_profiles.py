@@ -0,0 +1,143 @@
+"""
+Starts the real client with every launch profile of cml.profiles and records the startup time and the GC pauses.
+It needs an installed version and a display, so it is not part of run.py.
+
+    python benchmarks/launch_profiles.py --version 1.20.1
+    python benchmarks/launch_profiles.py --version 1.20.1 --profiles g1,zgc --runs 3 --duration 120 --output profiles.json
+"""
+import subprocess
+import threading
+import argparse
+import tempfile
+import shutil
+import time
+import sys
+import re
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import harness
+
+# Unified logging of Java 9+, e.g. GC(3) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 3.456ms
+PAUSE_REGEX = re.compile(r"Pause.*?(\d+(?:\.\d+)?)ms\s*$")
+# -XX:+PrintGCApplicationStoppedTime of Java 8
+STOPPED_REGEX = re.compile(r"stopped: (\d+(?:\.\d+)?) seconds")
+
+OPTIONS = {"username": "bench", "uuid": "00000000-0000-0000-0000-000000000000", "token": "0"}
+
+
+def parse_gc_log(path):
+    """
+    Returns the length of every GC pause in the log in milliseconds
+    """
+    pauses = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                match = PAUSE_REGEX.search(line)
+                if match is not None:
+                    pauses.append(float(match.group(1)))
+                    continue
+                match = STOPPED_REGEX.search(line)
+                if match is not None:
+                    pauses.append(float(match.group(1)) * 1000)
+    except OSError:
+        pass
+    return pauses
+
+
+def get_gc_log_arguments(java, log_path):
+    from cml.java import get_java_runtime
+    runtime = get_java_runtime(shutil.which(java) or java)
+    if runtime is not None and runtime["major"] < 9:
+        return ["-Xloggc:" + log_path, "-XX:+PrintGCApplicationStoppedTime"]
+    # Quoted, because the : of a Windows path would end the file name
+    return ['-Xlog:gc*:file="' + log_path + '"']
+
+
+def run_profile(version, minecraft_directory, profile, duration, timeout, work_dir, java=None):
+    """
+    Starts the client once, waits until it is ready, lets it run for duration seconds and stops it
+    """
+    from cml.command import minecraft_command
+    from cml.supervisor import DEFAULT_READY_PATTERN
+    options = dict(OPTIONS, launchProfile=profile)
+    if java is not None:
+        options["executablePath"] = java
+    log_path = os.path.join(work_dir, f"gc-{profile}-{time.time_ns()}.log")
+    java = minecraft_command(version, minecraft_directory, options, False)[0]
+    options["jvmArguments"] = get_gc_log_arguments(java, log_path)
+    command = minecraft_command(version, minecraft_directory, options, False, assemble_natives=True)
+    ready_regex = re.compile(DEFAULT_READY_PATTERN)
+    ready = threading.Event()
+    start = time.monotonic()
+    process = subprocess.Popen(command, cwd=minecraft_directory, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def read_output():
+        for line in iter(process.stdout.readline, b""):
+            if not ready.is_set() and ready_regex.search(line.decode("utf-8", errors="replace")):
+                ready.set()
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    startup = None
+    if ready.wait(timeout):
+        startup = time.monotonic() - start
+        time.sleep(duration)
+    process.terminate()
+    try:
+        process.wait(15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    return {"startup_s": startup, "pauses_ms": parse_gc_log(log_path)}
+
+
+def summarize(runs):
+    startups = [i["startup_s"] for i in runs if i["startup_s"] is not None]
+    pauses = [pause for i in runs for pause in i["pauses_ms"]]
+    return {
+        "runs": len(runs),
+        "failed": len(runs) - len(startups),
+        "startup_p50_s": harness._percentile(startups, 50) if startups else None,
+        "gc_pauses": len(pauses),
+        "gc_total_ms": sum(pauses),
+        "gc_max_ms": max(pauses) if pauses else 0,
+        "gc_p99_ms": harness._percentile(pauses, 99) if pauses else 0,
+    }
+
+
+def main():
+    from cml.utils import get_minecraft_directory
+    from cml.profiles import PROFILES
+    parser = argparse.ArgumentParser(description="Startup time and GC pauses of the cml launch profiles")
+    parser.add_argument("--version", required=True, help="An installed version")
+    parser.add_argument("--minecraft-directory", default=get_minecraft_directory())
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma separated profiles")
+    parser.add_argument("--java", help="The java executable, by default the one that fits the version")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds the client keeps running after it is ready")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for the client to be ready")
+    parser.add_argument("--output", help="Write the results as json")
+    args = parser.parse_args()
+    work_dir = tempfile.mkdtemp(prefix="cml-profiles-")
+    results = {}
+    try:
+        for profile in args.profiles.split(","):
+            runs = [run_profile(args.version, args.minecraft_directory, profile, args.duration, args.timeout, work_dir, args.java) for _ in range(args.runs)]
+            results[profile] = summarize(runs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"{'profile':<14}{'startup s':>11}{'pauses':>8}{'total ms':>10}{'max ms':>9}{'p99 ms':>9}{'failed':>8}")
+    for profile, result in results.items():
+        startup = f"{result['startup_p50_s']:.2f}" if result["startup_p50_s"] is not None else "-"
+        print(f"{profile:<14}{startup:>11}{result['gc_pauses']:>8}{result['gc_total_ms']:>10.1f}{result['gc_max_ms']:>9.2f}{result['gc_p99_ms']:>9.2f}{result['failed']:>8}")
+    if args.output:
+        harness.save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
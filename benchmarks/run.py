@@ -0,0 +1,242 @@
+"""
+Offline benchmarks for the hot paths of cml: building launch commands, forge library paths and processors,
+the forge and fabric version lookups and downloads. Everything runs against synthetic data and a local HTTP server.
+
+    python benchmarks/run.py                              run everything and print a table
+    python benchmarks/run.py --only launch                run the benchmarks whose name starts with launch
+    python benchmarks/run.py --output results.json        store the results
+    python benchmarks/run.py --save-baseline base.json    store the results as baseline
+    python benchmarks/run.py --baseline base.json         compare with a baseline, exits with 1 on a regression
+"""
+import argparse
+import tempfile
+import platform
+import shutil
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+import harness
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+class Context:
+    """
+    The synthetic minecraft directory and the local server that are shared by all benchmarks
+    """
+    def __init__(self, work_dir, quick):
+        self.work_dir = work_dir
+        self.quick = quick
+        self.repeat = 5 if quick else 30
+        self.minecraft_directory = os.path.join(work_dir, "minecraft")
+        self.www = os.path.join(work_dir, "www")
+        os.makedirs(self.www)
+        versions = fixtures.make_version_tree(self.minecraft_directory)
+        # Like forge: one level of inheritsFrom on top of the version with all the libraries
+        self.version = versions[1]
+        self.deep_version = versions[-1]
+        with open(os.path.join(self.www, "forge-maven-metadata.xml"), "wb") as f:
+            f.write(fixtures.make_forge_metadata())
+        with open(os.path.join(self.www, "fabric-game.json"), "wb") as f:
+            f.write(fixtures.make_fabric_game_versions())
+        self.files = fixtures.make_download_files(os.path.join(self.www, "files"), count=40 if quick else 200)
+        self.server, self.base_url = fixtures.serve_directory(self.www)
+
+    def close(self):
+        self.server.shutdown()
+
+
+OPTIONS = {"username": "bench", "uuid": "00000000-0000-0000-0000-000000000000", "token": "token", "executablePath": "java", "jvmArguments": ["-Xmx2G"], "customResolution": True, "resolutionWidth": "1280", "resolutionHeight": "720"}
+
+
+@benchmark("launch.command.cold")
+def bench_launch_cold(ctx):
+    from cml import launch_plan
+    from cml.command import minecraft_command
+    return harness.measure(lambda: minecraft_command(ctx.version, ctx.minecraft_directory, OPTIONS, False), ctx.repeat, setup=lambda: launch_plan.invalidate_launch_plan(ctx.minecraft_directory))
+
+
+@benchmark("launch.command.disk")
+def bench_launch_disk(ctx):
+    from cml import launch_plan
+    from cml.command import minecraft_command
+
+    def setup():
+        with launch_plan._plans_lock:
+            launch_plan._plans.clear()
+
+    return harness.measure(lambda: minecraft_command(ctx.version, ctx.minecraft_directory, OPTIONS, False), ctx.repeat, setup=setup)
+
+
+@benchmark("launch.command.deep_chain")
+def bench_launch_deep_chain(ctx):
+    from cml import launch_plan
+    from cml.command import minecraft_command
+
+    def setup():
+        with launch_plan._plans_lock:
+            launch_plan._plans.clear()
+
+    # Every json of the chain is checked before the cached plan is used
+    result = harness.measure(lambda: minecraft_command(ctx.deep_version, ctx.minecraft_directory, OPTIONS, False), ctx.repeat, setup=setup)
+    result["extra"] = {"chain": ctx.deep_version}
+    return result
+
+
+@benchmark("launch.command.warm")
+def bench_launch_warm(ctx):
+    from cml.command import minecraft_command
+    return harness.measure(lambda: minecraft_command(ctx.version, ctx.minecraft_directory, OPTIONS, False), ctx.repeat * 10)
+
+
+@benchmark("launch.command.argfile")
+def bench_launch_argfile(ctx):
+    from cml.command import minecraft_command
+    options = dict(OPTIONS, argumentFile=True)
+    result = harness.measure(lambda: minecraft_command(ctx.version, ctx.minecraft_directory, options, False), ctx.repeat * 10)
+    # How long the command line is with and without the @argfile
+    result["extra"] = {"argv_bytes": sum(len(i) + 1 for i in minecraft_command(ctx.version, ctx.minecraft_directory, options, False)),
+                       "argv_bytes_inline": sum(len(i) + 1 for i in minecraft_command(ctx.version, ctx.minecraft_directory, OPTIONS, False))}
+    return result
+
+
+@benchmark("forge.data_library_path")
+def bench_data_library_path(ctx):
+    from cml.forge import get_data_library_path
+    names = fixtures.make_data_library_names()
+
+    def run():
+        for name in names:
+            get_data_library_path(name, ctx.minecraft_directory)
+
+    result = harness.measure(run, ctx.repeat)
+    result["extra"] = {"paths": len(names)}
+    return result
+
+
+@benchmark("forge.processor_planning")
+def bench_processor_planning(ctx):
+    from cml import forge
+    profile, java = fixtures.make_stub_processors(ctx.minecraft_directory, ctx.work_dir, count=200)
+    argument_vars = {"ROOT": os.path.join(ctx.work_dir, "root"), "SIDE": "client", "MINECRAFT_JAR": "client.jar"}
+    result = harness.measure(lambda: forge._plan_processors(profile, ctx.minecraft_directory, argument_vars, java), ctx.repeat)
+    result["extra"] = {"processors": len(profile["processors"])}
+    return result
+
+
+@benchmark("forge.processors_run")
+def bench_processors_run(ctx):
+    if platform.system() == "Windows":
+        # The stub java is a script with a shebang
+        return None
+    from cml import forge
+    profile, java = fixtures.make_stub_processors(ctx.minecraft_directory, ctx.work_dir, count=8)
+    result = harness.measure(lambda: forge.forge_processors(profile, ctx.minecraft_directory, "client.lzma", "installer.jar", {}, java=java, max_workers=4), max(3, ctx.repeat // 5), warmup=1)
+    result["extra"] = {"processors": len(profile["processors"])}
+    return result
+
+
+@benchmark("forge.metadata.cold")
+def bench_forge_metadata_cold(ctx):
+    from cml import forge, metadata
+    forge.MAVEN_METADATA_URL = ctx.base_url + "/forge-maven-metadata.xml"
+    result = harness.measure(lambda: forge.find_forge_version("1.12.3"), ctx.repeat, setup=metadata.clear_cache)
+    result["extra"] = {"builds": len(forge.list_forge_versions())}
+    return result
+
+
+@benchmark("forge.lookup")
+def bench_forge_lookup(ctx):
+    from cml import forge
+    forge.MAVEN_METADATA_URL = ctx.base_url + "/forge-maven-metadata.xml"
+    vanilla_versions = [f"1.{minor // 6 + 7}.{minor % 6}" for minor in range(60)]
+
+    def run():
+        for vanilla in vanilla_versions:
+            latest = forge.find_forge_version(vanilla)
+            forge.list_forge_builds(vanilla)
+            forge.is_forge_version_valid(latest)
+
+    return harness.measure(run, ctx.repeat)
+
+
+@benchmark("fabric.lookup")
+def bench_fabric_lookup(ctx):
+    from cml import fabric
+    fabric.FABRIC_MINECARFT_VERSIONS_URL = ctx.base_url + "/fabric-game.json"
+    versions = [f"1.{i // 20}.{i % 20}" for i in range(0, 800, 4)]
+
+    def run():
+        for version in versions:
+            fabric.is_minecraft_version_supported(version)
+        fabric.get_latest_stable_minecraft_version()
+
+    return harness.measure(run, ctx.repeat)
+
+
+@benchmark("download.throughput")
+def bench_download(ctx):
+    from cml.downloader import DownloadTask, download_files
+    target = os.path.join(ctx.work_dir, "downloads")
+    tasks = [DownloadTask(f"{ctx.base_url}/files/{name}", os.path.join(target, name), sha1, size) for name, sha1, size in ctx.files]
+
+    def setup():
+        shutil.rmtree(target, ignore_errors=True)
+
+    result = harness.measure(lambda: download_files(tasks, max_workers=8), max(3, ctx.repeat // 5), warmup=1, setup=setup)
+    total = sum(size for _, _, size in ctx.files)
+    result["extra"] = {"files": len(tasks), "MiB/s": round(total / 1024 / 1024 / (result["p50"] / 1000), 1)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for cml")
+    parser.add_argument("--only", help="Only run benchmarks whose name starts with this")
+    parser.add_argument("--quick", action="store_true", help="Fewer repeats and files")
+    parser.add_argument("--output", help="Write the results as json")
+    parser.add_argument("--baseline", help="Compare with the results in this file")
+    parser.add_argument("--save-baseline", help="Write the results as new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown against the baseline, 0.25 = 25%%")
+    args = parser.parse_args()
+    work_dir = tempfile.mkdtemp(prefix="cml-bench-")
+    # Keep the metadata and java caches away from the real ones
+    os.environ["CML_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    ctx = Context(work_dir, args.quick)
+    results = {}
+    try:
+        for name, function in BENCHMARKS.items():
+            if args.only and not name.startswith(args.only):
+                continue
+            result = function(ctx)
+            if result is not None:
+                results[name] = result
+    finally:
+        ctx.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    baseline = harness.load_results(args.baseline) if args.baseline else None
+    print(harness.format_table(results, baseline))
+    if args.output:
+        harness.save_results(args.output, results)
+    if args.save_baseline:
+        harness.save_results(args.save_baseline, results)
+    if baseline is not None:
+        regressions = harness.compare(results, baseline, args.threshold)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.3f} -> {after:.3f}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,19 @@
-from cml import command,forge,mod,server
+import importlib
+
 __all__=['command','forge','mod','server']
+
+# Submodules are only imported when they are used, so "import cml" stays cheap
+_SUBMODULES = {
+    'command', 'forge', 'mod', 'server', 'utils', 'install', 'fabric', 'java', 'launch_plan', 'downloader',
+    'metadata', 'store', 'registry', 'supervisor', 'verify', 'events', 'natives', 'download', 'aio', 'mirror', 'maven', 'prune', 'profiles',
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('cml.' + name)
+    raise AttributeError(f"module 'cml' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -0,0 +1,697 @@
+"""
+asyncio versions of the downloads, metadata lookups and installs of cml.
+Downloads and metadata requests only run natively on the event loop with aiohttp, which is installed with the aio extra: pip install cml[aio].
+Without it they fall back to the requests based functions in the thread pool.
+"""
+from minecraft_launcher_lib.exceptions import VersionNotFound, UnsupportedVersion, ExternalProgramError
+from minecraft_launcher_lib.helper import get_user_agent, empty
+from minecraft_launcher_lib.types import CallbackDict, FabricMinecraftVersion, FabricLoader
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple, TypeVar, Union
+from cml.downloader import DownloadTask, DownloadError
+from cml.command import MinecraftOptions
+from cml import metadata, downloader, forge, fabric, mod, store, events, mirror, registry, install
+import concurrent.futures
+import functools
+import threading
+import tempfile
+import requests
+import asyncio
+import weakref
+import zipfile
+import random
+import shutil
+import json
+import time
+import os
+
+try:
+    import aiohttp
+except ImportError:
+    # Without aiohttp the requests based functions run in the thread pool
+    aiohttp = None
+
+__all__ = ["set_limits", "get_limits", "run_in_thread", "run_process", "close", "fetch", "fetch_json", "fetch_indexed", "fetch_maven_metadata",
+           "get_all_minecraft_versions", "get_stable_minecraft_versions", "get_latest_minecraft_version", "get_latest_stable_minecraft_version", "is_minecraft_version_supported",
+           "get_all_loader_versions", "get_latest_loader_version", "get_latest_installer_version", "list_forge_versions", "list_forge_builds", "find_forge_version",
+           "is_forge_version_valid", "get_forge_mod", "get_fabric_mod", "query_mods", "count_mods", "download_task", "download_files", "prefetch_version", "get_forge_installer",
+           "forge_processors", "install_forge_version", "install_fabric", "minecraft_command", "start_minecraft"]
+
+T = TypeVar("T")
+
+_DOWNLOAD_ERRORS: Tuple[type, ...] = (requests.RequestException, DownloadError)
+if aiohttp is not None:
+    _DOWNLOAD_ERRORS += (aiohttp.ClientError, asyncio.TimeoutError)
+
+_limits = {
+    # Downloads that run at the same time on one event loop
+    "downloads": 64,
+    # Installer and processor processes that run at the same time on one event loop. Games are not limited.
+    "processes": os.cpu_count() or 1,
+    # Size of the thread pool for the blocking parts, shared by all event loops
+    "threads": 32,
+    # Size of the thread pool for long blocking install steps like checking all files of a version with minecraft_launcher_lib.
+    # They get their own threads, so they never hold up metadata lookups and downloads.
+    "installs": 8,
+}
+# Every write into a part file moves this many bytes to a thread
+WRITE_SIZE = 1024 * 1024
+
+_generation = 0
+_executors: Dict[str, concurrent.futures.ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+_requests_session = None
+
+
+class _LoopState:
+    """
+    Everything that belongs to a single event loop: the semaphores, the aiohttp session and the running metadata requests
+    """
+    def __init__(self) -> None:
+        self.generation = _generation
+        self.downloads = asyncio.Semaphore(_limits["downloads"])
+        self.processes = asyncio.Semaphore(_limits["processes"])
+        self.session: Any = None
+        self.fetching: Dict[str, asyncio.Task] = {}
+
+
+_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+
+def set_limits(downloads: Optional[int] = None, processes: Optional[int] = None, threads: Optional[int] = None, installs: Optional[int] = None) -> None:
+    """
+    Changes how many downloads, processes, threads and blocking install steps are used at the same time. Work that already runs keeps its old limits.
+    """
+    global _generation
+    for key, value in (("downloads", downloads), ("processes", processes), ("threads", threads), ("installs", installs)):
+        if value is not None:
+            if value < 1:
+                raise ValueError(f"{key} must be at least 1")
+            _limits[key] = value
+            with _executor_lock:
+                if key in _executors:
+                    _executors.pop(key).shutdown(wait=False)
+    _generation += 1
+
+
+def get_limits() -> Dict[str, int]:
+    """
+    Returns the current limits
+    """
+    return dict(_limits)
+
+
+def _get_state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None or state.generation != _generation:
+        new_state = _LoopState()
+        if state is not None:
+            new_state.session = state.session
+            new_state.fetching = state.fetching
+        state = _states[loop] = new_state
+    return state
+
+
+def _get_executor(key: str = "threads") -> concurrent.futures.ThreadPoolExecutor:
+    with _executor_lock:
+        if key not in _executors:
+            _executors[key] = concurrent.futures.ThreadPoolExecutor(max_workers=_limits[key], thread_name_prefix="cml-aio" if key == "threads" else "cml-aio-" + key)
+        return _executors[key]
+
+
+async def run_in_thread(function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a blocking function in the shared thread pool. If the caller is cancelled, the function still runs to its end.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), functools.partial(function, *args, **kwargs))
+
+
+async def _run_install_step(function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Same as run_in_thread(), but for the long blocking steps of an install, which have their own thread pool
+    """
+    return await asyncio.get_running_loop().run_in_executor(_get_executor("installs"), functools.partial(function, *args, **kwargs))
+
+
+def _get_session() -> Any:
+    state = _get_state()
+    if state.session is None or state.session.closed:
+        state.session = aiohttp.ClientSession(headers={"user-agent": get_user_agent()}, connector=aiohttp.TCPConnector(limit=_limits["downloads"]))
+    return state.session
+
+
+def _get_requests_session() -> Any:
+    global _requests_session
+    if _requests_session is None:
+        _requests_session = downloader.create_session(_limits["downloads"])
+    return _requests_session
+
+
+async def close() -> None:
+    """
+    Closes the HTTP connections of the running event loop. Call it before the loop is closed.
+    """
+    state = _states.get(asyncio.get_running_loop())
+    if state is not None and state.session is not None:
+        await state.session.close()
+        state.session = None
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _get_timeout() -> Any:
+    return aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+
+
+async def _get_entry(url: str, ttl: float) -> Dict[str, Any]:
+    """
+    Async version of cml.metadata._get_entry(). Only the request is sent here, the cache is handled by the same steps in the thread pool.
+    """
+    if aiohttp is None:
+        return await run_in_thread(metadata._get_entry, url, ttl)
+    steps = metadata._request_steps(url, ttl)
+    done, result = await run_in_thread(metadata._advance, steps)
+    if done:
+        return result
+    request_url, headers = result
+    try:
+        async with _get_session().get(request_url, headers=headers, timeout=_get_timeout()) as r:
+            body = await r.read() if r.status == 200 else None
+            response = (r.status, r.headers, body)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return (await run_in_thread(metadata._advance, steps, error=e))[1]
+    _, result = await run_in_thread(metadata._advance, steps, response)
+    if result is None:
+        raise DownloadError(url, f"server returned {response[0]}", response[0])
+    return result
+
+
+async def _get_entry_once(url: str, ttl: float) -> Dict[str, Any]:
+    """
+    Callers that want the same url at the same time share one request
+    """
+    fetching = _get_state().fetching
+    task = fetching.get(url)
+    if task is None:
+        task = fetching[url] = asyncio.ensure_future(_get_entry(url, ttl))
+        task.add_done_callback(lambda _: fetching.pop(url, None))
+    # A cancelled caller doesn't cancel the request of the others
+    return await asyncio.shield(task)
+
+
+async def fetch(url: str, ttl: float = metadata.DEFAULT_TTL) -> bytes:
+    """
+    Async version of cml.metadata.fetch(). Uses the same cache.
+    """
+    return (await _get_entry_once(url, ttl))["body"]
+
+
+async def fetch_indexed(url: str, builder: Callable[[bytes], T], ttl: float = metadata.DEFAULT_TTL) -> T:
+    """
+    Async version of cml.metadata.fetch_indexed(). The builder runs in the thread pool.
+    """
+    entry = await _get_entry_once(url, ttl)
+    if builder in entry["indexes"]:
+        return entry["indexes"][builder]
+    return await run_in_thread(metadata._get_index, entry, builder)
+
+
+async def fetch_json(url: str, ttl: float = metadata.DEFAULT_TTL) -> Any:
+    """
+    Async version of cml.metadata.fetch_json(). The parsed data is shared, so don't modify it.
+    """
+    return await fetch_indexed(url, json.loads, ttl)
+
+
+async def fetch_maven_metadata(url: str, ttl: float = metadata.DEFAULT_TTL) -> Dict[str, Any]:
+    """
+    Async version of cml.metadata.fetch_maven_metadata()
+    """
+    return await fetch_indexed(url, metadata.parse_maven_metadata, ttl)
+
+
+async def _query(url: str, function: Callable[..., T], *args: Any) -> T:
+    # The metadata is fetched here, so the blocking function of cml only hits the cache
+    await fetch(url)
+    return await run_in_thread(function, *args)
+
+
+async def get_all_minecraft_versions() -> List[FabricMinecraftVersion]:
+    """
+    Returns all available Minecraft Versions for fabric
+    """
+    return await _query(fabric.FABRIC_MINECARFT_VERSIONS_URL, fabric.get_all_minecraft_versions)
+
+
+async def get_stable_minecraft_versions() -> List[str]:
+    """
+    Returns a list which only contains the stable Minecraft versions that supports fabric
+    """
+    return await _query(fabric.FABRIC_MINECARFT_VERSIONS_URL, fabric.get_stable_minecraft_versions)
+
+
+async def get_latest_minecraft_version() -> str:
+    """
+    Returns the latest unstable Minecraft versions that supports fabric. This could be a snapshot.
+    """
+    return await _query(fabric.FABRIC_MINECARFT_VERSIONS_URL, fabric.get_latest_minecraft_version)
+
+
+async def get_latest_stable_minecraft_version() -> str:
+    """
+    Returns the latest stable Minecraft version that supports fabric
+    """
+    return await _query(fabric.FABRIC_MINECARFT_VERSIONS_URL, fabric.get_latest_stable_minecraft_version)
+
+
+async def is_minecraft_version_supported(version: str) -> bool:
+    """
+    Checks if a Minecraft version supported by fabric
+    """
+    return await _query(fabric.FABRIC_MINECARFT_VERSIONS_URL, fabric.is_minecraft_version_supported, version)
+
+
+async def get_all_loader_versions() -> List[FabricLoader]:
+    """
+    Returns all loader versions
+    """
+    return await _query(fabric.FABRIC_LOADER_VERSIONS_URL, fabric.get_all_loader_versions)
+
+
+async def get_latest_loader_version() -> str:
+    """
+    Get the latest loader version
+    """
+    return await _query(fabric.FABRIC_LOADER_VERSIONS_URL, fabric.get_latest_loader_version)
+
+
+async def get_latest_installer_version() -> str:
+    """
+    Returns the latest installer version
+    """
+    return await _query(fabric.FABRIC_INSTALLER_MAVEN_URL, fabric.get_latest_installer_version)
+
+
+async def list_forge_versions() -> List[str]:
+    """
+    Returns a list of all forge versions
+    """
+    return await _query(forge.MAVEN_METADATA_URL, forge.list_forge_versions)
+
+
+async def list_forge_builds(vanilla_version: str) -> List[str]:
+    """
+    Returns all forge versions for the given vanilla version
+    """
+    return await _query(forge.MAVEN_METADATA_URL, forge.list_forge_builds, vanilla_version)
+
+
+async def find_forge_version(version: str) -> Optional[str]:
+    """
+    Find the latest forge version that is compatible to the given vanilla version
+    """
+    return await _query(forge.MAVEN_METADATA_URL, forge.find_forge_version, version)
+
+
+async def is_forge_version_valid(forge_version: str) -> bool:
+    """
+    Checks if a forge version is valid
+    """
+    return await _query(forge.MAVEN_METADATA_URL, forge.is_forge_version_valid, forge_version)
+
+
+async def _prefetch_catalog(catalog_url: Optional[str]) -> None:
+    # Remote catalogs are fetched here, so the blocking functions of cml.mod only hit the cache
+    catalog_url = mod.get_catalog_url(catalog_url)
+    if "://" in catalog_url and not catalog_url.startswith("file:"):
+        await fetch(catalog_url)
+
+
+async def get_forge_mod(catalog_url: Optional[str] = None) -> List[Any]:
+    await _prefetch_catalog(catalog_url)
+    return await run_in_thread(mod.get_forge_mod, catalog_url)
+
+
+async def get_fabric_mod(catalog_url: Optional[str] = None) -> List[Any]:
+    await _prefetch_catalog(catalog_url)
+    return await run_in_thread(mod.get_fabric_mod, catalog_url)
+
+
+async def query_mods(**kwargs: Any) -> List[mod.ModEntry]:
+    """
+    Async version of cml.mod.query_mods(). Takes the same keyword arguments.
+    """
+    if kwargs.get("sync", True):
+        await _prefetch_catalog(kwargs.get("catalog_url"))
+    return await run_in_thread(mod.query_mods, **kwargs)
+
+
+async def count_mods(**kwargs: Any) -> int:
+    """
+    Async version of cml.mod.count_mods(). Takes the same keyword arguments.
+    """
+    if kwargs.get("sync", True):
+        await _prefetch_catalog(kwargs.get("catalog_url"))
+    return await run_in_thread(mod.count_mods, **kwargs)
+
+
+async def _fetch_part(task: DownloadTask, part_path: str) -> str:
+    """
+    Async version of cml.downloader._fetch_part(). The part file is written in the thread pool in blocks of WRITE_SIZE.
+    """
+    writer = downloader._PartWriter(task, part_path)
+    headers = await run_in_thread(writer.get_headers)
+    async with _get_session().get(task.url, headers=headers, timeout=_get_timeout()) as r:
+        stale = await run_in_thread(writer.is_stale, r.status)
+        if stale:
+            sha1 = ""
+        else:
+            sha1 = await _write_part(writer, r)
+    if stale:
+        # The part file is gone, so the file is downloaded from the start
+        return await _fetch_part(task, part_path)
+    return sha1
+
+
+async def _write_part(writer: "downloader._PartWriter", r: Any) -> str:
+    """
+    Writes the body of the response into the part file. Returns its sha1.
+    """
+    try:
+        if await run_in_thread(writer.start, r.status):
+            chunks: List[bytes] = []
+            size = 0
+            async for chunk in r.content.iter_chunked(downloader.CHUNK_SIZE):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= WRITE_SIZE:
+                    await run_in_thread(writer.write, b"".join(chunks))
+                    chunks, size = [], 0
+            if chunks:
+                await run_in_thread(writer.write, b"".join(chunks))
+    finally:
+        sha1 = await run_in_thread(writer.close)
+    return sha1
+
+
+async def _download_task(task: DownloadTask, retries: int, backoff: float, store_directory: Optional[Union[str, os.PathLike]]) -> bool:
+    """
+    Async version of cml.downloader.download_task()
+    """
+    if not await run_in_thread(downloader._needs_download, task, store_directory):
+        return False
+    part_path = task.path + ".part"
+    # The file may come from a mirror
+    source = task._replace(url=mirror.resolve_url(task.url))
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        try:
+            sha1 = await _fetch_part(source, part_path)
+            await run_in_thread(downloader._finish_part, task, part_path, sha1, start, attempt, store_directory)
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+            if not downloader._should_retry(e, attempt, retries):
+                raise
+            await asyncio.sleep(backoff * 2 ** attempt)
+    return True
+
+
+async def download_task(task: DownloadTask, retries: int = 3, backoff: float = 0.5, store_directory: Optional[Union[str, os.PathLike]] = None) -> bool:
+    """
+    Async version of cml.downloader.download_task(). At most the downloads limit of tasks run at the same time on one event loop.
+    """
+    async with _get_state().downloads:
+        if aiohttp is None or mirror.is_local_url(mirror.resolve_url(task.url)):
+            return await run_in_thread(downloader.download_task, task, session=_get_requests_session(), retries=retries, backoff=backoff, store_directory=store_directory)
+        return await _download_task(task, retries, backoff, store_directory)
+
+
+async def download_files(tasks: Iterable[DownloadTask], callback: Optional[CallbackDict] = None, retries: int = 3, store_directory: Optional[Union[str, os.PathLike]] = None) -> int:
+    """
+    Async version of cml.downloader.download_files(). If one task fails, the others are cancelled. Returns the number of downloaded files.
+    """
+    if callback is None:
+        callback = {}
+    # Two tasks for the same file would write the same .part file
+    unique_tasks: List[DownloadTask] = list({os.path.normpath(i.path): i for i in tasks}.values())
+    callback.get("setStatus", empty)(f"Download {len(unique_tasks)} files")
+    callback.get("setMax", empty)(len(unique_tasks))
+    finished = 0
+    downloaded = 0
+
+    async def run(task: DownloadTask) -> None:
+        nonlocal finished, downloaded
+        try:
+            result = await download_task(task, retries=retries, store_directory=store_directory)
+        except _DOWNLOAD_ERRORS:
+            if not task.optional:
+                raise
+            result = False
+        finished += 1
+        if result:
+            downloaded += 1
+        callback.get("setProgress", empty)(finished)
+
+    with events.phase("download", files=len(unique_tasks)) as info:
+        running = [asyncio.ensure_future(run(i)) for i in unique_tasks]
+        try:
+            await asyncio.gather(*running)
+        except BaseException:
+            for i in running:
+                i.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+        finally:
+            info["downloaded"] = downloaded
+    return downloaded
+
+
+async def prefetch_version(versionid: str, minecraft_directory: Union[str, os.PathLike], callback: Optional[CallbackDict] = None, store_directory: Optional[Union[str, os.PathLike]] = None) -> int:
+    """
+    Async version of cml.install.prefetch_version(). Returns the number of downloaded files.
+    """
+    if callback is None:
+        callback = {}
+    callback.get("setStatus", empty)("Resolve " + versionid)
+    with events.phase("resolve", version=versionid) as info:
+        # Only the version jsons and the asset index are downloaded here
+        tasks = await _run_install_step(install.get_version_downloads, versionid, minecraft_directory, session=_get_requests_session())
+        info["files"] = len(tasks)
+    if store_directory is not None:
+        await run_in_thread(store.register_instance, store_directory, minecraft_directory)
+    return await download_files(tasks, callback=callback, store_directory=store_directory)
+
+
+async def _install_version(versionid: str, path: str, callback: CallbackDict, store_directory: Optional[Union[str, os.PathLike]]) -> None:
+    """
+    Replaces minecraft_launcher_lib.install.install_minecraft_version(): the files are downloaded here and cml.install.finish_install() finishes the install
+    """
+    await prefetch_version(versionid, path, callback, store_directory)
+    await _run_install_step(install.finish_install, versionid, path, callback)
+
+
+async def run_process(command: List[str], cwd: Optional[str] = None, capture_output: bool = True, limited: bool = True) -> Tuple[int, Optional[bytes], Optional[bytes]]:
+    """
+    Runs a command and returns (returncode, stdout, stderr). If limited is True, it waits for a free slot of the processes limit.
+    The process is killed when the caller is cancelled.
+    """
+    if limited:
+        async with _get_state().processes:
+            return await _run_process(command, cwd, capture_output)
+    return await _run_process(command, cwd, capture_output)
+
+
+async def _run_process(command: List[str], cwd: Optional[str], capture_output: bool) -> Tuple[int, Optional[bytes], Optional[bytes]]:
+    pipe = asyncio.subprocess.PIPE if capture_output else None
+    process = await asyncio.create_subprocess_exec(*command, cwd=cwd, stdout=pipe, stderr=pipe)
+    try:
+        stdout, stderr = await process.communicate()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await asyncio.shield(process.wait())
+        raise
+    return process.returncode, stdout, stderr
+
+
+async def get_forge_installer(versionid: str, callback: Optional[CallbackDict] = None) -> str:
+    """
+    Async version of cml.forge.get_forge_installer()
+    """
+    if callback is None:
+        callback = {}
+    installer_path = forge._get_installer_path(versionid)
+    if await run_in_thread(zipfile.is_zipfile, installer_path):
+        return installer_path
+    url = forge.FORGE_DOWNLOAD_URL.format(version=versionid)
+    # The maven has a .sha1 next to every file
+    try:
+        sha1 = (await fetch(url + ".sha1")).decode("utf-8", "replace").strip()[:40] or None
+    except _DOWNLOAD_ERRORS:
+        sha1 = None
+    callback.get("setStatus", empty)("Download " + os.path.basename(installer_path))
+    try:
+        await download_task(DownloadTask(url, installer_path, sha1))
+    except DownloadError as e:
+        if e.status_code == 404:
+            raise VersionNotFound(versionid) from None
+        raise
+    return installer_path
+
+
+async def _run_processor(processor: Dict[str, Any]) -> bool:
+    """
+    Async version of cml.forge._run_processor()
+    """
+    command = await run_in_thread(forge._prepare_processor, processor)
+    if command is None:
+        return False
+    start = time.perf_counter()
+    returncode, stdout, stderr = await run_process(command)
+    forge._check_processor(processor, command, start, returncode, stdout, stderr)
+    return True
+
+
+async def forge_processors(data: Dict[str, Any], minecraft_directory: Union[str, os.PathLike], lzma_path: str, installer_path: str, callback: Optional[CallbackDict] = None, java: Optional[str] = None) -> None:
+    """
+    Async version of cml.forge.forge_processors(). Processors that don't depend on each other run at the same time, up to the processes limit.
+    """
+    if callback is None:
+        callback = {}
+    processors, root_path = await run_in_thread(forge._get_processors, data, str(minecraft_directory), lzma_path, installer_path, java)
+    callback.get("setMax", empty)(len(processors))
+    waiting = {pos: set(i["depends"]) for pos, i in enumerate(processors)}
+    running: Dict[asyncio.Future, int] = {}
+    finished = 0
+    try:
+        with events.phase("forge.processors", processors=len(processors)):
+            while waiting or running:
+                for pos in [pos for pos, depends in waiting.items() if len(depends) == 0]:
+                    del waiting[pos]
+                    callback.get("setStatus", empty)("Running processor " + processors[pos]["jar"])
+                    running[asyncio.ensure_future(_run_processor(processors[pos]))] = pos
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    pos = running.pop(future)
+                    # Raises if the processor failed, no new processors are started after that
+                    future.result()
+                    finished += 1
+                    callback.get("setProgress", empty)(finished)
+                    for depends in waiting.values():
+                        depends.discard(pos)
+    finally:
+        for future in running:
+            future.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        if await run_in_thread(os.path.exists, root_path):
+            await run_in_thread(shutil.rmtree, root_path)
+
+
+async def install_forge_version(versionid: str, path: Union[str, os.PathLike], callback: Optional[CallbackDict] = None, java: Optional[str] = None, store_directory: Optional[Union[str, os.PathLike]] = None) -> None:
+    """
+    Async version of cml.forge.install_forge_version(). The callbacks may be called from worker threads.
+    """
+    if callback is None:
+        callback = {}
+    path = str(path)
+    with events.phase("forge.install", version=versionid):
+        with events.phase("forge.installer", version=versionid):
+            installer_path = await get_forge_installer(versionid, callback)
+        version_data, lzma_path = await _run_install_step(forge._read_installer, versionid, path, installer_path)
+        try:
+            with events.phase("resolve", version=version_data["version"]) as info:
+                tasks = await _run_install_step(forge._get_pipeline_downloads, version_data, path, _get_requests_session())
+                info["files"] = len(tasks)
+            await download_files(tasks, callback, store_directory=store_directory)
+            await _run_install_step(install.finish_install, version_data["version"], path, callback)
+            await forge_processors(version_data, path, lzma_path, installer_path, callback, java)
+        finally:
+            await run_in_thread(_remove_file, lzma_path)
+        if store_directory is not None:
+            callback.get("setStatus", empty)("Share files with the store")
+            await _run_install_step(store.dedup_directory, store_directory, path)
+        await run_in_thread(registry.reconcile, path)
+
+
+async def install_fabric(minecraft_version: str, minecraft_directory: Union[str, os.PathLike], loader_version: Optional[str] = None, callback: Optional[CallbackDict] = None, java: Optional[str] = None, store_directory: Optional[Union[str, os.PathLike]] = None) -> None:
+    """
+    Async version of cml.fabric.install_fabric(). The callbacks may be called from worker threads.
+    """
+    if callback is None:
+        callback = {}
+    path = str(minecraft_directory)
+    with events.phase("fabric.install", version=minecraft_version):
+        # Check if the given version exists
+        if not await run_in_thread(install.is_version_valid, minecraft_version, path):
+            raise VersionNotFound(minecraft_version)
+        # Check if the given Minecraft version supported
+        if not await is_minecraft_version_supported(minecraft_version):
+            raise UnsupportedVersion(minecraft_version)
+        if mirror.get_resolver() is not None:
+            # Same as cml.fabric._install_fabric_profile()
+            loader_version = loader_version or await get_latest_loader_version()
+            fabric_minecraft_version = f"fabric-loader-{loader_version}-{minecraft_version}"
+            profile_url = fabric.FABRIC_PROFILE_URL.format(minecraft_version=minecraft_version, loader_version=loader_version)
+            await download_task(DownloadTask(profile_url, os.path.join(path, "versions", fabric_minecraft_version, fabric_minecraft_version + ".json")))
+            await _install_version(fabric_minecraft_version, path, callback, store_directory)
+            await run_in_thread(registry.reconcile, path)
+            return
+        # The Minecraft version is installed while the fabric versions are looked up
+        _, loader_version, installer_version = await asyncio.gather(
+            _install_version(minecraft_version, path, callback, store_directory),
+            get_latest_loader_version() if not loader_version else asyncio.sleep(0, loader_version),
+            get_latest_installer_version(),
+        )
+        installer_path = os.path.join(tempfile.gettempdir(), f"fabric-installer-{random.randrange(100, 10000)}.tmp")
+        try:
+            await download_task(DownloadTask(fabric.FABRIC_INSTALLER_DOWNLOAD_URL.format(version=installer_version), installer_path))
+            callback.get("setStatus", empty)("Running fabric installer")
+            command = fabric._get_installer_command(installer_path, path, minecraft_version, loader_version, java)
+            with events.phase("fabric.installer", loader=loader_version):
+                returncode, stdout, stderr = await run_process(command)
+            if returncode != 0:
+                raise ExternalProgramError(command, stdout, stderr)
+        finally:
+            await run_in_thread(_remove_file, installer_path)
+        # Install all libs of fabric
+        await _install_version(f"fabric-loader-{loader_version}-{minecraft_version}", path, callback, store_directory)
+        if store_directory is not None:
+            callback.get("setStatus", empty)("Share files with the store")
+            await _run_install_step(store.dedup_directory, store_directory, path)
+        await run_in_thread(registry.reconcile, path)
+
+
+async def minecraft_command(version: str, minecraft_directory: Union[str, os.PathLike], options: MinecraftOptions, what_run_minecraft: bool = False, assemble_natives: bool = True) -> Optional[List[str]]:
+    """
+    Async version of cml.command.minecraft_command(). If what_run_minecraft is True, the game is started and awaited.
+    """
+    from cml.command import minecraft_command as build_minecraft_command
+    command = await run_in_thread(build_minecraft_command, version, minecraft_directory, options, False, assemble_natives)
+    if not what_run_minecraft:
+        return command
+    with events.phase("launch.run", version=version) as info:
+        process = await asyncio.create_subprocess_exec(*command)
+        try:
+            await run_in_thread(registry.record_launch, minecraft_directory, version)
+            info["returncode"] = await process.wait()
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await asyncio.shield(process.wait())
+            raise
+    return None
+
+
+async def start_minecraft(version: str, minecraft_directory: Union[str, os.PathLike], options: MinecraftOptions, **kwargs: Any) -> asyncio.subprocess.Process:
+    """
+    Starts the game and returns the process without waiting for it. kwargs are passed to asyncio.create_subprocess_exec().
+    """
+    command = await minecraft_command(version, minecraft_directory, options, assemble_natives=True)
+    process = await asyncio.create_subprocess_exec(*command, **kwargs)
+    await run_in_thread(registry.record_launch, minecraft_directory, version)
+    return process
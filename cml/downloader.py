@@ -0,0 +1,272 @@
+from minecraft_launcher_lib.helper import get_user_agent, empty
+from minecraft_launcher_lib.types import CallbackDict
+from typing import Dict, List, Iterable, NamedTuple, Optional, Union
+from cml import store, events, mirror
+import concurrent.futures
+import threading
+import requests.adapters
+import requests
+import hashlib
+import time
+import os
+
+__all__ = ["DownloadTask", "DownloadError", "InvalidChecksum", "create_session", "download_task", "download_files"]
+
+CHUNK_SIZE = 1024 * 256
+DEFAULT_WORKERS = 16
+
+
+class DownloadTask(NamedTuple):
+    url: str
+    path: str
+    sha1: Optional[str] = None
+    size: Optional[int] = None
+    # Optional files are skipped instead of failing the whole download
+    optional: bool = False
+
+
+class DownloadError(Exception):
+    def __init__(self, url: str, message: str, status_code: Optional[int] = None) -> None:
+        self.url = url
+        self.status_code = status_code
+        super().__init__(f"{url}: {message}")
+
+
+class InvalidChecksum(DownloadError):
+    def __init__(self, url: str, path: str, expected: str, actual: str) -> None:
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+        super().__init__(url, f"sha1 of {path} is {actual}, expected {expected}")
+
+
+def create_session(pool_size: int = DEFAULT_WORKERS) -> requests.Session:
+    """
+    Returns a session that keeps up to pool_size connections per host alive
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["user-agent"] = get_user_agent()
+    return session
+
+
+def _get_file_sha1(path: str, sha1: "hashlib._Hash") -> None:
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if not data:
+                break
+            sha1.update(data)
+
+
+def _is_file_valid(task: DownloadTask) -> bool:
+    """
+    Checks if the file of the task already exists with the right size and sha1
+    """
+    try:
+        size = os.path.getsize(task.path)
+    except OSError:
+        return False
+    if task.size is not None and size != task.size:
+        return False
+    if task.sha1 is None:
+        return True
+    sha1 = hashlib.sha1()
+    _get_file_sha1(task.path, sha1)
+    return sha1.hexdigest() == task.sha1
+
+
+def _copy_part(task: DownloadTask, part_path: str) -> str:
+    """
+    Copies a file of a local mirror into the part file. Returns the sha1 of the part file.
+    """
+    sha1 = hashlib.sha1()
+    try:
+        source = open(mirror.get_local_path(task.url), "rb")
+    except FileNotFoundError:
+        raise DownloadError(task.url, "not found in the mirror", 404) from None
+    with source, open(part_path, "wb") as f:
+        while True:
+            data = source.read(CHUNK_SIZE)
+            if not data:
+                break
+            f.write(data)
+            sha1.update(data)
+    return sha1.hexdigest()
+
+
+class _PartWriter:
+    """
+    Writes a response into a part file, resuming it when it already exists.
+    Shared by _fetch_part() and cml.aio, which only differ in how they read the response.
+    """
+    def __init__(self, task: DownloadTask, part_path: str) -> None:
+        self.task = task
+        self.part_path = part_path
+        self.sha1 = hashlib.sha1()
+        self.file = None
+        self.resumed = False
+
+    def get_headers(self) -> Dict[str, str]:
+        offset = os.path.getsize(self.part_path) if os.path.isfile(self.part_path) else 0
+        self.resumed = offset > 0
+        return {"Range": f"bytes={offset}-"} if self.resumed else {}
+
+    def is_stale(self, status_code: int) -> bool:
+        """
+        A 416 means that the part file is at least as long as the file. Without a sha1 it can't be checked, so it is removed and has to be downloaded again.
+        """
+        if status_code == 416 and self.resumed and self.task.sha1 is None:
+            os.remove(self.part_path)
+            return True
+        return False
+
+    def start(self, status_code: int) -> bool:
+        """
+        Opens the part file for the response. Returns False if the part file is already complete and the body can be ignored.
+        """
+        if status_code == 416 and self.resumed:
+            # The part file is already complete, the sha1 tells if it is right
+            _get_file_sha1(self.part_path, self.sha1)
+            return False
+        if status_code not in (200, 206):
+            raise DownloadError(self.task.url, f"server returned {status_code}", status_code)
+        if status_code == 206:
+            _get_file_sha1(self.part_path, self.sha1)
+        self.file = open(self.part_path, "ab" if status_code == 206 else "wb")
+        return True
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.sha1.update(data)
+
+    def close(self) -> str:
+        """
+        Returns the sha1 of the part file
+        """
+        if self.file is not None:
+            self.file.close()
+        return self.sha1.hexdigest()
+
+
+def _fetch_part(task: DownloadTask, part_path: str, session: requests.Session) -> str:
+    """
+    Downloads the task into the part file, resuming it when it already exists. Returns the sha1 of the part file.
+    """
+    if mirror.is_local_url(task.url):
+        return _copy_part(task, part_path)
+    writer = _PartWriter(task, part_path)
+    with session.get(task.url, stream=True, headers=writer.get_headers(), timeout=30) as r:
+        stale = writer.is_stale(r.status_code)
+        if not stale:
+            try:
+                if writer.start(r.status_code):
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        writer.write(chunk)
+            finally:
+                sha1 = writer.close()
+    if stale:
+        # The part file is gone, so the file is downloaded from the start
+        return _fetch_part(task, part_path, session)
+    return sha1
+
+
+def _needs_download(task: DownloadTask, store_directory: Optional[Union[str, os.PathLike]]) -> bool:
+    """
+    Returns False if the file of the task already exists or could be linked from the store
+    """
+    if _is_file_valid(task):
+        return False
+    if store_directory is not None and task.sha1 is not None and store.link_from_store(store_directory, task.sha1, task.path):
+        return False
+    os.makedirs(os.path.dirname(task.path), exist_ok=True)
+    return True
+
+
+def _finish_part(task: DownloadTask, part_path: str, sha1: str, start: float, attempt: int, store_directory: Optional[Union[str, os.PathLike]]) -> None:
+    """
+    Moves a downloaded part file into place once its sha1 matches
+    """
+    if task.sha1 is not None and sha1 != task.sha1:
+        os.remove(part_path)
+        raise InvalidChecksum(task.url, task.path, task.sha1, sha1)
+    os.replace(part_path, task.path)
+    events.emit("download", url=task.url, bytes=os.path.getsize(task.path), duration=time.perf_counter() - start, retries=attempt)
+    if store_directory is not None and task.sha1 is not None:
+        store.store_file(store_directory, task.path, task.sha1)
+
+
+def _should_retry(error: Exception, attempt: int, retries: int) -> bool:
+    # Client errors like 404 won't go away by retrying
+    return attempt < retries and not 400 <= (getattr(error, "status_code", None) or 0) < 500
+
+
+def download_task(task: DownloadTask, session: Optional[requests.Session] = None, retries: int = 3, backoff: float = 0.5, store_directory: Optional[Union[str, os.PathLike]] = None) -> bool:
+    """
+    Downloads a single task into a .part file and moves it into place once the sha1 matches.
+    If a shared store is given, files are linked from the store and downloaded files are added to it.
+    Returns False if the file already exists and does not need to be downloaded.
+    """
+    if not _needs_download(task, store_directory):
+        return False
+    if session is None:
+        session = create_session(1)
+    part_path = task.path + ".part"
+    # The file may come from a mirror
+    source = task._replace(url=mirror.resolve_url(task.url))
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        try:
+            _finish_part(task, part_path, _fetch_part(source, part_path, session), start, attempt, store_directory)
+            return True
+        except (requests.RequestException, DownloadError) as e:
+            if not _should_retry(e, attempt, retries):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+    return True
+
+
+def download_files(tasks: Iterable[DownloadTask], callback: Optional[CallbackDict] = None, max_workers: int = DEFAULT_WORKERS, session: Optional[requests.Session] = None, retries: int = 3, store_directory: Optional[Union[str, os.PathLike]] = None) -> int:
+    """
+    Downloads all tasks with a pool of threads. The callbacks get the progress over all files. Returns the number of downloaded files.
+    """
+    if callback is None:
+        callback = {}
+    # Two tasks for the same file would write the same .part file
+    unique_tasks: List[DownloadTask] = list({os.path.normpath(i.path): i for i in tasks}.values())
+    if session is None:
+        session = create_session(max_workers)
+    callback.get("setStatus", empty)(f"Download {len(unique_tasks)} files")
+    callback.get("setMax", empty)(len(unique_tasks))
+    lock = threading.Lock()
+    finished = 0
+    downloaded = 0
+
+    def run(task: DownloadTask) -> None:
+        nonlocal finished, downloaded
+        try:
+            result = download_task(task, session=session, retries=retries, store_directory=store_directory)
+        except (requests.RequestException, DownloadError):
+            if not task.optional:
+                raise
+            result = False
+        with lock:
+            finished += 1
+            if result:
+                downloaded += 1
+            callback.get("setProgress", empty)(finished)
+
+    with events.phase("download", files=len(unique_tasks)) as info, concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run, i) for i in unique_tasks]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            info["downloaded"] = downloaded
+    return downloaded
@@ -0,0 +1,155 @@
+from typing import Dict, List, Any, Callable, Iterator, Optional, Union
+import contextlib
+import threading
+import logging
+import json
+import time
+import os
+
+__all__ = ["add_sink", "remove_sink", "emit", "phase", "LoggingSink", "JsonLinesSink", "MetricsRegistry"]
+
+Sink = Callable[[Dict[str, Any]], None]
+
+_sinks: List[Sink] = []
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink: Sink) -> Sink:
+    """
+    Registers a function that receives every event as dict. Returns the sink, so it can be removed later.
+    """
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink: Sink) -> None:
+    """
+    Unregisters a sink
+    """
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def emit(event: str, **data: Any) -> None:
+    """
+    Sends an event to all sinks. Does nothing if there are no sinks.
+    """
+    if len(_sinks) == 0:
+        return
+    record = {"event": event, "time": time.time(), "thread": threading.current_thread().name}
+    record.update(data)
+    with _sinks_lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        sink(record)
+
+
+@contextlib.contextmanager
+def phase(name: str, **data: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Emits phase_start and phase_end around the with block. The yielded dict can be filled with values like files or bytes that end up in phase_end.
+    """
+    info = dict(data)
+    emit("phase_start", phase=name, **data)
+    start = time.perf_counter()
+    try:
+        yield info
+    except BaseException as e:
+        emit("phase_end", phase=name, duration=time.perf_counter() - start, error=type(e).__name__, **info)
+        raise
+    emit("phase_end", phase=name, duration=time.perf_counter() - start, **info)
+
+
+class LoggingSink:
+    """
+    Writes events into a logger
+    """
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO) -> None:
+        self.logger = logger or logging.getLogger("cml")
+        self.level = level
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        details = " ".join(f"{key}={value}" for key, value in record.items() if key not in ("event", "time", "thread"))
+        self.logger.log(self.level, "%s %s", record["event"], details)
+
+
+class JsonLinesSink:
+    """
+    Appends every event as a line of json to a file
+    """
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self.path = str(path)
+        self._lock = threading.Lock()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class MetricsRegistry:
+    """
+    Collects counters and histograms from the events. Every phase gets a histogram of its durations and counters for its numeric values.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, List[float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self.histograms.setdefault(name, []).append(value)
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        event = record["event"]
+        if event == "phase_start":
+            return
+        prefix = record["phase"] if event == "phase_end" else event
+        self.increment(prefix + ".count")
+        if "error" in record:
+            self.increment(prefix + ".errors")
+        for key, value in record.items():
+            if key in ("time", "thread") or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key == "duration":
+                self.observe(prefix + ".duration", value)
+            else:
+                self.increment(prefix + "." + key, value)
+
+    def get_summary(self) -> Dict[str, Any]:
+        """
+        Returns the counters and count, sum, min, max, p50 and p95 of every histogram
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: sorted(values) for name, values in self.histograms.items()}
+        summary: Dict[str, Any] = {"counters": counters, "histograms": {}}
+        for name, values in histograms.items():
+            summary["histograms"][name] = {
+                "count": len(values),
+                "sum": sum(values),
+                "min": values[0],
+                "max": values[-1],
+                "p50": values[int((len(values) - 1) * 0.5)],
+                "p95": values[int((len(values) - 1) * 0.95)],
+            }
+        return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
@@ -1,95 +1,127 @@
-from minecraft_launcher_lib.helper import download_file, get_requests_response_cache, parse_maven_metadata, empty
+from minecraft_launcher_lib.helper import download_file, empty
 from minecraft_launcher_lib.exceptions import VersionNotFound, UnsupportedVersion, ExternalProgramError
 from minecraft_launcher_lib.types import FabricMinecraftVersion, FabricLoader, CallbackDict
 from minecraft_launcher_lib.install import install_minecraft_version
-from typing import List, Optional, Union
-from minecraft_launcher_lib.utils import is_version_valid
+from typing import Dict, List, Any, Optional, Union
+from cml.install import is_version_valid, prefetch_version
+from cml.downloader import DownloadTask, download_task
+from cml.natives import ensure_natives
+from cml import store, metadata, events, mirror, registry
 import subprocess
 import tempfile
 import random
+import json
 import os
 
+FABRIC_MINECARFT_VERSIONS_URL = "https://meta.fabricmc.net/v2/versions/game"
+FABRIC_LOADER_VERSIONS_URL = "https://meta.fabricmc.net/v2/versions/loader"
+FABRIC_INSTALLER_MAVEN_URL = "https://maven.fabricmc.net/net/fabricmc/fabric-installer/maven-metadata.xml"
+FABRIC_INSTALLER_DOWNLOAD_URL = "https://maven.fabricmc.net/net/fabricmc/fabric-installer/{version}/fabric-installer-{version}.jar"
+FABRIC_PROFILE_URL = "https://meta.fabricmc.net/v2/versions/loader/{minecraft_version}/{loader_version}/profile/json"
+
+
+def _build_game_index(content: bytes) -> Dict[str, Any]:
+    """
+    Builds the lookup tables for the fabric game versions
+    """
+    minecraft_versions = json.loads(content)
+    return {
+        "versions": minecraft_versions,
+        "set": frozenset(i["version"] for i in minecraft_versions),
+        "stable": [i["version"] for i in minecraft_versions if i["stable"] is True],
+    }
+
+
+def _get_game_index() -> Dict[str, Any]:
+    return metadata.fetch_indexed(FABRIC_MINECARFT_VERSIONS_URL, _build_game_index)
+
 
 def get_all_minecraft_versions() -> List[FabricMinecraftVersion]:
     """
     Returns all available Minecraft Versions for fabric
     """
-    FABRIC_MINECARFT_VERSIONS_URL = "https://meta.fabricmc.net/v2/versions/game"
-    return get_requests_response_cache(FABRIC_MINECARFT_VERSIONS_URL).json()
+    return list(_get_game_index()["versions"])
 
 
 def get_stable_minecraft_versions() -> List[str]:
     """
     Returns a list which only contains the stable Minecraft versions that supports fabric
     """
-    minecraft_versions = get_all_minecraft_versions()
-    stable_versions = []
-    for i in minecraft_versions:
-        if i["stable"] is True:
-            stable_versions.append(i["version"])
-    return stable_versions
+    return list(_get_game_index()["stable"])
 
 
 def get_latest_minecraft_version() -> str:
     """
     Returns the latest unstable Minecraft versions that supports fabric. This could be a snapshot.
     """
-    minecraft_versions = get_all_minecraft_versions()
-    return minecraft_versions[0]["version"]
+    return _get_game_index()["versions"][0]["version"]
 
 
 def get_latest_stable_minecraft_version() -> str:
     """
     Returns the latest stable Minecraft version that supports fabric
     """
-    stable_versions = get_stable_minecraft_versions()
-    return stable_versions[0]
+    return _get_game_index()["stable"][0]
 
 
 def is_minecraft_version_supported(version: str) -> bool:
     """
     Checks if a Minecraft version supported by fabric
     """
-    minecraft_versions = get_all_minecraft_versions()
-    for i in minecraft_versions:
-        if i["version"] == version:
-            return True
-    return False
+    return version in _get_game_index()["set"]
 
 
 def get_all_loader_versions() -> List[FabricLoader]:
     """
     Returns all loader versions
     """
-    FABRIC_LOADER_VERSIONS_URL = "https://meta.fabricmc.net/v2/versions/loader"
-    return get_requests_response_cache(FABRIC_LOADER_VERSIONS_URL).json()
+    return list(metadata.fetch_json(FABRIC_LOADER_VERSIONS_URL))
 
 
 def get_latest_loader_version() -> str:
     """
     Get the latest loader version
     """
-    loader_versions = get_all_loader_versions()
-    return loader_versions[0]["version"]
+    return metadata.fetch_json(FABRIC_LOADER_VERSIONS_URL)[0]["version"]
 
 
 def get_latest_installer_version() -> str:
     """
     Returns the latest installer version
     """
-    FABRIC_INSTALLER_MAVEN_URL = "https://maven.fabricmc.net/net/fabricmc/fabric-installer/maven-metadata.xml"
-    return parse_maven_metadata(FABRIC_INSTALLER_MAVEN_URL)["latest"]
+    return metadata.fetch_maven_metadata(FABRIC_INSTALLER_MAVEN_URL)["latest"]
+
+
+def _get_installer_command(installer_path: str, path: str, minecraft_version: str, loader_version: str, java: Optional[str]) -> List[str]:
+    # See https://fabricmc.net/wiki/install#cli_installation
+    return [java or "java", "-jar", installer_path, "client", "-dir", path, "-mcversion", minecraft_version, "-loader", loader_version, "-noprofile", "-snapshot"]
+
+
+def _install_fabric_profile(minecraft_version: str, path: str, loader_version: str, callback: CallbackDict, store_directory: Optional[Union[str, os.PathLike]]) -> None:
+    """
+    Installs fabric from the version json that fabric-meta provides. The installer would download from the internet itself, so this is used with a mirror.
+    """
+    fabric_minecraft_version = f"fabric-loader-{loader_version}-{minecraft_version}"
+    profile_url = FABRIC_PROFILE_URL.format(minecraft_version=minecraft_version, loader_version=loader_version)
+    download_task(DownloadTask(profile_url, os.path.join(path, "versions", fabric_minecraft_version, fabric_minecraft_version + ".json")))
+    prefetch_version(fabric_minecraft_version, path, callback=callback, store_directory=store_directory)
+    ensure_natives(fabric_minecraft_version, path)
 
 
-def install_fabric(minecraft_version: str, minecraft_directory: Union[str, os.PathLike], loader_version: str = None, callback: Optional[CallbackDict] = None, java: str = None) -> None:
+def install_fabric(minecraft_version: str, minecraft_directory: Union[str, os.PathLike], loader_version: str = None, callback: Optional[CallbackDict] = None, java: str = None, store_directory: Optional[Union[str, os.PathLike]] = None) -> None:
     """
-    Install a fabric version
+    Install a fabric version. If store_directory is given, libraries and assets are shared through the store.
     """
-    path = str(minecraft_directory)
     if not callback:
         callback = {}
+    with events.phase("fabric.install", version=minecraft_version):
+        _install_fabric(minecraft_version, str(minecraft_directory), loader_version, callback, java, store_directory)
+        registry.reconcile(minecraft_directory)
+
+
+def _install_fabric(minecraft_version: str, path: str, loader_version: Optional[str], callback: CallbackDict, java: Optional[str], store_directory: Optional[Union[str, os.PathLike]]) -> None:
     # Check if the given version exists
-    if not is_version_valid(minecraft_version, minecraft_directory):
+    if not is_version_valid(minecraft_version, path):
         raise VersionNotFound(minecraft_version)
     # Check if the given Minecraft version supported
     if not is_minecraft_version_supported(minecraft_version):
@@ -97,23 +129,33 @@ def install_fabric(minecraft_version: str, minecraft_directory: Union[str, os.Pa
     # Get latest loader version if not given
     if not loader_version:
         loader_version = get_latest_loader_version()
+    if mirror.get_resolver() is not None:
+        _install_fabric_profile(minecraft_version, path, loader_version, callback, store_directory)
+        return
     # Make sure the Minecraft version is installed
     install_minecraft_version(minecraft_version, path, callback=callback)
     # Get installer version
     installer_version = get_latest_installer_version()
-    installer_download_url = f"https://maven.fabricmc.net/net/fabricmc/fabric-installer/{installer_version}/fabric-installer-{installer_version}.jar"
+    installer_download_url = FABRIC_INSTALLER_DOWNLOAD_URL.format(version=installer_version)
     # Generate a temporary path for downloading the installer
     installer_path = os.path.join(tempfile.gettempdir(), f"fabric-installer-{random.randrange(100,10000)}.tmp")
-    # Download the installer
-    download_file(installer_download_url, installer_path, callback=callback)
-    # Run the installer see https://fabricmc.net/wiki/install#cli_installation
-    callback.get("setStatus", empty)("Running fabric installer")
-    command = [java or "java", "-jar", installer_path, "client", "-dir", path, "-mcversion", minecraft_version, "-loader", loader_version, "-noprofile", "-snapshot"]
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.returncode != 0:
-        raise ExternalProgramError(command, result.stdout, result.stderr)
-    # Delete the installer we don't need them anymore
-    os.remove(installer_path)
+    try:
+        # Download the installer
+        download_file(installer_download_url, installer_path, callback=callback)
+        # Run the installer
+        callback.get("setStatus", empty)("Running fabric installer")
+        command = _get_installer_command(installer_path, path, minecraft_version, loader_version, java)
+        with events.phase("fabric.installer", loader=loader_version):
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise ExternalProgramError(command, result.stdout, result.stderr)
+    finally:
+        # Delete the installer we don't need them anymore, also if it failed
+        if os.path.isfile(installer_path):
+            os.remove(installer_path)
     # Install all libs of fabric
     fabric_minecraft_version = f"fabric-loader-{loader_version}-{minecraft_version}"
     install_minecraft_version(fabric_minecraft_version, path, callback=callback)
+    if store_directory is not None:
+        callback.get("setStatus", empty)("Share files with the store")
+        store.dedup_directory(store_directory, path)
@@ -1,197 +1,555 @@
-import minecraft_launcher_lib
-from minecraft_launcher_lib.helper import download_file, get_library_path, get_jar_mainclass, parse_maven_metadata, empty
+from minecraft_launcher_lib.helper import get_jar_mainclass, get_sha1_hash, get_classpath_separator, empty
 from minecraft_launcher_lib.install import install_minecraft_version, install_libraries
-from typing import Dict, List, Any, Union, Optional
-from minecraft_launcher_lib.exceptions import VersionNotFound
+from typing import Dict, List, Any, Union, Optional, Set, Tuple, Iterator, AbstractSet
+from minecraft_launcher_lib.exceptions import VersionNotFound, ExternalProgramError
 from minecraft_launcher_lib.types import CallbackDict
+from cml.downloader import DownloadTask, DownloadError, InvalidChecksum, download_task, create_session, DEFAULT_WORKERS
+from cml.install import get_library_downloads, get_version_downloads, finish_install
+from cml.utils import get_cache_directory
+from cml import store, metadata, events, mirror, maven, registry
+import concurrent.futures
+import contextlib
 import subprocess
-import platform
+import functools
+import threading
 import tempfile
+import requests
+import hashlib
 import random
 import zipfile
 import shutil
+import mmap
+import time
+import io
 import json
+import re
 import os
 
-__all__ = ["install_forge_version", "run_forge_installer", "list_forge_versions", "find_forge_version", "is_forge_version_valid", "supports_automatic_install"]
+MAVEN_METADATA_URL = "https://files.minecraftforge.net/maven/net/minecraftforge/forge/maven-metadata.xml"
+FORGE_DOWNLOAD_URL = "https://files.minecraftforge.net/maven/net/minecraftforge/forge/{version}/forge-{version}-installer.jar"
 
+CHUNK_SIZE = 1024 * 256
 
-def extract_file(handler: zipfile.ZipFile, zip_path: str, extract_path: str) -> None:
+__all__ = ["install_forge_version", "run_forge_installer", "list_forge_versions", "list_forge_builds", "find_forge_version", "is_forge_version_valid", "supports_automatic_install", "get_forge_installer"]
+
+
+def extract_file(handler: zipfile.ZipFile, zip_path: str, extract_path: str, sha1: Optional[str] = None) -> None:
     """
-    Extract a file from a zip handler into the given path
+    Extract a file from a zip handler into the given path. The file is streamed in chunks and only moved into place
+    after the CRC and, if given, the sha1 are verified.
     """
+    os.makedirs(os.path.dirname(extract_path), exist_ok=True)
+    tmp_path = "{}.{}-{}.tmp".format(extract_path, os.getpid(), threading.get_ident())
+    file_hash = hashlib.sha1()
     try:
-        os.makedirs(os.path.dirname(extract_path))
-    except Exception:
-        pass
-    with handler.open(zip_path, "r") as f:
-        with open(extract_path, "wb") as w:
-            w.write(f.read())
+        # zipfile checks the CRC when the member is read to the end
+        with handler.open(zip_path, "r") as f, open(tmp_path, "wb") as w:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                w.write(chunk)
+                file_hash.update(chunk)
+        if sha1 is not None and file_hash.hexdigest() != sha1:
+            raise InvalidChecksum(zip_path, extract_path, sha1, file_hash.hexdigest())
+        os.replace(tmp_path, extract_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _get_installer_path(versionid: str) -> str:
+    return os.path.join(get_cache_directory(), "forge-installers", "forge-" + versionid + "-installer.jar")
+
+
+def get_forge_installer(versionid: str, callback: Optional[CallbackDict] = None) -> str:
+    """
+    Returns the path of the installer of a forge version. The installer is only downloaded if it's not already in the cache.
+    """
+    if callback is None:
+        callback = {}
+    installer_path = _get_installer_path(versionid)
+    if zipfile.is_zipfile(installer_path):
+        return installer_path
+    url = FORGE_DOWNLOAD_URL.format(version=versionid)
+    # The maven has a .sha1 next to every file
+    try:
+        sha1 = metadata.fetch(url + ".sha1").decode("utf-8", "replace").strip()[:40] or None
+    except (requests.RequestException, metadata.MetadataUnavailable):
+        sha1 = None
+    callback.get("setStatus", empty)("Download " + os.path.basename(installer_path))
+    try:
+        download_task(DownloadTask(url, installer_path, sha1))
+    except DownloadError as e:
+        if e.status_code == 404:
+            raise VersionNotFound(versionid) from None
+        raise
+    return installer_path
+
+
+class _MappedFile(io.RawIOBase):
+    """
+    A file object for a memory map, which zipfile can't use directly
+    """
+    def __init__(self, mapped: mmap.mmap) -> None:
+        self._mapped = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self) -> int:
+        return self._mapped.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._mapped.read(size if size is not None and size >= 0 else None)
+
+    def readinto(self, buffer: bytearray) -> int:
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@contextlib.contextmanager
+def _open_installer(installer_path: str) -> Iterator[zipfile.ZipFile]:
+    """
+    Opens the installer through a memory map, so members are read from the page cache without copying the file
+    """
+    with open(installer_path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            mapped = None
+        try:
+            with zipfile.ZipFile(_MappedFile(mapped) if mapped is not None else f, "r") as zf:
+                yield zf
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+
+def _get_library_sha1(data: Dict[str, Any], library_path: str) -> Optional[str]:
+    """
+    Returns the sha1 of a library from the libraries of the install_profile.json
+    """
+    for i in data.get("libraries", []):
+        artifact = i.get("downloads", {}).get("artifact", {})
+        if artifact.get("path") == library_path:
+            return artifact.get("sha1") or None
+    return None
 
 
 def get_data_library_path(libname: str, path: str) -> str:
     """
     Turns the libname into a path
     """
-    # Remove the []
-    libname = libname[1:-1]
-    libpath = os.path.join(path, "libraries")
-    parts = libname.split(":")
-    if len(parts) == 3:  # 如果只有三部分，假设最后一部分是版本和额外信息的组合
-        base_path, libname, combined = parts
-        # 假设 combined 是 "version(extra)" 的格式，你可以进一步拆分
-        parts = combined.split("(")
-        if len(parts) == 2:
-            version, extra = parts
+    return maven.get_library_path(libname, path)
+
+
+_ARGUMENT_VAR_REGEX = re.compile(r"\{(\w+)\}")
+
+
+@functools.lru_cache(maxsize=256)
+def _get_jar_mainclass_cached(jar_path: str, mtime: int) -> str:
+    return get_jar_mainclass(jar_path)
+
+
+def _get_mainclass(jar_path: str) -> str:
+    """
+    Returns the mainclass of a jar. The result is cached as long as the jar doesn't change.
+    """
+    return _get_jar_mainclass_cached(jar_path, os.stat(jar_path).st_mtime_ns)
+
+
+def _get_processor_files(args: List[str], outputs: Dict[str, str], pending: AbstractSet[str] = frozenset()) -> Tuple[Set[str], Set[str]]:
+    """
+    Returns the files a processor reads and the files it writes.
+    Declared outputs, files after --out... arguments and files that don't exist before the processors run count as written.
+    Files in pending are still being downloaded and count as read.
+    """
+    reads = set()
+    writes = set(outputs.keys())
+    for pos, arg in enumerate(args):
+        if not os.path.isabs(arg):
+            continue
+        if arg in writes:
+            continue
+        if (pos > 0 and "out" in args[pos - 1].lower()) or not (os.path.exists(arg) or os.path.normpath(arg) in pending):
+            writes.add(arg)
         else:
-    # 如果拆分结果不符合预期，可以选择设置默认值或者抛出异常
-            version = parts[0]
-            extra = ""  # 设置默认值为空字符串或者其他默认值
-        extra = extra[:-1]  # 移除末尾的括号
-    else:
-        base_path, libname, version, extra = parts
-    for i in base_path.split("."):
-        libpath = os.path.join(libpath, i)
-    try:
-        extra, fileend = extra.split("@")
-    except ValueError:
-        fileend = "jar"
-    libpath = os.path.join(libpath, libname, version, libname + "-" + version + "-" + extra + "." + fileend)
-    return libpath
+            reads.add(arg)
+    return reads, writes
 
 
-def forge_processors(data: Dict[str, Any], minecraft_directory: Union[str, os.PathLike], lzma_path: str, installer_path: str, callback: CallbackDict, java: str = None) -> None:
+def _are_outputs_valid(outputs: Dict[str, str]) -> bool:
     """
-    Run the processors of the install_profile.json
+    Checks if all declared outputs of a processor exist with the right sha1
     """
-    path = str(minecraft_directory)
-    argument_vars = {"{MINECRAFT_JAR}": os.path.join(path, "versions", data["minecraft"], data["minecraft"] + ".jar")}
+    if len(outputs) == 0:
+        return False
+    for file_path, sha1 in outputs.items():
+        if not os.path.isfile(file_path) or get_sha1_hash(file_path) != sha1:
+            return False
+    return True
+
+
+def _plan_processors(data: Dict[str, Any], path: str, argument_vars: Dict[str, str], java: Optional[str], pending: AbstractSet[str] = frozenset()) -> List[Dict[str, Any]]:
+    """
+    Builds the commands of all client processors and finds out which processors depend on each other
+    """
+    def replace_vars(value: str) -> str:
+        value = _ARGUMENT_VAR_REGEX.sub(lambda match: argument_vars.get(match.group(1), match.group(0)), value)
+        if value.startswith("[") and value.endswith("]"):
+            return maven.get_library_path(value, path)
+        return value
+
+    classpath_seperator = get_classpath_separator()
+    processors = []
+    for i in data["processors"]:
+        if "client" not in i.get("sides", ["client"]):
+            # Skip server side only processors
+            continue
+        jar_path = maven.get_library_path(i["jar"], path)
+        classpath = maven.get_library_paths(i["classpath"], path) + [jar_path]
+        args = [replace_vars(c) for c in i["args"]]
+        outputs = {replace_vars(key): replace_vars(value).strip("'") for key, value in i.get("outputs", {}).items()}
+        reads, writes = _get_processor_files(args, outputs, pending)
+        reads.update(classpath)
+        processors.append({
+            "jar": i["jar"],
+            "jar_path": jar_path,
+            "command": [java or "java", "-cp", classpath_seperator.join(classpath)] + args,
+            "outputs": outputs,
+            "reads": reads,
+            "writes": writes,
+        })
+    for pos, current in enumerate(processors):
+        # A processor has to wait for every earlier processor that writes a file it uses or uses a file it writes
+        current["depends"] = set()
+        for before in range(pos):
+            other = processors[before]
+            if other["writes"] & (current["reads"] | current["writes"]) or current["writes"] & other["reads"]:
+                current["depends"].add(before)
+    return processors
+
+
+def _get_processor_command(processor: Dict[str, Any]) -> List[str]:
+    return processor["command"][:3] + [_get_mainclass(processor["jar_path"])] + processor["command"][3:]
+
+
+def _prepare_processor(processor: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Returns the command of a processor or None if it can be skipped because its outputs are already valid
+    """
+    if _are_outputs_valid(processor["outputs"]):
+        events.emit("processor", jar=processor["jar"], skipped=True)
+        return None
+    # A processor may write into an existing file, which must not change the object in the store
+    for file_path in processor["writes"]:
+        store.break_link(file_path)
+    return _get_processor_command(processor)
+
+
+def _check_processor(processor: Dict[str, Any], command: List[str], start: float, returncode: int, stdout: Optional[bytes], stderr: Optional[bytes]) -> None:
+    events.emit("processor", jar=processor["jar"], duration=time.perf_counter() - start, returncode=returncode)
+    if returncode != 0:
+        raise ExternalProgramError(command, stdout, stderr)
+
+
+def _run_processor(processor: Dict[str, Any]) -> bool:
+    """
+    Runs a single processor. Returns False if it was skipped because its outputs are already valid.
+    """
+    command = _prepare_processor(processor)
+    if command is None:
+        return False
+    start = time.perf_counter()
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _check_processor(processor, command, start, result.returncode, result.stdout, result.stderr)
+    return True
+
+
+def _get_processors(data: Dict[str, Any], path: str, lzma_path: str, installer_path: str, java: Optional[str], pending: AbstractSet[str] = frozenset()) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Returns the planned processors and the temporary root directory they use
+    """
+    argument_vars = {"MINECRAFT_JAR": os.path.join(path, "versions", data["minecraft"], data["minecraft"] + ".jar")}
     for key, value in data["data"].items():
         if value["client"].startswith("[") and value["client"].endswith("]"):
-            argument_vars["{" + key + "}"] = get_data_library_path(value["client"], path)
+            argument_vars[key] = get_data_library_path(value["client"], path)
         else:
-            argument_vars["{" + key + "}"] = value["client"]
+            argument_vars[key] = value["client"]
     root_path = os.path.join(tempfile.gettempdir(), "forge-root-" + str(random.randrange(1, 100000)))
-    argument_vars["{INSTALLER}"] = installer_path
-    argument_vars["{BINPATCH}"] = lzma_path
-    argument_vars["{ROOT}"] = root_path
-    argument_vars["{SIDE}"] = "client"
-    if platform.system() == "Windows":
-        classpath_seperator = ";"
-    else:
-        classpath_seperator = ":"
-    callback.get("setMax", empty)(len(data["processors"]))
-    for count, i in enumerate(data["processors"]):
-        if "client" not in i.get("sides", ["client"]):
-            # Skip server side only processors
-            continue
-        callback.get("setStatus", empty)("Running processor " + i["jar"])
-        # Get the classpath
-        classpath = ""
-        for c in i["classpath"]:
-            classpath = classpath + get_library_path(c, path) + classpath_seperator
-        classpath = classpath + get_library_path(i["jar"], path)
-        mainclass = get_jar_mainclass(get_library_path(i["jar"], path))
-        command = [java or "java", "-cp", classpath, mainclass]
-        for c in i["args"]:
-            var = argument_vars.get(c, c)
-            if var.startswith("[") and var.endswith("]"):
-                command.append(get_library_path(var[1:-1], path))
-            else:
-                command.append(var)
-        for key, value in argument_vars.items():
-            for pos in range(len(command)):
-                command[pos] = command[pos].replace(key, value)
-        subprocess.call(command)
-        callback.get("setProgress", empty)(count)
-    if os.path.exists(root_path):
-        shutil.rmtree(root_path)
-
-
-def install_forge_version(versionid: str, path: str, callback: Optional[CallbackDict] = None, java: Optional[str] = None) -> None:
+    argument_vars["INSTALLER"] = installer_path
+    argument_vars["BINPATCH"] = lzma_path
+    argument_vars["ROOT"] = root_path
+    argument_vars["SIDE"] = "client"
+    return _plan_processors(data, path, argument_vars, java, pending), root_path
+
+
+def forge_processors(data: Dict[str, Any], minecraft_directory: Union[str, os.PathLike], lzma_path: str, installer_path: str, callback: CallbackDict, java: str = None, max_workers: int = None) -> None:
+    """
+    Run the processors of the install_profile.json. Processors that don't depend on each other run at the same time.
+    Processors whose outputs already exist with the right sha1 are skipped.
+    """
+    processors, root_path = _get_processors(data, str(minecraft_directory), lzma_path, installer_path, java)
+    try:
+        _run_processors(processors, callback, max_workers)
+    finally:
+        if os.path.exists(root_path):
+            shutil.rmtree(root_path)
+
+
+def _run_processors(processors: List[Dict[str, Any]], callback: CallbackDict, max_workers: Optional[int], downloads: Optional[Dict[str, concurrent.futures.Future]] = None) -> None:
+    """
+    Runs the planned processors. A processor starts once the processors it depends on are finished and the files it reads are downloaded.
+    downloads maps the normalized paths of files that are still being downloaded to their futures.
+    """
+    if max_workers is None:
+        max_workers = min(4, os.cpu_count() or 1)
+    if downloads is None:
+        downloads = {}
+    callback.get("setMax", empty)(len(processors))
+    waiting = {pos: set(i["depends"]) for pos, i in enumerate(processors)}
+    inputs = {pos: [downloads[i] for i in map(os.path.normpath, processor["reads"]) if i in downloads] for pos, processor in enumerate(processors)}
+    running: Dict[concurrent.futures.Future, int] = {}
+    finished = 0
+    with events.phase("forge.processors", processors=len(processors)), concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while waiting or running:
+            downloading = set()
+            for pos in [pos for pos, depends in waiting.items() if len(depends) == 0]:
+                missing = [i for i in inputs[pos] if not i.done()]
+                if missing:
+                    downloading.update(missing)
+                    continue
+                for i in inputs[pos]:
+                    # Raises if an input could not be downloaded
+                    i.result()
+                del waiting[pos]
+                callback.get("setStatus", empty)("Running processor " + processors[pos]["jar"])
+                running[executor.submit(_run_processor, processors[pos])] = pos
+            done, _ = concurrent.futures.wait(list(running) + list(downloading), return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future not in running:
+                    continue
+                pos = running.pop(future)
+                # Raises if the processor failed, no new processors are started after that
+                future.result()
+                finished += 1
+                callback.get("setProgress", empty)(finished)
+                for depends in waiting.values():
+                    depends.discard(pos)
+
+
+def install_forge_version(versionid: str, path: str, callback: Optional[CallbackDict] = None, java: Optional[str] = None, store_directory: Optional[Union[str, os.PathLike]] = None, pipelined: bool = False) -> None:
     """
     Installs a forge version. Fore more information look at the documentation.
+    If store_directory is given, libraries and assets are shared through the store.
+    If pipelined is True, all files are downloaded in the background and every processor starts as soon as its own files are there.
+    With a mirror (see cml.mirror) the pipelined install is always used, because it downloads everything through cml.
     """
     if callback is None:
         callback = {}
-    FORGE_DOWNLOAD_URL = "https://files.minecraftforge.net/maven/net/minecraftforge/forge/{version}/forge-{version}-installer.jar"
-    temp_file_path = os.path.join(tempfile.gettempdir(), "forge-installer-" + str(random.randrange(1, 100000)) + ".tmp")
-    if not download_file(FORGE_DOWNLOAD_URL.format(version=versionid), temp_file_path, callback):
-        raise VersionNotFound(versionid)
-    zf = zipfile.ZipFile(temp_file_path, "r")
-    # Read the install_profile.json
-    with zf.open("install_profile.json", "r") as f:
-        version_content = f.read()
-    version_data = json.loads(version_content)
-    forge_version_id = version_data["version"]
+    pipelined = pipelined or mirror.get_resolver() is not None
+    with events.phase("forge.install", version=versionid, pipelined=pipelined):
+        if pipelined:
+            _install_forge_version_pipelined(versionid, str(path), callback, java, store_directory)
+        else:
+            _install_forge_version(versionid, path, callback, java, store_directory)
+        # The installer can also install the Minecraft version, so all new versions are added
+        registry.reconcile(path)
+
+
+def _install_forge_version(versionid: str, path: str, callback: CallbackDict, java: Optional[str], store_directory: Optional[Union[str, os.PathLike]]) -> None:
+    with events.phase("forge.installer", version=versionid):
+        installer_path = get_forge_installer(versionid, callback)
+    _install_forge_dependencies(path, installer_path, callback)
+    version_data, lzma_path = _read_installer(versionid, path, installer_path)
+    # Everything after the client.lzma was extracted is in the try, so it is removed whatever fails
+    try:
+        # Install the rest with the vanilla function
+        install_minecraft_version(version_data["version"], path, callback=callback)
+        # Run the processors
+        forge_processors(version_data, path, lzma_path, installer_path, callback, java)
+    finally:
+        # Delete the temporary files, also if a processor failed
+        if os.path.isfile(lzma_path):
+            os.remove(lzma_path)
+    if store_directory is not None:
+        callback.get("setStatus", empty)("Share files with the store")
+        store.dedup_directory(store_directory, path)
+
+
+def _install_forge_dependencies(path: str, installer_path: str, callback: CallbackDict) -> None:
+    """
+    Installs the Minecraft version and the libraries that the installer needs
+    """
+    with _open_installer(installer_path) as zf:
+        # Read the install_profile.json
+        with zf.open("install_profile.json", "r") as f:
+            version_data = json.load(f)
     # Make sure, the base version is installed
     install_minecraft_version(version_data["minecraft"], path, callback=callback)
     # Install all needed libs from install_profile.json
     install_libraries(version_data, path, callback)
+
+
+def _extract_installer_files(zf: zipfile.ZipFile, versionid: str, version_data: Dict[str, Any], path: str) -> str:
+    """
+    Extracts the version.json and the forge libs of the installer. Returns the path of the extracted client.lzma.
+    """
+    forge_version_id = version_data["version"]
     # Extract the version.json
     version_json_path = os.path.join(path, "versions", forge_version_id, forge_version_id + ".json")
     extract_file(zf, "version.json", version_json_path)
     # Extract forge libs from the installer
     forge_lib_path = os.path.join(path, "libraries", "net", "minecraftforge", "forge", versionid)
-    try:
-        extract_file(zf, "maven/net/minecraftforge/forge/{version}/forge-{version}.jar".format(version=versionid), os.path.join(forge_lib_path, "forge-" + versionid + ".jar"))
-        extract_file(zf, "maven/net/minecraftforge/forge/{version}/forge-{version}-universal.jar".format(version=versionid), os.path.join(forge_lib_path, "forge-" + versionid + "-universal.jar"))
-    except KeyError:
-        pass
+    for filename in ("forge-" + versionid + ".jar", "forge-" + versionid + "-universal.jar"):
+        try:
+            extract_file(zf, "maven/net/minecraftforge/forge/" + versionid + "/" + filename, os.path.join(forge_lib_path, filename), _get_library_sha1(version_data, "net/minecraftforge/forge/" + versionid + "/" + filename))
+        except KeyError:
+            pass
     # Extract the client.lzma
     lzma_path = os.path.join(tempfile.gettempdir(), "lzma-" + str(random.randrange(1, 100000)) + ".tmp")
     try:
         extract_file(zf, "data/client.lzma", lzma_path)
     except KeyError:
         pass
-    zf.close()
-    # Install the rest with the vanilla function
-    install_minecraft_version(forge_version_id, path, callback=callback)
-    # Run the processors
-    forge_processors(version_data, path, lzma_path, temp_file_path, callback, java)
-    # Delete the temporary files
-    os.remove(temp_file_path)
-    if os.path.isfile(lzma_path):
-        os.remove(lzma_path)
+    return lzma_path
+
+
+def _read_installer(versionid: str, path: str, installer_path: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Reads the install_profile.json and extracts the files of the installer. Returns the install_profile.json and the path of the extracted client.lzma.
+    """
+    with _open_installer(installer_path) as zf:
+        with zf.open("install_profile.json", "r") as f:
+            version_data = json.load(f)
+        lzma_path = _extract_installer_files(zf, versionid, version_data, path)
+    return version_data, lzma_path
+
+
+def _get_pipeline_downloads(version_data: Dict[str, Any], path: str, session: requests.Session) -> List[DownloadTask]:
+    """
+    Returns every file of the forge version. The files the processors need come first.
+    """
+    minecraft_jar = os.path.normpath(os.path.join(path, "versions", version_data["minecraft"], version_data["minecraft"] + ".jar"))
+    first = get_library_downloads(version_data, path)
+    rest = get_version_downloads(version_data["version"], path, session=session)
+    first.extend(i for i in rest if os.path.normpath(i.path) == minecraft_jar)
+    tasks: Dict[str, DownloadTask] = {}
+    for i in first + rest:
+        # Two tasks for the same file would write the same .part file
+        tasks.setdefault(os.path.normpath(i.path), i)
+    return list(tasks.values())
+
+
+def _install_forge_version_pipelined(versionid: str, path: str, callback: CallbackDict, java: Optional[str], store_directory: Optional[Union[str, os.PathLike]]) -> None:
+    with events.phase("forge.installer", version=versionid):
+        installer_path = get_forge_installer(versionid, callback)
+    version_data, lzma_path = _read_installer(versionid, path, installer_path)
+    root_path = None
+    # Everything after the client.lzma was extracted is in the try, so it is removed whatever fails
+    try:
+        session = create_session(DEFAULT_WORKERS)
+        with events.phase("resolve", version=version_data["version"]) as info:
+            tasks = _get_pipeline_downloads(version_data, path, session)
+            info["files"] = len(tasks)
+
+        def download(task: DownloadTask) -> bool:
+            try:
+                return download_task(task, session=session, store_directory=store_directory)
+            except (requests.RequestException, DownloadError):
+                if not task.optional:
+                    raise
+                return False
+
+        def finish() -> None:
+            for future in downloads.values():
+                future.result()
+            finish_install(version_data["version"], path, callback)
+
+        callback.get("setStatus", empty)(f"Download {len(tasks)} files")
+        processors, root_path = _get_processors(version_data, path, lzma_path, installer_path, java, {os.path.normpath(i.path) for i in tasks})
+        with concurrent.futures.ThreadPoolExecutor(max_workers=DEFAULT_WORKERS) as executor, concurrent.futures.ThreadPoolExecutor(max_workers=1) as finisher:
+            # The executor works through the tasks in order, so the files of the processors are downloaded first
+            downloads = {os.path.normpath(i.path): executor.submit(download, i) for i in tasks}
+            finished = finisher.submit(finish)
+            try:
+                _run_processors(processors, callback, None, downloads)
+                finished.result()
+            except BaseException:
+                for future in downloads.values():
+                    future.cancel()
+                raise
+    finally:
+        if root_path is not None and os.path.exists(root_path):
+            shutil.rmtree(root_path)
+        if os.path.isfile(lzma_path):
+            os.remove(lzma_path)
+    if store_directory is not None:
+        callback.get("setStatus", empty)("Share files with the store")
+        store.dedup_directory(store_directory, path)
 
 
 def run_forge_installer(version: str, java: Optional[str] = None) -> None:
     """
     Run the forge installer of the given forge version
     """
-    FORGE_DOWNLOAD_URL = "https://files.minecraftforge.net/maven/net/minecraftforge/forge/{version}/forge-{version}-installer.jar"
-    temp_file_path = os.path.join(tempfile.gettempdir(), "forge-" + str(random.randrange(1, 100000)) + ".tmp")
-    download_file(FORGE_DOWNLOAD_URL.format(version=version), temp_file_path, {})
-    subprocess.call([java or "java", "-jar", temp_file_path])
-    os.remove(temp_file_path)
+    installer_path = get_forge_installer(version)
+    subprocess.call([java or "java", "-jar", installer_path])
+
+
+def _build_forge_index(content: bytes) -> Dict[str, Any]:
+    """
+    Builds the lookup tables for the forge maven-metadata.xml
+    """
+    versions = metadata.parse_maven_metadata(content)["versions"]
+    by_vanilla: Dict[str, List[str]] = {}
+    for i in versions:
+        by_vanilla.setdefault(i.split("-")[0], []).append(i)
+    return {"versions": versions, "set": frozenset(versions), "by_vanilla": by_vanilla}
+
+
+def _get_forge_index() -> Dict[str, Any]:
+    return metadata.fetch_indexed(MAVEN_METADATA_URL, _build_forge_index)
 
 
 def list_forge_versions() -> List[str]:
     """
     Returns a list of all forge versions
     """
-    MAVEN_METADATA_URL = "https://files.minecraftforge.net/maven/net/minecraftforge/forge/maven-metadata.xml"
-    return parse_maven_metadata(MAVEN_METADATA_URL)["versions"]
+    return list(_get_forge_index()["versions"])
+
+
+def list_forge_builds(vanilla_version: str) -> List[str]:
+    """
+    Returns all forge versions for the given vanilla version
+    """
+    return list(_get_forge_index()["by_vanilla"].get(vanilla_version, []))
 
 
-def find_forge_version(vanilla_version: str) -> Optional[str]:
+def find_forge_version(version: str) -> Optional[str]:
     """
     Find the latest forge version that is compatible to the given vanilla version
     """
-    version_list = list_forge_versions()
-    for i in version_list:
-        version_split = i.split("-")
-        if version_split[0] == vanilla_version:
-            return i
-    return None
+    builds = _get_forge_index()["by_vanilla"].get(version)
+    if not builds:
+        return None
+    return builds[0]
 
 
 def is_forge_version_valid(forge_version: str) -> bool:
     """
     Checks if a forge version is valid
     """
-    forge_version_list = list_forge_versions()
-    return forge_version in forge_version_list
+    return forge_version in _get_forge_index()["set"]
 
 
 def supports_automatic_install(forge_version: str) -> bool:
@@ -220,6 +578,3 @@ def forge_to_installed_version(forge_version: str) -> str:
         return f"{vanilla_part}-forge-{forge_part}"
     except ValueError:
         raise ValueError(f"{forge_version} is not a valid forge version") from None
-
-def find_forge_version(version):
-    return minecraft_launcher_lib.forge.find_forge_version(vanilla_version=version)
\ No newline at end of file
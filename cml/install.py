@@ -1,5 +1,175 @@
-def download_game(mc_dir,version):
-        import minecraft_launcher_lib
+from minecraft_launcher_lib.helper import parse_rule_list, inherit_json, empty
+from minecraft_launcher_lib.exceptions import VersionNotFound
+from minecraft_launcher_lib.runtime import install_jvm_runtime
+from minecraft_launcher_lib.types import CallbackDict
+from cml import store, metadata, events, mirror, maven, registry
+from cml.natives import get_natives, ensure_natives
+from cml.downloader import DownloadTask, download_task, download_files, create_session, DEFAULT_WORKERS
+from typing import Dict, List, Any, Union, Optional
+import requests
+import json
+import os
+
+VERSION_MANIFEST_URL = "https://launchermeta.mojang.com/mc/game/version_manifest_v2.json"
+LIBRARIES_URL = "https://libraries.minecraft.net"
+RESOURCES_URL = "https://resources.download.minecraft.net"
+
+
+def _build_manifest_index(content: bytes) -> Dict[str, Dict[str, Any]]:
+    """
+    Maps the version ids of the version manifest to their entries
+    """
+    return {i["id"]: i for i in json.loads(content)["versions"]}
+
+
+def get_version_manifest_entry(versionid: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the entry of a version in the Mojang version manifest
+    """
+    return metadata.fetch_indexed(VERSION_MANIFEST_URL, _build_manifest_index).get(versionid)
+
+
+def is_version_valid(versionid: str, minecraft_directory: Union[str, os.PathLike]) -> bool:
+    """
+    Checks if the version is installed or can be installed
+    """
+    if os.path.isdir(os.path.join(str(minecraft_directory), "versions", versionid)):
+        return True
+    return get_version_manifest_entry(versionid) is not None
+
+
+def ensure_version_json(versionid: str, path: str, session: requests.Session) -> Dict[str, Any]:
+    """
+    Returns the json of a version. Downloads it from the version manifest if it is not installed.
+    """
+    json_path = os.path.join(path, "versions", versionid, versionid + ".json")
+    if not os.path.isfile(json_path):
+        entry = get_version_manifest_entry(versionid)
+        if entry is None:
+            raise VersionNotFound(versionid)
+        download_task(DownloadTask(entry["url"], json_path, entry["sha1"]), session=session)
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_library_downloads(data: Dict[str, Any], path: str) -> List[DownloadTask]:
+    """
+    Returns the downloads of all libraries and native jars of a version json
+    """
+    tasks = []
+    for i in data["libraries"]:
+        # Check, if the rules allow this lib for the current system
+        if not parse_rule_list(i, "rules", {}):
+            continue
+        native = get_natives(i)
+        if "downloads" in i:
+            if "artifact" in i["downloads"]:
+                artifact = i["downloads"]["artifact"]
+                if artifact.get("url"):
+                    tasks.append(DownloadTask(artifact["url"], os.path.join(path, "libraries", artifact["path"]), artifact.get("sha1"), artifact.get("size")))
+            if native != "" and native in i["downloads"].get("classifiers", {}):
+                classifier = i["downloads"]["classifiers"][native]
+                tasks.append(DownloadTask(classifier["url"], os.path.join(path, "libraries", classifier["path"]), classifier.get("sha1"), classifier.get("size")))
+            continue
+        # Libraries without downloads are taken from the maven repository in url
+        try:
+            coordinate = maven.parse_coordinate(i["name"])
+        except ValueError:
+            continue
+        coordinates = [coordinate]
+        if native != "":
+            coordinates.append(coordinate._replace(classifier=native, extension="jar"))
+        base_url = i.get("url", LIBRARIES_URL).rstrip("/") + "/"
+        for j in coordinates:
+            relative_path = j.get_relative_path()
+            tasks.append(DownloadTask(base_url + relative_path, os.path.join(path, "libraries", *relative_path.split("/")), optional=True))
+    return tasks
+
+
+def get_asset_downloads(data: Dict[str, Any], path: str, session: Optional[requests.Session] = None) -> List[DownloadTask]:
+    """
+    Returns the downloads of all asset objects. The asset index is downloaded if needed.
+    """
+    # Old versions dosen't have this
+    if "assetIndex" not in data:
+        return []
+    index_path = os.path.join(path, "assets", "indexes", data["assets"] + ".json")
+    download_task(DownloadTask(data["assetIndex"]["url"], index_path, data["assetIndex"]["sha1"]), session=session)
+    with open(index_path, "r", encoding="utf-8") as f:
+        assets_data = json.load(f)
+    tasks = []
+    for value in assets_data["objects"].values():
+        asset_hash = value["hash"]
+        tasks.append(DownloadTask(RESOURCES_URL + "/" + asset_hash[:2] + "/" + asset_hash, os.path.join(path, "assets", "objects", asset_hash[:2], asset_hash), asset_hash, value.get("size")))
+    return tasks
+
+
+def get_version_downloads(versionid: str, minecraft_directory: Union[str, os.PathLike], session: Optional[requests.Session] = None) -> List[DownloadTask]:
+    """
+    Returns every file that is needed by a version, including the versions it inherits from.
+    The version json and the asset index are downloaded if they are not installed yet.
+    """
+    path = str(minecraft_directory)
+    if session is None:
+        session = create_session()
+    data = ensure_version_json(versionid, path, session)
+    tasks = []
+    if "inheritsFrom" in data:
+        try:
+            tasks.extend(get_version_downloads(data["inheritsFrom"], path, session=session))
+        except VersionNotFound:
+            pass
+        data = inherit_json(data, path)
+    tasks.extend(get_library_downloads(data, path))
+    tasks.extend(get_asset_downloads(data, path, session=session))
+    # Download logging config
+    if "logging" in data and len(data["logging"]) != 0:
+        logging_file = data["logging"]["client"]["file"]
+        tasks.append(DownloadTask(logging_file["url"], os.path.join(path, "assets", "log_configs", logging_file["id"]), logging_file.get("sha1"), logging_file.get("size")))
+    # Download minecraft.jar
+    if "downloads" in data:
+        client = data["downloads"]["client"]
+        tasks.append(DownloadTask(client["url"], os.path.join(path, "versions", data["id"], data["id"] + ".jar"), client.get("sha1"), client.get("size")))
+    return tasks
+
+
+def finish_install(versionid: str, minecraft_directory: Union[str, os.PathLike], callback: Optional[CallbackDict] = None) -> None:
+    """
+    Finishes the install of a version whose files were all downloaded and checked by cml: the natives are linked from the cache and the java runtime is installed.
+    The downloaded files are not hashed again. With a mirror the java runtime is skipped, because minecraft_launcher_lib would ask Mojang for it.
+    """
+    if callback is None:
+        callback = {}
+    path = str(minecraft_directory)
+    with events.phase("finalize", version=versionid):
+        ensure_natives(versionid, path)
+        if mirror.get_resolver() is not None:
+            return
+        for data in registry.read_version_chain(path, versionid):
+            if "javaVersion" in data:
+                callback.get("setStatus", empty)("Install java runtime")
+                install_jvm_runtime(data["javaVersion"]["component"], path, callback={"setStatus": callback.get("setStatus", empty)})
+                break
+
+
+def prefetch_version(versionid: str, minecraft_directory: Union[str, os.PathLike], callback: Optional[CallbackDict] = None, max_workers: int = DEFAULT_WORKERS, store_directory: Optional[Union[str, os.PathLike]] = None) -> int:
+    """
+    Downloads all files of a version in parallel. Returns the number of downloaded files.
+    If store_directory is given, the files are shared with other minecraft directories through the store.
+    """
+    if callback is None:
+        callback = {}
+    session = create_session(max_workers)
+    callback.get("setStatus", empty)("Resolve " + versionid)
+    with events.phase("resolve", version=versionid) as info:
+        tasks = get_version_downloads(versionid, minecraft_directory, session=session)
+        info["files"] = len(tasks)
+    if store_directory is not None:
+        store.register_instance(store_directory, minecraft_directory)
+    return download_files(tasks, callback=callback, max_workers=max_workers, session=session, store_directory=store_directory)
+
+
+def download_game(mc_dir,version,max_workers=DEFAULT_WORKERS,store_directory=None):
         current_max = 0
 
         # 这里定义了一个函数，获取当前的状态
@@ -14,8 +184,8 @@ def download_game(mc_dir,version):
 
         # 这个函数获取了最大值
         def set_max(new_max: int):
-            # 定义一个全局变量
-            global current_max
+            # current_max是download_game的变量，不是全局变量
+            nonlocal current_max
             # 赋值
             current_max = new_max
 
@@ -27,10 +197,8 @@ def download_game(mc_dir,version):
             "setProgress": set_progress,
             "setMax": set_max
         }
-        try:
-            minecraft_launcher_lib.install.install_minecraft_version(version,mc_dir,callback=callback)
-        except:
-             from download import download_minecraft_launcher_lib
-             print('下载支持库...')
-             download_minecraft_launcher_lib()
-             print('下载完成')
+        with events.phase("install", version=version):
+            # 先并行下载并校验所有文件，然后只链接natives和安装java运行时，不再逐个重新计算哈希
+            prefetch_version(version,mc_dir,callback=callback,max_workers=max_workers,store_directory=store_directory)
+            finish_install(version,mc_dir,callback=callback)
+            registry.register_client(mc_dir,version)
@@ -1,29 +1,301 @@
+from minecraft_launcher_lib.runtime import get_executable_path
+from typing import Dict, List, Any, Union, Optional, TypedDict
+from cml.utils import get_cache_directory, write_json_atomic
+import subprocess
+import threading
+import platform
+import glob
+import json
+import re
 import os
 
-def find_java_path(start_dirs=None):
-    # 如果没有指定起始目录，则使用常见的Java安装目录
-    if not start_dirs:
-        start_dirs = [
-            "C:\\\\",
-            "D:\\\\",
-            "E:\\\\",
-            "F:\\\\",
-            "G:\\\\",
-
-            # 可以添加更多的常见路径
-        ]
-
-    # 用于存储找到的Java路径
-    java_paths = []
+__all__ = ["find_java_path", "find_java_runtimes", "get_java_runtime", "get_best_java", "clear_java_index"]
+
+INDEX_FORMAT = 1
+
+if platform.system() == "Windows":
+    JAVA_EXECUTABLE = "java.exe"
+else:
+    JAVA_EXECUTABLE = "java"
+
+# Directories that can never contain a JDK, so the crawl doesn't descend into them
+PRUNED_DIRECTORIES = {
+    ".git", ".svn", ".hg", "node_modules", "__pycache__", ".cache", ".gradle", ".m2", ".npm", ".cargo", ".rustup",
+    "$recycle.bin", "system volume information", "windows", "winsxs", "temp", "tmp",
+    "proc", "sys", "dev", "run", "snap", "lost+found", "boot",
+    "assets", "saves", "resourcepacks", "shaderpacks", "screenshots", "logs", "crash-reports", "mods", "libraries",
+}
+
+
+class JavaRuntime(TypedDict):
+    path: str
+    home: str
+    version: str
+    major: int
+    vendor: str
+    arch: str
+    mtime: int
+
+
+_index: Optional[Dict[str, JavaRuntime]] = None
+_index_lock = threading.Lock()
+
+
+def _get_index_path() -> str:
+    return os.path.join(get_cache_directory(), "java-index.json")
+
+
+def _load_index() -> Dict[str, JavaRuntime]:
+    global _index
+    if _index is None:
+        try:
+            with open(_get_index_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            _index = data["runtimes"] if data.get("format") == INDEX_FORMAT else {}
+        except (OSError, ValueError, KeyError):
+            _index = {}
+    return _index
+
+
+def _save_index(index: Dict[str, JavaRuntime]) -> None:
+    try:
+        write_json_atomic(_get_index_path(), {"format": INDEX_FORMAT, "runtimes": index})
+    except OSError:
+        pass
+
+
+def clear_java_index() -> None:
+    """
+    Forgets all known java runtimes
+    """
+    global _index
+    with _index_lock:
+        _index = {}
+        _save_index(_index)
+
+
+def _get_major_version(version: str) -> int:
+    """
+    Turns a java version like 1.8.0_392 or 17.0.2 into the major version
+    """
+    match = re.match(r"(\d+)(?:\.(\d+))?", version)
+    if match is None:
+        return 0
+    major = int(match.group(1))
+    if major == 1 and match.group(2) is not None:
+        return int(match.group(2))
+    return major
+
+
+def _normalize_arch(arch: str) -> str:
+    arch = arch.lower()
+    if arch in ("amd64", "x86_64", "x64"):
+        return "x86_64"
+    if arch in ("aarch64", "arm64"):
+        return "aarch64"
+    if arch in ("x86", "i386", "i586", "i686"):
+        return "x86"
+    return arch
 
-    # 遍历起始目录
-    for start_dir in start_dirs:
-        if os.path.exists(start_dir):
-            # 递归遍历目录树
-            for root, dirs, files in os.walk(start_dir):
-                for file in files:
-                    if file.lower() in ['java', 'java.exe']:
-                        java_path = os.path.join(root, file)
-                        java_paths.append(java_path)
 
+def _read_release_file(home: str) -> Optional[Dict[str, str]]:
+    """
+    Reads the release file that every JDK and most JREs have in their home directory
+    """
+    values = {}
+    try:
+        with open(os.path.join(home, "release"), "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                key, sep, value = line.partition("=")
+                if sep:
+                    values[key.strip()] = value.strip().strip('"')
+    except OSError:
+        return None
+    if "JAVA_VERSION" not in values:
+        return None
+    return {"version": values["JAVA_VERSION"], "vendor": values.get("IMPLEMENTOR", ""), "arch": values.get("OS_ARCH", "")}
+
+
+def _query_java(path: str) -> Optional[Dict[str, str]]:
+    """
+    Asks the java executable for its properties. This is slow, so it is only used when there is no release file.
+    """
+    try:
+        result = subprocess.run([path, "-XshowSettings:properties", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    properties = {}
+    for line in result.stderr.decode("utf-8", errors="replace").splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            properties[key.strip()] = value.strip()
+    if "java.version" not in properties:
+        return None
+    return {"version": properties["java.version"], "vendor": properties.get("java.vendor", ""), "arch": properties.get("os.arch", "")}
+
+
+def _probe_java(path: str, mtime: int) -> Optional[JavaRuntime]:
+    home = os.path.dirname(os.path.dirname(path))
+    info = _read_release_file(home) or _query_java(path)
+    if info is None:
+        return None
+    return {
+        "path": path,
+        "home": home,
+        "version": info["version"],
+        "major": _get_major_version(info["version"]),
+        "vendor": info["vendor"],
+        "arch": _normalize_arch(info["arch"]),
+        "mtime": mtime,
+    }
+
+
+def get_java_runtime(path: str) -> Optional[JavaRuntime]:
+    """
+    Returns the information about a java executable. The result is taken from the index as long as the file is unchanged.
+    """
+    path = os.path.realpath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _index_lock:
+        index = _load_index()
+        runtime = index.get(path)
+    if runtime is not None and runtime["mtime"] == mtime:
+        return runtime
+    runtime = _probe_java(path, mtime)
+    with _index_lock:
+        if runtime is None:
+            index.pop(path, None)
+        else:
+            index[path] = runtime
+        _save_index(index)
+    return runtime
+
+
+def _get_known_java_paths(minecraft_directory: Optional[Union[str, os.PathLike]] = None) -> List[str]:
+    """
+    Returns the java executables in the places where java is usually installed
+    """
+    candidates = []
+    if os.getenv("JAVA_HOME"):
+        candidates.append(os.path.join(os.getenv("JAVA_HOME"), "bin", JAVA_EXECUTABLE))
+    for directory in os.getenv("PATH", "").split(os.pathsep):
+        if directory:
+            candidates.append(os.path.join(directory, JAVA_EXECUTABLE))
+    patterns = []
+    home = os.path.expanduser("~")
+    if platform.system() == "Windows":
+        for program_files in {os.getenv("ProgramFiles", "C:\\Program Files"), os.getenv("ProgramFiles(x86)", "C:\\Program Files (x86)")}:
+            for vendor in ("Java", "Eclipse Adoptium", "Eclipse Foundation", "AdoptOpenJDK", "Zulu", "Microsoft", "BellSoft", "Amazon Corretto", "Semeru"):
+                patterns.append(os.path.join(program_files, vendor, "*", "bin", JAVA_EXECUTABLE))
+        # The runtimes of the official launcher
+        patterns.append(os.path.join(os.getenv("LOCALAPPDATA", home), "Packages", "Microsoft.4297127D64EC6_*", "LocalCache", "Local", "runtime", "*", "*", "*", "bin", JAVA_EXECUTABLE))
+        patterns.append(os.path.join(os.getenv("ProgramFiles(x86)", "C:\\Program Files (x86)"), "Minecraft Launcher", "runtime", "*", "*", "*", "bin", JAVA_EXECUTABLE))
+    elif platform.system() == "Darwin":
+        patterns.append("/Library/Java/JavaVirtualMachines/*/Contents/Home/bin/java")
+        patterns.append(os.path.join(home, "Library", "Java", "JavaVirtualMachines", "*", "Contents", "Home", "bin", "java"))
+        patterns.append("/opt/homebrew/opt/openjdk*/bin/java")
+    else:
+        patterns.append("/usr/lib/jvm/*/bin/java")
+        patterns.append("/usr/lib/jvm/*/jre/bin/java")
+        patterns.append("/usr/java/*/bin/java")
+        patterns.append("/opt/*/bin/java")
+    patterns.append(os.path.join(home, ".jdks", "*", "bin", JAVA_EXECUTABLE))
+    patterns.append(os.path.join(home, ".sdkman", "candidates", "java", "*", "bin", JAVA_EXECUTABLE))
+    if minecraft_directory is not None:
+        # The runtimes installed by minecraft_launcher_lib
+        runtime_dir = os.path.join(str(minecraft_directory), "runtime")
+        patterns.append(os.path.join(runtime_dir, "*", "*", "*", "bin", JAVA_EXECUTABLE))
+        patterns.append(os.path.join(runtime_dir, "*", "*", "*", "jre.bundle", "Contents", "Home", "bin", JAVA_EXECUTABLE))
+    for pattern in patterns:
+        candidates.extend(sorted(glob.glob(pattern)))
+    return candidates
+
+
+def _crawl_java_paths(start_dir: str, max_depth: int = 8) -> List[str]:
+    """
+    Searches a directory tree for java executables. Directories that can't contain a JDK are pruned and the crawl doesn't descend into a found JDK.
+    """
+    java_paths = []
+    start_depth = start_dir.rstrip(os.sep).count(os.sep)
+    for root, dirs, files in os.walk(start_dir):
+        if os.path.basename(root).lower() == "bin" and JAVA_EXECUTABLE in files:
+            java_paths.append(os.path.join(root, JAVA_EXECUTABLE))
+        if os.path.isfile(os.path.join(root, "bin", JAVA_EXECUTABLE)):
+            # This is a java home, only bin is interesting
+            dirs[:] = [i for i in dirs if i == "bin"]
+            continue
+        if root.count(os.sep) - start_depth >= max_depth:
+            dirs[:] = []
+            continue
+        dirs[:] = [i for i in dirs if i.lower() not in PRUNED_DIRECTORIES and not i.startswith(".")]
     return java_paths
+
+
+def find_java_runtimes(minecraft_directory: Optional[Union[str, os.PathLike]] = None, start_dirs: Optional[List[str]] = None) -> List[JavaRuntime]:
+    """
+    Returns all java runtimes in the known locations and, if given, below start_dirs
+    """
+    candidates = _get_known_java_paths(minecraft_directory)
+    for start_dir in start_dirs or []:
+        if os.path.isdir(start_dir):
+            candidates.extend(_crawl_java_paths(start_dir))
+    runtimes = []
+    seen = set()
+    for candidate in candidates:
+        if not os.path.isfile(candidate):
+            continue
+        real_path = os.path.realpath(candidate)
+        if real_path in seen:
+            continue
+        seen.add(real_path)
+        runtime = get_java_runtime(real_path)
+        if runtime is not None:
+            runtimes.append(runtime)
+    return runtimes
+
+
+def find_java_path(start_dirs=None):
+    """
+    Returns the paths of all java executables in the known locations and, if given, below start_dirs
+    """
+    return [i["path"] for i in find_java_runtimes(start_dirs=start_dirs)]
+
+
+def _fits(major: int, required: int, allow_newer: bool) -> bool:
+    return major == required or (allow_newer and major > required)
+
+
+def get_best_java(java_version: Optional[Dict[str, Any]], minecraft_directory: Optional[Union[str, os.PathLike]] = None, allow_newer: Optional[bool] = None) -> Optional[str]:
+    """
+    Returns the java executable that fits the javaVersion of a version.json best.
+    Versions without javaVersion need Java 8. Returns None if no fitting java was found.
+    A newer java than the required one is only used if allow_newer is True. By default that is only the case for versions that need Java 17 or newer,
+    because older versions often break on newer Java.
+    """
+    if java_version is None:
+        java_version = {"majorVersion": 8}
+    if minecraft_directory is not None and "component" in java_version:
+        java_path = get_executable_path(java_version["component"], minecraft_directory)
+        if java_path is not None:
+            return java_path
+    required = java_version.get("majorVersion", 8)
+    if allow_newer is None:
+        allow_newer = required >= 17
+    host_arch = _normalize_arch(platform.machine())
+    with _index_lock:
+        indexed = list(_load_index().values())
+    runtimes = [i for i in indexed if os.path.isfile(i["path"])]
+    if not any(_fits(i["major"], required, allow_newer) for i in runtimes):
+        runtimes = find_java_runtimes(minecraft_directory)
+    candidates = [i for i in runtimes if _fits(i["major"], required, allow_newer)]
+    # Prefer the exact version, then the closest newer one, then the native architecture
+    candidates.sort(key=lambda i: (i["major"] != required, i["major"], i["arch"] not in ("", host_arch)))
+    for candidate in candidates:
+        # Make sure the java wasn't replaced since it was indexed
+        runtime = get_java_runtime(candidate["path"])
+        if runtime is not None and _fits(runtime["major"], required, allow_newer):
+            return runtime["path"]
+    return None
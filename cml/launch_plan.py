@@ -0,0 +1,374 @@
+import minecraft_launcher_lib.command
+import minecraft_launcher_lib.helper
+from minecraft_launcher_lib.helper import get_classpath_separator
+from minecraft_launcher_lib.exceptions import VersionNotFound
+from minecraft_launcher_lib.runtime import get_executable_path
+from minecraft_launcher_lib.types import MinecraftOptions
+from typing import Dict, List, Any, Callable, Union, Optional, Tuple
+from cml.utils import get_cml_directory, write_json_atomic
+from cml.java import get_best_java, get_java_runtime
+from cml import events, maven, profiles
+import threading
+import platform
+import zipfile
+import hashlib
+import pathlib
+import shutil
+import json
+import copy
+import io
+import re
+import os
+
+__all__ = ["get_launch_plan", "build_command", "invalidate_launch_plan", "get_java_info"]
+
+PLAN_FORMAT = 2
+
+# Options that are applied when the command is built and never end up in a template
+_RUNTIME_OPTIONS = ("executablePath", "defaultExecutablePath", "jvmArguments", "server", "port", "disableMultiplayer", "disableChat", "classpath", "argumentFile", "launchProfile")
+
+_PLACEHOLDER_REGEX = re.compile(r"\$\{cml:(\w+)\}")
+
+_plans: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_plans_lock = threading.Lock()
+# One lock per plan, held while a template is added and the plan is saved
+_template_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+
+def _placeholder(key: str) -> str:
+    return "${cml:" + key + "}"
+
+
+def _get_plan_path(path: str, version: str) -> str:
+    return os.path.join(get_cml_directory(path), "launch-plans", version + ".json")
+
+
+def _get_options_shape(options: MinecraftOptions) -> str:
+    """
+    Returns a key that describes which options are set, but not the values of the string options.
+    Options with the same shape share a template. All other values are part of the template, so they are part of the key too.
+    """
+    shape = []
+    for key in sorted(options.keys()):
+        if key in _RUNTIME_OPTIONS:
+            continue
+        value = options[key]
+        if isinstance(value, str):
+            shape.append(key)
+        else:
+            shape.append(key + "=" + json.dumps(value, sort_keys=True))
+    return ",".join(shape)
+
+
+def _read_version_chain(version: str, path: str) -> Tuple[Dict[str, Any], List[List[Any]]]:
+    """
+    Reads the version json and records mtime, size and sha1 of every json in the inheritsFrom chain
+    """
+    chain = []
+    data = None
+    current = version
+    while current is not None:
+        json_path = os.path.join(path, "versions", current, current + ".json")
+        stat = os.stat(json_path)
+        with open(json_path, "rb") as f:
+            content = f.read()
+        chain.append([json_path, stat.st_mtime_ns, stat.st_size, hashlib.sha1(content).hexdigest()])
+        current_data = json.loads(content)
+        if data is None:
+            data = current_data
+        current = current_data.get("inheritsFrom")
+    return data, chain
+
+
+def _is_chain_valid(chain: List[List[Any]]) -> bool:
+    """
+    Checks if all files of the chain are unchanged. Files with a new mtime are hashed again.
+    """
+    for entry in chain:
+        json_path, mtime, size, sha1 = entry
+        try:
+            stat = os.stat(json_path)
+        except OSError:
+            return False
+        if stat.st_mtime_ns == mtime and stat.st_size == size:
+            continue
+        if stat.st_size != size or minecraft_launcher_lib.helper.get_sha1_hash(json_path) != sha1:
+            return False
+        # Only touched, the content is the same
+        entry[1] = stat.st_mtime_ns
+    return True
+
+
+def _get_classpath(data: Dict[str, Any], path: str) -> str:
+    """
+    Same as minecraft_launcher_lib.command.get_libraries(), but the native classifiers are found without starting a process for every library
+    """
+    jar = data.get("jar", data["id"])
+    entries = maven.get_classpath_entries(data["libraries"], path)
+    entries.append(os.path.join(path, "versions", jar, jar + ".jar"))
+    return get_classpath_separator().join(entries)
+
+
+def _create_plan(version: str, path: str) -> Dict[str, Any]:
+    data, chain = _read_version_chain(version, path)
+    if "inheritsFrom" in data:
+        data = minecraft_launcher_lib.helper.inherit_json(data, path)
+    plan = {
+        "format": PLAN_FORMAT,
+        "version": version,
+        "chain": chain,
+        "data": data,
+        "classpath": _get_classpath(data, path),
+        "templates": {},
+    }
+    if "logging" in data and len(data["logging"]) != 0:
+        logger_file = os.path.join(path, "assets", "log_configs", data["logging"]["client"]["file"]["id"])
+        plan["loggingArgument"] = data["logging"]["client"]["argument"].replace("${path}", logger_file)
+    return plan
+
+
+def _create_template(plan: Dict[str, Any], path: str, options: MinecraftOptions) -> Dict[str, List[str]]:
+    """
+    Builds the JVM and game arguments with placeholders for all user specific values
+    """
+    data = plan["data"]
+    template_options = {}
+    for key, value in options.items():
+        if key in _RUNTIME_OPTIONS:
+            continue
+        if isinstance(value, str):
+            template_options[key] = _placeholder(key)
+        else:
+            template_options[key] = value
+    template_options["nativesDirectory"] = _placeholder("nativesDirectory")
+    template_options["classpath"] = plan["classpath"]
+    if isinstance(data.get("arguments", None), dict) and "jvm" in data["arguments"]:
+        jvm = minecraft_launcher_lib.command.get_arguments(data["arguments"]["jvm"], data, path, template_options)
+    else:
+        jvm = ["-Djava.library.path=" + template_options["nativesDirectory"], "-cp", plan["classpath"]]
+    if "minecraftArguments" in data:
+        # For older versions
+        game = minecraft_launcher_lib.command.get_arguments_string(data, path, template_options)
+    else:
+        game = minecraft_launcher_lib.command.get_arguments(data["arguments"]["game"], data, path, template_options)
+    return {"jvm": jvm, "game": game}
+
+
+def _get_template_lock(path: str, version: str) -> threading.Lock:
+    with _plans_lock:
+        return _template_locks.setdefault((path, version), threading.Lock())
+
+
+def _save_plan(path: str, plan: Dict[str, Any]) -> None:
+    try:
+        write_json_atomic(_get_plan_path(path, plan["version"]), plan)
+    except OSError:
+        # The cache is only an optimisation
+        pass
+
+
+def _load_plan(path: str, version: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_get_plan_path(path, version), "r", encoding="utf-8") as f:
+            plan = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if plan.get("format") != PLAN_FORMAT:
+        return None
+    return plan
+
+
+def get_launch_plan(version: str, minecraft_directory: Union[str, os.PathLike]) -> Dict[str, Any]:
+    """
+    Returns the launch plan of a version. The plan is taken from the memory or disk cache, as long as no version json of the inheritsFrom chain has changed.
+    """
+    path = str(minecraft_directory)
+    if not os.path.isdir(os.path.join(path, "versions", version)):
+        raise VersionNotFound(version)
+    with events.phase("launch.resolve", version=version) as info:
+        plan, info["source"] = _get_launch_plan(version, path)
+    return plan
+
+
+def _get_launch_plan(version: str, path: str) -> Tuple[Dict[str, Any], str]:
+    with _plans_lock:
+        plan = _plans.get((path, version))
+    source = "memory"
+    if plan is None:
+        plan = _load_plan(path, version)
+        source = "disk"
+    if plan is not None and _is_chain_valid(plan["chain"]):
+        with _plans_lock:
+            _plans[(path, version)] = plan
+        return plan, source
+    plan = _create_plan(version, path)
+    _save_plan(path, plan)
+    with _plans_lock:
+        _plans[(path, version)] = plan
+    return plan, "created"
+
+
+def invalidate_launch_plan(minecraft_directory: Union[str, os.PathLike], version: Optional[str] = None) -> None:
+    """
+    Removes the cached launch plan of the given version. If no version is given, all plans of the directory are removed.
+    """
+    path = str(minecraft_directory)
+    with _plans_lock:
+        for key in list(_plans.keys()):
+            if key[0] == path and (version is None or key[1] == version):
+                del _plans[key]
+    plan_dir = os.path.join(get_cml_directory(path), "launch-plans")
+    if version is None:
+        names = os.listdir(plan_dir) if os.path.isdir(plan_dir) else []
+    else:
+        names = [version + ".json"]
+    for name in names:
+        try:
+            os.remove(os.path.join(plan_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def _quote_argument(argument: str) -> str:
+    """
+    Quotes an argument for a java @argfile
+    """
+    return '"' + argument.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+
+def _create_classpath_jar(entries: List[str]) -> bytes:
+    """
+    Returns a jar that only has a manifest with the classpath, for java versions that don't know @argfiles
+    """
+    urls = []
+    for i in entries:
+        url = pathlib.Path(i).as_uri()
+        if os.path.isdir(i):
+            url += "/"
+        urls.append(url)
+    # Manifest lines can only be 72 bytes long, longer lines continue on the next line after a space
+    line = "Class-Path: " + " ".join(urls)
+    lines = [line[:72]] + [" " + line[i:i + 71] for i in range(72, len(line), 71)]
+    manifest = "Manifest-Version: 1.0\r\n" + "\r\n".join(lines) + "\r\nCreated-By: cml\r\n\r\n"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr(zipfile.ZipInfo("META-INF/MANIFEST.MF", (1980, 1, 1, 0, 0, 0)), manifest)
+    return buffer.getvalue()
+
+
+def _get_cached_file(directory: str, version: str, key: str, extension: str, create: Callable[[], bytes]) -> str:
+    """
+    Returns <directory>/<version>-<hash of key><extension>. The file is only written if it doesn't exist yet, older files of the version are removed then.
+    """
+    file_path = os.path.join(directory, "{}-{}{}".format(version, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16], extension))
+    if os.path.isfile(file_path):
+        return file_path
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = "{}.{}-{}.tmp".format(file_path, os.getpid(), threading.get_ident())
+    with open(tmp_path, "wb") as f:
+        f.write(create())
+    os.replace(tmp_path, file_path)
+    old_regex = re.compile(re.escape(version) + r"-[0-9a-f]{16}" + re.escape(extension) + "$")
+    for name in os.listdir(directory):
+        if old_regex.match(name) and name != os.path.basename(file_path):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                # Still used by a running game on Windows
+                pass
+    return file_path
+
+
+def get_java_info(java: str, data: Dict[str, Any]) -> Tuple[int, str]:
+    """
+    Returns the major version and the vendor of a java executable
+    """
+    executable = java if os.path.dirname(java) else shutil.which(java)
+    runtime = get_java_runtime(executable) if executable else None
+    if runtime is not None:
+        return runtime["major"], runtime["vendor"]
+    # The java can't be asked, so trust the version json
+    return data.get("javaVersion", {}).get("majorVersion", 8), ""
+
+
+def _get_short_jvm_arguments(plan: Dict[str, Any], path: str, java: str, jvm: List[str]) -> List[str]:
+    """
+    Moves the JVM arguments into a cached @argfile. Java 8 doesn't know @argfiles, so it gets a jar with the classpath in its manifest instead.
+    """
+    directory = os.path.join(get_cml_directory(path), "argfiles")
+    version = plan["data"]["id"]
+    if get_java_info(java, plan["data"])[0] >= 9:
+        content = "".join(_quote_argument(i) + "\n" for i in jvm)
+        # Java reads the file in the system encoding, which is only safe for ASCII on Windows
+        if content.isascii() or platform.system() != "Windows":
+            return ["@" + _get_cached_file(directory, version, content, ".args", lambda: content.encode("utf-8"))]
+    if plan["classpath"] not in jvm:
+        return jvm
+    entries = [os.path.abspath(i) for i in plan["classpath"].split(get_classpath_separator())]
+    jar_path = _get_cached_file(directory, version, "\n".join(entries), ".jar", lambda: _create_classpath_jar(entries))
+    return [jar_path if i == plan["classpath"] else i for i in jvm]
+
+
+def _get_java_executable(data: Dict[str, Any], path: str, options: MinecraftOptions) -> str:
+    if "executablePath" in options:
+        return options["executablePath"]
+    if "javaVersion" in data:
+        java_path = get_executable_path(data["javaVersion"]["component"], path)
+        if java_path is None:
+            # Look for a fitting java that was not installed by minecraft_launcher_lib
+            return get_best_java(data["javaVersion"], path) or "java"
+        return java_path
+    return options.get("defaultExecutablePath", "java")
+
+
+def build_command(plan: Dict[str, Any], minecraft_directory: Union[str, os.PathLike], options: MinecraftOptions) -> List[str]:
+    """
+    Fills the user specific options into a launch plan and returns the command.
+    With the argumentFile option the JVM arguments are passed in a cached @argfile, so the command stays short for huge modpacks.
+    With the launchProfile option the heap and GC flags of a profile from cml.profiles are added.
+    """
+    path = str(minecraft_directory)
+    data = plan["data"]
+    options = copy.copy(options)
+    options["nativesDirectory"] = options.get("nativesDirectory", os.path.join(path, "versions", data["id"], "natives"))
+    shape = _get_options_shape(options)
+    template = plan["templates"].get(shape)
+    if template is None:
+        template = _create_template(plan, path, options)
+        with _get_template_lock(path, plan["version"]):
+            # Copy on write, so other threads never see the dict change while they read or save it
+            plan["templates"] = dict(plan["templates"], **{shape: template})
+            _save_plan(path, plan)
+    values = {key: value for key, value in options.items() if isinstance(value, str)}
+
+    def fill(match: "re.Match[str]") -> str:
+        return values.get(match.group(1), match.group(0))
+
+    java = _get_java_executable(data, path, options)
+    version_jvm = [_PLACEHOLDER_REGEX.sub(fill, i) for i in template["jvm"]]
+    if "launchProfile" in options:
+        jvm = profiles.apply_profile(options["launchProfile"], options.get("jvmArguments", []), version_jvm, *get_java_info(java, data))
+    else:
+        jvm = list(options.get("jvmArguments", []))
+        jvm.extend(version_jvm)
+    # The argument for the logger file
+    if options.get("enableLoggingConfig", False) and "loggingArgument" in plan:
+        jvm.append(plan["loggingArgument"])
+    command = [java]
+    if options.get("argumentFile", False):
+        command.extend(_get_short_jvm_arguments(plan, path, java, jvm))
+    else:
+        command.extend(jvm)
+    command.append(data["mainClass"])
+    command.extend(_PLACEHOLDER_REGEX.sub(fill, i) for i in template["game"])
+    if "server" in options:
+        command.append("--server")
+        command.append(options["server"])
+        if "port" in options:
+            command.append("--port")
+            command.append(options["port"])
+    if options.get("disableMultiplayer", False):
+        command.append("--disableMultiplayer")
+    if options.get("disableChat", False):
+        command.append("--disableChat")
+    return command
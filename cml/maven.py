@@ -0,0 +1,96 @@
+from typing import Dict, List, Any, Iterable, NamedTuple, Optional, Union
+import functools
+import os
+
+__all__ = ["Coordinate", "parse_coordinate", "get_library_path", "get_library_paths", "get_classpath_entries"]
+
+CACHE_SIZE = 1024 * 64
+
+
+class Coordinate(NamedTuple):
+    """
+    A maven coordinate: group:artifact:version[:classifier][@extension]
+    """
+    group: str
+    artifact: str
+    version: str
+    classifier: Optional[str] = None
+    extension: str = "jar"
+
+    def get_filename(self) -> str:
+        if self.classifier:
+            return f"{self.artifact}-{self.version}-{self.classifier}.{self.extension}"
+        return f"{self.artifact}-{self.version}.{self.extension}"
+
+    def get_relative_path(self) -> str:
+        """
+        Returns the path inside a maven repository, always with / as separator
+        """
+        return "/".join((self.group.replace(".", "/"), self.artifact, self.version, self.get_filename()))
+
+    def __str__(self) -> str:
+        name = f"{self.group}:{self.artifact}:{self.version}"
+        if self.classifier:
+            name += ":" + self.classifier
+        if self.extension != "jar":
+            name += "@" + self.extension
+        return name
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_coordinate(name: str) -> Coordinate:
+    """
+    Parses group:artifact:version[:classifier][@extension]. The [] around the coordinates in the data of an install_profile.json are removed.
+    Raises a ValueError if the name is not a maven coordinate.
+    """
+    if name.startswith("[") and name.endswith("]"):
+        name = name[1:-1]
+    name, _, extension = name.partition("@")
+    parts = name.split(":")
+    if len(parts) < 3 or not all(parts[:3]):
+        raise ValueError(f"{name} is not a maven coordinate")
+    # More than one classifier is joined like minecraft_launcher_lib does it
+    classifier = "-".join(parts[3:]) or None
+    return Coordinate(parts[0], parts[1], parts[2], classifier, extension or "jar")
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def get_library_path(name: str, minecraft_directory: str) -> str:
+    """
+    Returns the path of a library in the libraries directory
+    """
+    return os.path.join(minecraft_directory, "libraries", parse_coordinate(name).get_relative_path().replace("/", os.sep))
+
+
+def get_library_paths(names: Iterable[str], minecraft_directory: Union[str, os.PathLike]) -> List[str]:
+    """
+    Returns the paths of many libraries at once
+    """
+    path = str(minecraft_directory)
+    return [get_library_path(i, path) for i in names]
+
+
+def get_classpath_entries(libraries: List[Dict[str, Any]], minecraft_directory: Union[str, os.PathLike]) -> List[str]:
+    """
+    Returns the jars of the libraries of a version json that are allowed on this system, together with their native jars.
+    Same order as minecraft_launcher_lib.command.get_libraries(), but without the version jar.
+    """
+    # Imported here, so parsing coordinates doesn't load minecraft_launcher_lib
+    from minecraft_launcher_lib.helper import parse_rule_list
+    from cml.natives import get_natives
+    path = str(minecraft_directory)
+    entries = []
+    for i in libraries:
+        if not parse_rule_list(i, "rules", {}):
+            continue
+        entries.append(get_library_path(i["name"], path))
+        native = get_natives(i)
+        if native == "":
+            continue
+        classifier = i.get("downloads", {}).get("classifiers", {}).get(native)
+        if classifier is not None:
+            entries.append(os.path.join(path, "libraries", classifier["path"]))
+        else:
+            coordinate = parse_coordinate(i["name"])._replace(classifier=native, extension="jar")
+            entries.append(os.path.join(path, "libraries", coordinate.get_relative_path().replace("/", os.sep)))
+    return entries
@@ -0,0 +1,307 @@
+from minecraft_launcher_lib.helper import get_user_agent
+from typing import Dict, Any, Callable, Generator, Optional, Tuple, TypeVar
+from cml.utils import get_cache_directory, write_json_atomic
+from cml import mirror
+import threading
+import requests
+import hashlib
+import time
+import json
+import re
+import os
+
+__all__ = ["MetadataUnavailable", "fetch", "fetch_json", "fetch_indexed", "fetch_maven_metadata", "parse_maven_metadata", "set_offline", "is_offline", "get_cache_stats", "reset_cache_stats", "clear_cache"]
+
+DEFAULT_TTL = 60 * 60
+
+T = TypeVar("T")
+
+_offline = os.getenv("CML_OFFLINE", "") not in ("", "0")
+_session: Optional[requests.Session] = None
+_memory: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "revalidated": 0, "stale": 0}
+
+
+class MetadataUnavailable(Exception):
+    def __init__(self, url: str) -> None:
+        self.url = url
+        super().__init__(f"{url} is not cached and can't be fetched")
+
+
+def set_offline(offline: bool) -> None:
+    """
+    In offline mode no requests are made and cached data is used, even if it is outdated
+    """
+    global _offline
+    _offline = offline
+
+
+def is_offline() -> bool:
+    """
+    Checks if the offline mode is enabled
+    """
+    return _offline
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """
+    Returns how often the cache was hit, missed, revalidated with the server or served stale data
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def reset_cache_stats() -> None:
+    """
+    Sets all cache counters to 0
+    """
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+def _get_cache_path(url: str) -> str:
+    return os.path.join(get_cache_directory(), "metadata", hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers["user-agent"] = get_user_agent()
+    return _session
+
+
+def _load_entry(url: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        entry = _memory.get(url)
+    if entry is not None:
+        return entry
+    cache_path = _get_cache_path(url)
+    try:
+        with open(cache_path + ".json", "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        with open(cache_path + ".body", "rb") as f:
+            entry["body"] = f.read()
+    except (OSError, ValueError):
+        return None
+    entry["indexes"] = {}
+    with _lock:
+        _memory[url] = entry
+    return entry
+
+
+def _save_entry(url: str, entry: Dict[str, Any], body_changed: bool) -> None:
+    cache_path = _get_cache_path(url)
+    try:
+        if body_changed:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = "{}.{}-{}.tmp".format(cache_path, os.getpid(), threading.get_ident())
+            with open(tmp_path, "wb") as f:
+                f.write(entry["body"])
+            os.replace(tmp_path, cache_path + ".body")
+        write_json_atomic(cache_path + ".json", {key: value for key, value in entry.items() if key not in ("body", "indexes")})
+    except OSError:
+        # The data is still cached in memory
+        pass
+    with _lock:
+        _memory[url] = entry
+
+
+def _get_cached_entry(url: str, ttl: float) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Returns the cached entry and if it can be used without asking the server
+    """
+    entry = _load_entry(url)
+    # A local mirror can still be read in offline mode
+    offline = _offline and not mirror.is_local_url(mirror.resolve_url(url))
+    if entry is not None:
+        if time.time() - entry["fetched_at"] < ttl:
+            _count("hits")
+            return entry, True
+        if offline:
+            _count("stale")
+            return entry, True
+    if offline:
+        raise MetadataUnavailable(url)
+    return entry, False
+
+
+def _get_revalidation_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _use_stale_entry(entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Called when the server can't be reached. Returns the outdated entry, if there is one.
+    """
+    if entry is not None:
+        _count("stale")
+    return entry
+
+
+def _handle_response(url: str, entry: Optional[Dict[str, Any]], status_code: int, headers: Any, body: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """
+    Updates the cache with the response of the server. Returns None if the response is an error and nothing is cached.
+    """
+    if status_code == 304 and entry is not None:
+        _count("revalidated")
+        entry["fetched_at"] = time.time()
+        _save_entry(url, entry, False)
+        return entry
+    if status_code != 200:
+        return _use_stale_entry(entry)
+    _count("misses")
+    new_entry = {
+        "url": url,
+        "fetched_at": time.time(),
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "body": body,
+        "indexes": {},
+    }
+    _save_entry(url, new_entry, True)
+    return new_entry
+
+
+def _read_local_entry(url: str, local_url: str, entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        with open(mirror.get_local_path(local_url), "rb") as f:
+            body = f.read()
+    except OSError:
+        if entry is None:
+            raise MetadataUnavailable(url) from None
+        return _use_stale_entry(entry)
+    if entry is not None and entry["body"] == body:
+        return _handle_response(url, entry, 304, {}, None)
+    return _handle_response(url, entry, 200, {}, body)
+
+
+def _request_steps(url: str, ttl: float) -> Generator[Tuple[str, Dict[str, str]], Tuple[int, Any, Optional[bytes]], Optional[Dict[str, Any]]]:
+    """
+    Everything of a request except sending it, so the requests of this module and of cml.aio share it.
+    Yields the url and the headers to request and gets (status code, headers, body) back. If the server can't be reached, the error is thrown in.
+    Returns the entry or None if the server answered with an error and nothing is cached.
+    """
+    entry, fresh = _get_cached_entry(url, ttl)
+    if fresh:
+        return entry
+    resolved_url = mirror.resolve_url(url)
+    if mirror.is_local_url(resolved_url):
+        return _read_local_entry(url, resolved_url, entry)
+    try:
+        status_code, headers, body = yield resolved_url, _get_revalidation_headers(entry)
+    except Exception:
+        # Only errors of the request itself are thrown in
+        if entry is None:
+            raise
+        return _use_stale_entry(entry)
+    return _handle_response(url, entry, status_code, headers, body)
+
+
+def _advance(steps: Generator, response: Optional[Tuple[int, Any, Optional[bytes]]] = None, error: Optional[Exception] = None) -> Tuple[bool, Any]:
+    """
+    Runs the steps of a request until they need the response. Returns (True, entry) once they are done or (False, (url, headers)).
+    """
+    try:
+        if error is not None:
+            return False, steps.throw(error)
+        return False, steps.send(response)
+    except StopIteration as e:
+        return True, e.value
+
+
+def _get_entry(url: str, ttl: float) -> Dict[str, Any]:
+    entry, fresh = _get_cached_entry(url, ttl)
+    if fresh:
+        # The hot path of every lookup, so it doesn't start the steps of a request
+        return entry
+    steps = _request_steps(url, ttl)
+    done, result = _advance(steps)
+    if done:
+        return result
+    request_url, headers = result
+    try:
+        r = _get_session().get(request_url, headers=headers, timeout=30)
+    except requests.RequestException as e:
+        return _advance(steps, error=e)[1]
+    _, result = _advance(steps, (r.status_code, r.headers, r.content if r.status_code == 200 else None))
+    if result is None:
+        r.raise_for_status()
+        raise MetadataUnavailable(url)
+    return result
+
+
+def fetch(url: str, ttl: float = DEFAULT_TTL) -> bytes:
+    """
+    Returns the content of url. The content is cached on disk and revalidated with ETag and If-Modified-Since once it is older than ttl seconds.
+    If the server can't be reached, the cached content is returned even if it is outdated.
+    """
+    return _get_entry(url, ttl)["body"]
+
+
+def fetch_json(url: str, ttl: float = DEFAULT_TTL) -> Any:
+    """
+    Same as fetch(), but returns the parsed json. The parsed data is shared, so don't modify it.
+    """
+    return fetch_indexed(url, json.loads, ttl)
+
+
+def fetch_indexed(url: str, builder: Callable[[bytes], T], ttl: float = DEFAULT_TTL) -> T:
+    """
+    Returns builder(content of url). The result is kept until the content changes, so builder can prebuild lookup tables.
+    """
+    return _get_index(_get_entry(url, ttl), builder)
+
+
+def _get_index(entry: Dict[str, Any], builder: Callable[[bytes], T]) -> T:
+    indexes = entry["indexes"]
+    if builder not in indexes:
+        indexes[builder] = builder(entry["body"])
+    return indexes[builder]
+
+
+def parse_maven_metadata(content: bytes) -> Dict[str, Any]:
+    """
+    Parses the content of a maven-metadata.xml
+    """
+    text = content.decode("utf-8")
+    # The structure of the metadata file is simple. So you don't need a XML parser. It can be parsed using RegEx.
+    release = re.search("(?<=<release>).*?(?=</release>)", text)
+    latest = re.search("(?<=<latest>).*?(?=</latest>)", text)
+    return {
+        "release": release.group() if release else None,
+        "latest": latest.group() if latest else None,
+        "versions": re.findall("(?<=<version>).*?(?=</version>)", text),
+    }
+
+
+def fetch_maven_metadata(url: str, ttl: float = DEFAULT_TTL) -> Dict[str, Any]:
+    """
+    Returns the release, latest and versions of a maven-metadata.xml
+    """
+    return fetch_indexed(url, parse_maven_metadata, ttl)
+
+
+def clear_cache() -> None:
+    """
+    Removes all cached metadata
+    """
+    with _lock:
+        _memory.clear()
+    cache_dir = os.path.join(get_cache_directory(), "metadata")
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
@@ -0,0 +1,295 @@
+from minecraft_launcher_lib.types import CallbackDict
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple, TypedDict, Union
+from cml.utils import write_json_atomic
+import urllib.request
+import urllib.parse
+import posixpath
+import requests
+import threading
+import pathlib
+import hashlib
+import shutil
+import json
+import time
+import re
+import os
+
+__all__ = ["MirrorManifest", "MirrorResolver", "HttpResolver", "set_resolver", "get_resolver", "use_mirror", "resolve_url", "is_local_url", "get_local_path", "get_mirror_path", "load_manifest", "mirror_sync"]
+
+MANIFEST_FILENAME = "mirror.json"
+MANIFEST_FORMAT = 1
+
+Resolver = Callable[[str], str]
+
+# Files like jars have an extension. Urls like /v2/versions/loader are also directories of other urls, so their files get an @.
+_EXTENSION_REGEX = re.compile(r"\.[A-Za-z][A-Za-z0-9]*$")
+
+
+class MirrorManifest(TypedDict):
+    format: int
+    updated_at: float
+    versions: List[str]
+    forge: List[str]
+    fabric: List[str]
+    files: Dict[str, Dict[str, Any]]
+
+
+def _get_relative_path(url: str) -> str:
+    parsed = urllib.parse.urlparse(url)
+    path = posixpath.normpath("/" + urllib.parse.unquote(parsed.path)).lstrip("/")
+    if not _EXTENSION_REGEX.search(path):
+        path += "@"
+    # Ports can't be part of a directory name on Windows
+    return parsed.netloc.replace(":", "_") + "/" + path
+
+
+def get_mirror_path(mirror_directory: Union[str, os.PathLike], url: str) -> str:
+    """
+    Returns where the file of url is stored in a mirror: <mirror>/<host>/<path>. Files without an extension get an @ at the end.
+    """
+    return os.path.join(str(mirror_directory), *_get_relative_path(url).split("/"))
+
+
+class MirrorResolver:
+    """
+    Serves every url from a local mirror directory. If strict is False, urls that are not in the mirror are left unchanged.
+    """
+    def __init__(self, mirror_directory: Union[str, os.PathLike], strict: bool = True) -> None:
+        self.mirror_directory = os.path.abspath(str(mirror_directory))
+        self.strict = strict
+
+    def __call__(self, url: str) -> str:
+        if is_local_url(url):
+            return url
+        path = get_mirror_path(self.mirror_directory, url)
+        if not self.strict and not os.path.isfile(path):
+            return url
+        return pathlib.Path(path).as_uri()
+
+
+class HttpResolver:
+    """
+    Serves every url from a HTTP server that serves a mirror directory, e.g. python -m http.server in the mirror
+    """
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+
+    def __call__(self, url: str) -> str:
+        if is_local_url(url) or url.startswith(self.base_url + "/"):
+            return url
+        return self.base_url + "/" + urllib.parse.quote(_get_relative_path(url))
+
+
+def _get_env_resolver() -> Optional[Resolver]:
+    location = os.getenv("CML_MIRROR")
+    if not location:
+        return None
+    if "://" in location and not location.startswith("file:"):
+        return HttpResolver(location)
+    return MirrorResolver(get_local_path(location) if location.startswith("file:") else location)
+
+
+_resolver: Optional[Resolver] = _get_env_resolver()
+
+
+def set_resolver(resolver: Optional[Resolver]) -> None:
+    """
+    Sets the function that maps the url of every download and metadata request to the url that is really used. None disables it.
+    The CML_MIRROR environment variable sets a mirror directory or the url of a HTTP mirror at startup.
+    """
+    global _resolver
+    _resolver = resolver
+
+
+def get_resolver() -> Optional[Resolver]:
+    """
+    Returns the current resolver or None
+    """
+    return _resolver
+
+
+def use_mirror(location: Union[str, os.PathLike], strict: bool = True) -> Resolver:
+    """
+    Serves everything from a mirror directory or the url of a HTTP mirror. Returns the new resolver.
+    """
+    location = str(location)
+    if "://" in location and not location.startswith("file:"):
+        resolver: Resolver = HttpResolver(location)
+    else:
+        resolver = MirrorResolver(get_local_path(location) if location.startswith("file:") else location, strict)
+    set_resolver(resolver)
+    return resolver
+
+
+def resolve_url(url: str) -> str:
+    """
+    Returns the url that is used to download url
+    """
+    if _resolver is None:
+        return url
+    return _resolver(url)
+
+
+def is_local_url(url: str) -> bool:
+    return url.startswith("file:")
+
+
+def get_local_path(url: str) -> str:
+    """
+    Returns the path of a file: url
+    """
+    return urllib.request.url2pathname(urllib.parse.urlparse(url).path)
+
+
+def get_manifest_path(mirror_directory: Union[str, os.PathLike]) -> str:
+    return os.path.join(str(mirror_directory), MANIFEST_FILENAME)
+
+
+def load_manifest(mirror_directory: Union[str, os.PathLike]) -> MirrorManifest:
+    """
+    Returns the manifest of a mirror. An empty manifest is returned if the mirror doesn't exist yet.
+    """
+    try:
+        with open(get_manifest_path(mirror_directory), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    if data.get("format") != MANIFEST_FORMAT:
+        data = {"format": MANIFEST_FORMAT}
+    data.setdefault("updated_at", 0)
+    for key in ("versions", "forge", "fabric"):
+        data.setdefault(key, [])
+    data.setdefault("files", {})
+    return data
+
+
+def _get_sha1(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 256), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _copy_file(source: str, destination: str) -> None:
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    tmp_path = "{}.{}-{}.tmp".format(destination, os.getpid(), threading.get_ident())
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+def mirror_sync(mirror_directory: Union[str, os.PathLike], versions: Iterable[str] = (), forge_versions: Iterable[str] = (), fabric_versions: Iterable[Union[str, Tuple[str, Optional[str]]]] = (), mod_catalog: bool = False, callback: Optional[CallbackDict] = None, max_workers: Optional[int] = None) -> MirrorManifest:
+    """
+    Downloads the given Minecraft versions, forge versions and fabric versions with everything they need into a mirror directory.
+    fabric_versions contains Minecraft versions or (Minecraft version, loader version) tuples. Files that are already in the mirror are kept.
+    The files are stored as <mirror>/<host>/<path> and listed in mirror.json. Returns the manifest.
+    Asset objects are mirrored by their hash. The virtual and map_to_resources layouts of versions before 1.7 are not part of the mirror,
+    they would have to be built from the objects in the minecraft directory, which neither cml nor minecraft_launcher_lib does.
+    """
+    # Imported here, because all of them download through this module
+    from cml.downloader import DownloadTask, download_files, download_task, create_session, DEFAULT_WORKERS
+    from cml.install import VERSION_MANIFEST_URL, get_version_manifest_entry, get_version_downloads, get_library_downloads
+    from cml import forge, fabric, metadata, mod, events
+    path = os.path.abspath(str(mirror_directory))
+    # The version jsons are resolved in a minecraft directory inside the mirror
+    work_directory = os.path.join(path, ".work")
+    session = create_session(max_workers or DEFAULT_WORKERS)
+    manifest = load_manifest(path)
+    tasks: Dict[str, DownloadTask] = {}
+    metadata_urls: List[str] = []
+    # Metadata that not every server has
+    optional_urls = set()
+
+    def add(task: DownloadTask) -> None:
+        tasks.setdefault(task.url, task)
+
+    def add_version(versionid: str) -> None:
+        for i in get_version_downloads(versionid, work_directory, session=session):
+            add(i)
+        # The jsons of the version and the versions it inherits from
+        current: Optional[str] = versionid
+        while current is not None:
+            with open(os.path.join(work_directory, "versions", current, current + ".json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entry = get_version_manifest_entry(current)
+            if entry is not None:
+                add(DownloadTask(entry["url"], "", entry["sha1"]))
+            if "assetIndex" in data:
+                add(DownloadTask(data["assetIndex"]["url"], "", data["assetIndex"]["sha1"], data["assetIndex"].get("size")))
+            current = data.get("inheritsFrom")
+
+    with events.phase("mirror.sync") as info:
+        metadata_urls.append(VERSION_MANIFEST_URL)
+        for versionid in versions:
+            add_version(versionid)
+            manifest["versions"].append(versionid)
+        for versionid in forge_versions:
+            metadata_urls.append(forge.MAVEN_METADATA_URL)
+            installer_url = forge.FORGE_DOWNLOAD_URL.format(version=versionid)
+            metadata_urls.append(installer_url + ".sha1")
+            optional_urls.add(installer_url + ".sha1")
+            installer_path = forge.get_forge_installer(versionid, callback)
+            installer_sha1 = _get_sha1(installer_path)
+            # The installer is already in the cache, so it is copied and download_files() only checks it
+            mirror_installer_path = get_mirror_path(path, installer_url)
+            if not os.path.isfile(mirror_installer_path) or _get_sha1(mirror_installer_path) != installer_sha1:
+                _copy_file(installer_path, mirror_installer_path)
+            add(DownloadTask(installer_url, "", installer_sha1))
+            with forge._open_installer(installer_path) as zf:
+                with zf.open("install_profile.json", "r") as f:
+                    version_data = json.load(f)
+                forge.extract_file(zf, "version.json", os.path.join(work_directory, "versions", version_data["version"], version_data["version"] + ".json"))
+            for i in get_library_downloads(version_data, work_directory):
+                add(i)
+            add_version(version_data["minecraft"])
+            add_version(version_data["version"])
+            manifest["forge"].append(versionid)
+        for i in fabric_versions:
+            minecraft_version, loader_version = (i, None) if isinstance(i, str) else i
+            metadata_urls.extend((fabric.FABRIC_MINECARFT_VERSIONS_URL, fabric.FABRIC_LOADER_VERSIONS_URL, fabric.FABRIC_INSTALLER_MAVEN_URL))
+            loader_version = loader_version or fabric.get_latest_loader_version()
+            installer_version = fabric.get_latest_installer_version()
+            add(DownloadTask(fabric.FABRIC_INSTALLER_DOWNLOAD_URL.format(version=installer_version), ""))
+            fabric_version = f"fabric-loader-{loader_version}-{minecraft_version}"
+            profile_url = fabric.FABRIC_PROFILE_URL.format(minecraft_version=minecraft_version, loader_version=loader_version)
+            metadata_urls.append(profile_url)
+            download_task(DownloadTask(profile_url, os.path.join(work_directory, "versions", fabric_version, fabric_version + ".json")), session=session)
+            add_version(fabric_version)
+            manifest["fabric"].append(fabric_version)
+        if mod_catalog and "://" in mod.get_catalog_url() and not mod.get_catalog_url().startswith("file:"):
+            metadata_urls.append(mod.get_catalog_url())
+        # Metadata changes, so it is always fetched again
+        for url in dict.fromkeys(metadata_urls):
+            try:
+                content = metadata.fetch(url, ttl=0)
+            except (requests.RequestException, metadata.MetadataUnavailable):
+                if url not in optional_urls:
+                    raise
+                continue
+            write_path = get_mirror_path(path, url)
+            os.makedirs(os.path.dirname(write_path), exist_ok=True)
+            tmp_path = write_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, write_path)
+            tasks.pop(url, None)
+        mirror_tasks = [DownloadTask(i.url, get_mirror_path(path, i.url), i.sha1, i.size, i.optional) for i in tasks.values() if i.url]
+        info["files"] = len(mirror_tasks) + len(metadata_urls)
+        info["downloaded"] = download_files(mirror_tasks, callback=callback, max_workers=max_workers or DEFAULT_WORKERS, session=session)
+    for url in list(dict.fromkeys(metadata_urls)) + [i.url for i in mirror_tasks]:
+        file_path = get_mirror_path(path, url)
+        if not os.path.isfile(file_path):
+            # An optional file that doesn't exist
+            continue
+        relative = os.path.relpath(file_path, path).replace(os.sep, "/")
+        known = manifest["files"].get(relative)
+        size = os.path.getsize(file_path)
+        if known is None or known["size"] != size or url in metadata_urls:
+            sha1 = tasks[url].sha1 if url in tasks else None
+            known = {"url": url, "sha1": sha1 or _get_sha1(file_path), "size": size}
+        manifest["files"][relative] = known
+    for key in ("versions", "forge", "fabric"):
+        manifest[key] = list(dict.fromkeys(manifest[key]))
+    manifest["updated_at"] = time.time()
+    write_json_atomic(get_manifest_path(path), manifest)
+    return manifest
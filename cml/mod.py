@@ -1,16 +1,213 @@
-def get_forge_mod():
-    import requests as w
-    json=w.get('https://fanghuangxu.github.io/mcl_mod/mod.json')
-    json=json.json()
-    mod_list=[]
-    for mod in json['forge']:
-        mod_list.append(mod)
-    return mod_list
-def get_fabric_mod():
-    import requests as w
-    json=w.get('https://fanghuangxu.github.io/mcl_mod/mod.json')
-    json=json.json()
-    mod_list=[]
-    for mod in json['fabric']:
-        mod_list.append(mod)
-    return mod_list
+from typing import Dict, List, Any, Union, Optional, TypedDict
+from minecraft_launcher_lib.types import CallbackDict
+from cml.downloader import DownloadTask, download_files, DEFAULT_WORKERS
+from cml.utils import get_cache_directory
+from cml import metadata
+import urllib.request
+import urllib.parse
+import contextlib
+import threading
+import hashlib
+import sqlite3
+import json
+import os
+
+__all__ = ["ModEntry", "get_forge_mod", "get_fabric_mod", "get_catalog_url", "sync_catalog", "query_mods", "count_mods", "download_mods"]
+
+CATALOG_URL = "https://fanghuangxu.github.io/mcl_mod/mod.json"
+
+LOADERS = ("forge", "fabric")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS mods (id INTEGER PRIMARY KEY, loader TEXT NOT NULL, name TEXT NOT NULL, url TEXT, filename TEXT, sha1 TEXT, size INTEGER, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS mod_game_versions (mod_id INTEGER NOT NULL, game_version TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS mods_loader_name ON mods (loader, name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS mods_name ON mods (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS mod_game_versions_version ON mod_game_versions (game_version, mod_id);
+CREATE INDEX IF NOT EXISTS mod_game_versions_mod ON mod_game_versions (mod_id);
+"""
+
+_sync_lock = threading.Lock()
+
+
+class ModEntry(TypedDict):
+    loader: str
+    name: str
+    url: Optional[str]
+    filename: Optional[str]
+    sha1: Optional[str]
+    size: Optional[int]
+    game_versions: List[str]
+    data: Any
+
+
+def get_catalog_url(catalog_url: Optional[str] = None) -> str:
+    """
+    Returns the catalog that is used. It can be set with the CML_MOD_CATALOG_URL environment variable, which may also be a local file.
+    """
+    return catalog_url or os.getenv("CML_MOD_CATALOG_URL") or CATALOG_URL
+
+
+def _fetch_catalog(catalog_url: str, ttl: float) -> bytes:
+    if catalog_url.startswith("file:"):
+        catalog_url = urllib.request.url2pathname(urllib.parse.urlparse(catalog_url).path)
+    if "://" not in catalog_url:
+        with open(catalog_url, "rb") as f:
+            return f.read()
+    return metadata.fetch(catalog_url, ttl)
+
+
+def _load_catalog(catalog_url: Optional[str] = None) -> Dict[str, Any]:
+    catalog_url = get_catalog_url(catalog_url)
+    if "://" in catalog_url and not catalog_url.startswith("file:"):
+        # The parsed catalog is kept in memory until it changes
+        return metadata.fetch_json(catalog_url)
+    return json.loads(_fetch_catalog(catalog_url, 0))
+
+
+def get_forge_mod(catalog_url: Optional[str] = None):
+    return list(_load_catalog(catalog_url)['forge'])
+
+
+def get_fabric_mod(catalog_url: Optional[str] = None):
+    return list(_load_catalog(catalog_url)['fabric'])
+
+
+def _get_database_path() -> str:
+    return os.path.join(get_cache_directory(), "mod-catalog.sqlite")
+
+
+@contextlib.contextmanager
+def _connect(database_path: Optional[str] = None):
+    database_path = database_path or _get_database_path()
+    os.makedirs(os.path.dirname(database_path), exist_ok=True)
+    connection = sqlite3.connect(database_path, timeout=30)
+    try:
+        connection.executescript(SCHEMA)
+        yield connection
+    finally:
+        connection.close()
+
+
+def _first(mod: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        if mod.get(key) is not None:
+            return mod[key]
+    return None
+
+
+def _normalize_mod(loader: str, mod: Any) -> ModEntry:
+    """
+    Turns an entry of the catalog into a ModEntry. Entries that are only a name are allowed.
+    """
+    if not isinstance(mod, dict):
+        mod = {"name": str(mod)}
+    url = _first(mod, "url", "download", "download_url")
+    filename = _first(mod, "filename", "file")
+    if filename is None and url is not None:
+        filename = urllib.parse.unquote(os.path.basename(urllib.parse.urlparse(url).path)) or None
+    game_versions = _first(mod, "game_versions", "mcversions", "mcversion", "game_version", "versions") or []
+    if isinstance(game_versions, str):
+        game_versions = [game_versions]
+    return {
+        "loader": loader,
+        "name": str(_first(mod, "name", "title", "id") or filename or ""),
+        "url": url,
+        "filename": filename,
+        "sha1": _first(mod, "sha1", "hash"),
+        "size": _first(mod, "size"),
+        "game_versions": [str(i) for i in game_versions],
+        "data": mod,
+    }
+
+
+def sync_catalog(catalog_url: Optional[str] = None, ttl: float = metadata.DEFAULT_TTL, database_path: Optional[str] = None) -> bool:
+    """
+    Fetches the catalog and rebuilds the local index if the catalog changed. Returns True if the index was rebuilt.
+    """
+    catalog_url = get_catalog_url(catalog_url)
+    content = _fetch_catalog(catalog_url, ttl)
+    content_hash = hashlib.sha1(content).hexdigest()
+    with _sync_lock, _connect(database_path) as connection:
+        stored = dict(connection.execute("SELECT key, value FROM catalog").fetchall())
+        if stored.get("url") == catalog_url and stored.get("sha1") == content_hash:
+            return False
+        catalog = json.loads(content)
+        with connection:
+            connection.execute("DELETE FROM mods")
+            connection.execute("DELETE FROM mod_game_versions")
+            mod_id = 0
+            mod_rows = []
+            version_rows = []
+            for loader in LOADERS:
+                for mod in catalog.get(loader, []):
+                    mod_id += 1
+                    entry = _normalize_mod(loader, mod)
+                    mod_rows.append((mod_id, loader, entry["name"], entry["url"], entry["filename"], entry["sha1"], entry["size"], json.dumps(entry["data"])))
+                    version_rows.extend((mod_id, i) for i in entry["game_versions"])
+            connection.executemany("INSERT INTO mods VALUES (?, ?, ?, ?, ?, ?, ?, ?)", mod_rows)
+            connection.executemany("INSERT INTO mod_game_versions VALUES (?, ?)", version_rows)
+            connection.executemany("INSERT OR REPLACE INTO catalog VALUES (?, ?)", [("url", catalog_url), ("sha1", content_hash)])
+    return True
+
+
+def _build_filter(loader: Optional[str], game_version: Optional[str], name: Optional[str]):
+    conditions = []
+    parameters: List[Any] = []
+    if loader is not None:
+        conditions.append("loader = ?")
+        parameters.append(loader)
+    if game_version is not None:
+        conditions.append("id IN (SELECT mod_id FROM mod_game_versions WHERE game_version = ?)")
+        parameters.append(game_version)
+    if name is not None:
+        conditions.append("name LIKE ? ESCAPE '\\'")
+        parameters.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", parameters
+
+
+def query_mods(loader: Optional[str] = None, game_version: Optional[str] = None, name: Optional[str] = None, limit: int = 50, offset: int = 0, sync: bool = True, catalog_url: Optional[str] = None, database_path: Optional[str] = None) -> List[ModEntry]:
+    """
+    Searches the catalog. name matches a part of the name, ignoring the case. Use limit and offset for paging.
+    """
+    if sync:
+        sync_catalog(catalog_url, database_path=database_path)
+    where, parameters = _build_filter(loader, game_version, name)
+    with _connect(database_path) as connection:
+        rows = connection.execute(f"SELECT id, loader, name, url, filename, sha1, size, data FROM mods{where} ORDER BY name COLLATE NOCASE, id LIMIT ? OFFSET ?", parameters + [limit, offset]).fetchall()
+        game_versions: Dict[int, List[str]] = {i[0]: [] for i in rows}
+        mod_ids = list(game_versions)
+        # SQLite limits the number of parameters of a statement
+        for pos in range(0, len(mod_ids), 500):
+            chunk = mod_ids[pos:pos + 500]
+            for mod_id, game_version in connection.execute(f"SELECT mod_id, game_version FROM mod_game_versions WHERE mod_id IN ({','.join('?' * len(chunk))})", chunk):
+                game_versions[mod_id].append(game_version)
+    mods = []
+    for mod_id, loader, mod_name, url, filename, sha1, size, data in rows:
+        mods.append({"loader": loader, "name": mod_name, "url": url, "filename": filename, "sha1": sha1, "size": size, "game_versions": game_versions[mod_id], "data": json.loads(data)})
+    return mods
+
+
+def count_mods(loader: Optional[str] = None, game_version: Optional[str] = None, name: Optional[str] = None, sync: bool = True, catalog_url: Optional[str] = None, database_path: Optional[str] = None) -> int:
+    """
+    Returns how many mods query_mods() would find without a limit
+    """
+    if sync:
+        sync_catalog(catalog_url, database_path=database_path)
+    where, parameters = _build_filter(loader, game_version, name)
+    with _connect(database_path) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM mods{where}", parameters).fetchone()[0]
+
+
+def download_mods(mods: List[ModEntry], minecraft_directory: Union[str, os.PathLike], callback: Optional[CallbackDict] = None, max_workers: int = DEFAULT_WORKERS) -> int:
+    """
+    Downloads mods into the mods directory in parallel. Files that already have the right sha1 are skipped. Returns the number of downloaded mods.
+    """
+    mods_dir = os.path.join(str(minecraft_directory), "mods")
+    tasks = []
+    for mod in mods:
+        if not mod["url"] or not mod["filename"]:
+            raise ValueError(f"{mod['name']} has no download")
+        tasks.append(DownloadTask(mod["url"], os.path.join(mods_dir, os.path.basename(mod["filename"])), mod["sha1"], mod["size"]))
+    return download_files(tasks, callback=callback, max_workers=max_workers)
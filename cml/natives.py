@@ -0,0 +1,213 @@
+from minecraft_launcher_lib.helper import parse_rule_list, get_sha1_hash
+from typing import Dict, List, Set, Any, Union, Optional, NamedTuple
+from cml.utils import get_cml_directory, write_json_atomic
+from cml import store, events, maven
+import concurrent.futures
+import functools
+import threading
+import platform
+import zipfile
+import shutil
+import struct
+import json
+import os
+
+__all__ = ["NativeJar", "get_natives", "get_native_jars", "extract_native_jar", "assemble_natives", "ensure_natives", "get_cache_entries", "clear_natives_cache"]
+
+# Written into every assembled natives directory to remember from which jars it was built
+MARKER_FILENAME = ".cml-natives.json"
+
+
+class NativeJar(NamedTuple):
+    path: str
+    sha1: Optional[str]
+    exclude: List[str]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_arch_type() -> str:
+    # platform.architecture() runs the file command every time, the pointer size tells the same
+    return "32" if struct.calcsize("P") == 4 else "64"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_os_name() -> str:
+    system = platform.system()
+    if system == "Windows":
+        return "windows"
+    if system == "Darwin":
+        return "osx"
+    return "linux"
+
+
+def get_natives(data: Dict[str, Any]) -> str:
+    """
+    Returns the native classifier of a library for the current system or an empty string.
+    Same as minecraft_launcher_lib.natives.get_natives(), but without starting a process for every library.
+    """
+    if "natives" not in data:
+        return ""
+    native = data["natives"].get(_get_os_name())
+    if native is None:
+        return ""
+    return native.replace("${arch}", _get_arch_type())
+
+
+def get_native_jars(data: Dict[str, Any], minecraft_directory: Union[str, os.PathLike]) -> List[NativeJar]:
+    """
+    Returns the native jars of a resolved version json that have to be extracted
+    """
+    path = str(minecraft_directory)
+    jars = []
+    for i in data["libraries"]:
+        if "extract" not in i or not parse_rule_list(i, "rules", {}):
+            continue
+        native = get_natives(i)
+        if native == "":
+            continue
+        classifier = i.get("downloads", {}).get("classifiers", {}).get(native)
+        if classifier is not None:
+            jar_path = os.path.join(path, "libraries", classifier["path"])
+            sha1 = classifier.get("sha1")
+        else:
+            coordinate = maven.parse_coordinate(i["name"])._replace(classifier=native, extension="jar")
+            jar_path = os.path.join(path, "libraries", coordinate.get_relative_path().replace("/", os.sep))
+            sha1 = None
+        jars.append(NativeJar(jar_path, sha1, i["extract"].get("exclude", [])))
+    return jars
+
+
+def _get_cache_directory(path: str) -> str:
+    return os.path.join(get_cml_directory(path), "natives")
+
+
+def extract_native_jar(jar_path: str, sha1: str, cache_directory: str) -> str:
+    """
+    Extracts the whole jar into the cache, if it is not already there. Returns the directory of the extracted files.
+    """
+    target = os.path.join(cache_directory, sha1)
+    if os.path.isdir(target):
+        return target
+    tmp_path = "{}.{}-{}.tmp".format(target, os.getpid(), threading.get_ident())
+    with zipfile.ZipFile(jar_path, "r") as zf:
+        zf.extractall(tmp_path)
+    try:
+        os.replace(tmp_path, target)
+    except OSError:
+        # Someone else extracted the same jar in the meantime
+        if not os.path.isdir(target):
+            raise
+        shutil.rmtree(tmp_path)
+    return target
+
+
+def _read_marker(natives_directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(natives_directory, MARKER_FILENAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_cache_entries(natives_directory: str) -> List[str]:
+    """
+    Returns the names of the entries in the natives cache that an assembled natives directory links to
+    """
+    marker = _read_marker(natives_directory)
+    return [i[3] for i in (marker or {}).get("jars", [])]
+
+
+def _get_jar_key(jar: NativeJar, marker: Optional[Dict[str, Any]]) -> Optional[List[Any]]:
+    """
+    Returns [path, size, mtime, sha1] of a native jar. Jars without a sha1 in the version json are only hashed if they changed.
+    """
+    try:
+        stat = os.stat(jar.path)
+    except OSError:
+        return None
+    sha1 = jar.sha1
+    if sha1 is None:
+        for entry in (marker or {}).get("jars", []):
+            if entry[:3] == [jar.path, stat.st_size, stat.st_mtime_ns]:
+                sha1 = entry[3]
+                break
+        else:
+            sha1 = get_sha1_hash(jar.path)
+    return [jar.path, stat.st_size, stat.st_mtime_ns, sha1]
+
+
+def _remove_stale_files(natives_directory: str, expected: Set[str]) -> None:
+    """
+    Removes the files of jars that are no longer part of the natives directory and the directories that became empty
+    """
+    for root, dirs, files in os.walk(natives_directory, topdown=False):
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            if os.path.normpath(file_path) not in expected and file_path != os.path.join(natives_directory, MARKER_FILENAME):
+                os.remove(file_path)
+        if root != natives_directory and len(os.listdir(root)) == 0:
+            os.rmdir(root)
+
+
+def assemble_natives(data: Dict[str, Any], minecraft_directory: Union[str, os.PathLike], natives_directory: Optional[str] = None, max_workers: Optional[int] = None) -> str:
+    """
+    Fills the natives directory of a resolved version json with hardlinks to the extracted natives in the cache.
+    Every native jar is only extracted once per minecraft directory. Returns the natives directory.
+    """
+    path = str(minecraft_directory)
+    if natives_directory is None:
+        natives_directory = os.path.join(path, "versions", data["id"], "natives")
+    jars = get_native_jars(data, path)
+    if len(jars) == 0:
+        return natives_directory
+    marker = _read_marker(natives_directory)
+    keys = [_get_jar_key(jar, marker) for jar in jars]
+    present = [(jar, key) for jar, key in zip(jars, keys) if key is not None]
+    if marker is not None and marker.get("jars") == [key for _, key in present]:
+        return natives_directory
+    with events.phase("natives", version=data["id"]) as info:
+        cache_directory = _get_cache_directory(path)
+        os.makedirs(cache_directory, exist_ok=True)
+        missing = [(jar, key) for jar, key in present if not os.path.isdir(os.path.join(cache_directory, key[3]))]
+        info["jars"] = len(present)
+        info["extracted"] = len(missing)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or min(8, len(missing) or 1)) as executor:
+            for future in [executor.submit(extract_native_jar, jar.path, key[3], cache_directory) for jar, key in missing]:
+                future.result()
+        os.makedirs(natives_directory, exist_ok=True)
+        expected = set()
+        for jar, key in present:
+            source_directory = os.path.join(cache_directory, key[3])
+            for root, dirs, files in os.walk(source_directory):
+                for filename in files:
+                    source = os.path.join(root, filename)
+                    relative = os.path.relpath(source, source_directory).replace(os.sep, "/")
+                    if any(relative.startswith(i) for i in jar.exclude):
+                        continue
+                    destination = os.path.join(natives_directory, relative)
+                    expected.add(os.path.normpath(destination))
+                    if os.path.isfile(destination) and os.path.samefile(source, destination):
+                        continue
+                    store.place_link(source, destination, "hardlink")
+        # Without a marker the directory was not assembled here, so nothing in it is known to be stale
+        if marker is not None:
+            _remove_stale_files(natives_directory, expected)
+        write_json_atomic(os.path.join(natives_directory, MARKER_FILENAME), {"jars": [key for _, key in present]})
+    return natives_directory
+
+
+def ensure_natives(version: str, minecraft_directory: Union[str, os.PathLike], natives_directory: Optional[str] = None) -> str:
+    """
+    Makes sure the natives directory of an installed version is complete. Returns the natives directory.
+    """
+    from cml.launch_plan import get_launch_plan
+    return assemble_natives(get_launch_plan(version, minecraft_directory)["data"], minecraft_directory, natives_directory)
+
+
+def clear_natives_cache(minecraft_directory: Union[str, os.PathLike]) -> None:
+    """
+    Removes all extracted natives from the cache. Assembled natives directories keep working, because they contain hardlinks.
+    """
+    cache_directory = _get_cache_directory(str(minecraft_directory))
+    if os.path.isdir(cache_directory):
+        shutil.rmtree(cache_directory)
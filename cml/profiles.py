@@ -0,0 +1,246 @@
+from typing import Dict, List, Callable, Iterable, NamedTuple, Optional
+import functools
+import platform
+import re
+import os
+
+__all__ = ["HostInfo", "PROFILES", "get_host_info", "get_profile_arguments", "merge_jvm_arguments", "apply_profile", "supports_zgc"]
+
+MB = 1024 * 1024
+
+# Flags that select a garbage collector, only one of them can be used
+GC_FLAGS = ("UseG1GC", "UseZGC", "UseShenandoahGC", "UseSerialGC", "UseParallelGC", "UseParallelOldGC", "UseConcMarkSweepGC", "UseEpsilonGC")
+
+_MEMORY_REGEX = re.compile(r"^(\d+)([kKmMgGtT]?)$")
+_XX_REGEX = re.compile(r"^-XX:[+-]?(\w+)")
+
+
+class HostInfo(NamedTuple):
+    java_major: int
+    java_vendor: str
+    memory: int
+    cpus: int
+
+
+def _get_cgroup_memory_limit() -> Optional[int]:
+    # Containers often have less memory than the host
+    for limit_path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(limit_path, "r", encoding="utf-8") as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_total_memory() -> int:
+    """
+    Returns the physical memory in bytes or 4 GiB if it can't be found out
+    """
+    memory = None
+    if platform.system() == "Windows":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong), ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong), ("ullTotalVirtual", ctypes.c_ulonglong),
+                        ("ullAvailVirtual", ctypes.c_ulonglong), ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            memory = status.ullTotalPhys
+    else:
+        try:
+            memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError, AttributeError):
+            pass
+    limit = _get_cgroup_memory_limit()
+    if limit is not None:
+        memory = min(memory, limit) if memory else limit
+    return memory or 4096 * MB
+
+
+@functools.lru_cache(maxsize=None)
+def _get_cpu_count() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_host_info(java_major: int, java_vendor: str = "") -> HostInfo:
+    """
+    Returns what the profiles need to know about the JVM and this computer
+    """
+    return HostInfo(java_major, java_vendor, _get_total_memory(), _get_cpu_count())
+
+
+def _parse_memory(value: str) -> Optional[int]:
+    """
+    Turns a heap size like 4G or 4096m into bytes
+    """
+    match = _MEMORY_REGEX.match(value)
+    if match is None:
+        return None
+    return int(match.group(1)) * {"": 1, "k": 1024, "m": MB, "g": 1024 * MB, "t": 1024 * 1024 * MB}[match.group(2).lower()]
+
+
+def _format_memory(value: int) -> str:
+    return str(value // MB) + "M"
+
+
+def _get_heap(host: HostInfo, share: int, minimum: int, maximum: int) -> int:
+    # A part of the memory, rounded down to 256M
+    heap = min(max(host.memory // share, minimum), maximum)
+    return max(heap // (256 * MB) * (256 * MB), minimum)
+
+
+def _get_gc_threads(host: HostInfo) -> List[str]:
+    # Many clients often run on one host, so the GC never takes all cores
+    threads = min(host.cpus, 8)
+    return ["-XX:ParallelGCThreads=" + str(threads), "-XX:ConcGCThreads=" + str(max(1, threads // 4))]
+
+
+def supports_zgc(host: HostInfo) -> bool:
+    """
+    Returns if the java of a host can run ZGC
+    """
+    return host.java_major >= 17
+
+
+def _supports_shenandoah(host: HostInfo) -> bool:
+    # The builds of Oracle don't contain Shenandoah
+    return host.java_major >= 17 and "oracle" not in host.java_vendor.lower()
+
+
+def _g1_arguments(host: HostInfo, heap: int, max_pause: int = 200) -> List[str]:
+    # G1 wants about 2048 regions, a region has to be a power of two between 1M and 32M
+    region = 1
+    while region < 32 and region * 2 * 2048 * MB <= heap:
+        region *= 2
+    return [
+        "-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=" + str(max_pause), "-XX:+UnlockExperimentalVMOptions", "-XX:+DisableExplicitGC",
+        "-XX:G1NewSizePercent=20", "-XX:G1ReservePercent=20", "-XX:G1HeapRegionSize=" + str(region) + "M",
+    ] + _get_gc_threads(host)
+
+
+def _zgc_arguments(host: HostInfo) -> List[str]:
+    arguments = ["-XX:+UseZGC"]
+    # Generational ZGC is the default since Java 23
+    if host.java_major in (21, 22):
+        arguments.append("-XX:+ZGenerational")
+    return arguments + _get_gc_threads(host)
+
+
+def _shenandoah_arguments(host: HostInfo) -> List[str]:
+    return ["-XX:+UseShenandoahGC", "-XX:ShenandoahGCHeuristics=adaptive"] + _get_gc_threads(host)
+
+
+def _g1_profile(host: HostInfo, heap: Optional[int]) -> List[str]:
+    heap = heap or _get_heap(host, 4, 2048 * MB, 8192 * MB)
+    return ["-Xms" + _format_memory(heap // 2), "-Xmx" + _format_memory(heap)] + _g1_arguments(host, heap)
+
+
+def _low_latency_profile(host: HostInfo, heap: Optional[int]) -> List[str]:
+    heap = heap or _get_heap(host, 4, 2048 * MB, 8192 * MB)
+    # The same minimum and maximum heap avoids pauses when the heap grows
+    arguments = ["-Xms" + _format_memory(heap), "-Xmx" + _format_memory(heap), "-XX:+AlwaysPreTouch"]
+    if supports_zgc(host):
+        return arguments + _zgc_arguments(host)
+    if _supports_shenandoah(host):
+        return arguments + _shenandoah_arguments(host)
+    return arguments + _g1_arguments(host, heap, 50)
+
+
+def _zgc_profile(host: HostInfo, heap: Optional[int]) -> List[str]:
+    if not supports_zgc(host):
+        return _g1_profile(host, heap)
+    heap = heap or _get_heap(host, 4, 2048 * MB, 8192 * MB)
+    return ["-Xms" + _format_memory(heap // 2), "-Xmx" + _format_memory(heap)] + _zgc_arguments(host)
+
+
+def _shenandoah_profile(host: HostInfo, heap: Optional[int]) -> List[str]:
+    if not _supports_shenandoah(host):
+        return _g1_profile(host, heap)
+    heap = heap or _get_heap(host, 4, 2048 * MB, 8192 * MB)
+    return ["-Xms" + _format_memory(heap // 2), "-Xmx" + _format_memory(heap)] + _shenandoah_arguments(host)
+
+
+def _headless_profile(host: HostInfo, heap: Optional[int]) -> List[str]:
+    heap = heap or _get_heap(host, 8, 512 * MB, 1024 * MB)
+    # Bots don't render, so a small heap, the serial GC and only the fast JIT are enough
+    return [
+        "-Xms" + _format_memory(min(256 * MB, heap)), "-Xmx" + _format_memory(heap), "-XX:+UseSerialGC", "-XX:TieredStopAtLevel=1",
+        "-XX:ActiveProcessorCount=" + str(min(host.cpus, 2)), "-Djava.awt.headless=true",
+    ]
+
+
+# Every profile gets the host and the heap size that the user set with -Xmx or None
+PROFILES: Dict[str, Callable[[HostInfo, Optional[int]], List[str]]] = {
+    "g1": _g1_profile,
+    "low-latency": _low_latency_profile,
+    "zgc": _zgc_profile,
+    "shenandoah": _shenandoah_profile,
+    "headless": _headless_profile,
+}
+
+
+def get_profile_arguments(profile: str, host: HostInfo, heap: Optional[int] = None) -> List[str]:
+    """
+    Returns the JVM arguments of a launch profile for a host. If heap is given, the profile uses it instead of a part of the memory.
+    Profiles that need a GC the JVM doesn't have fall back to G1.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"{profile} is not a valid launch profile")
+    return PROFILES[profile](host, heap)
+
+
+def _get_argument_key(argument: str) -> Optional[str]:
+    """
+    Returns what an argument sets, so two arguments that set the same thing can be found. None for arguments that are never merged.
+    """
+    if argument.startswith(("-Xmx", "-Xms", "-Xss", "-Xmn")):
+        return argument[:4]
+    match = _XX_REGEX.match(argument)
+    if match is not None:
+        return "gc" if match.group(1) in GC_FLAGS else "-XX:" + match.group(1)
+    if argument.startswith("-D") and "=" in argument:
+        return argument.partition("=")[0]
+    return None
+
+
+def merge_jvm_arguments(*layers: Iterable[str]) -> List[str]:
+    """
+    Joins lists of JVM arguments. If two lists set the same heap size, -XX option, property or GC, the earlier list wins.
+    Everything else, like -cp and its value, is kept as it is.
+    """
+    seen = set()
+    arguments = []
+    for layer in layers:
+        keys = set()
+        for argument in layer:
+            key = _get_argument_key(argument)
+            if key is not None:
+                if key in seen:
+                    continue
+                keys.add(key)
+            arguments.append(argument)
+        seen.update(keys)
+    return arguments
+
+
+def apply_profile(profile: str, user_arguments: List[str], version_arguments: List[str], java_major: int, java_vendor: str = "") -> List[str]:
+    """
+    Returns the JVM arguments of a launch: the arguments of the user win over the profile, the profile wins over the version json
+    """
+    heap = None
+    for argument in user_arguments:
+        if argument.startswith("-Xmx"):
+            heap = _parse_memory(argument[4:])
+    profile_arguments = get_profile_arguments(profile, get_host_info(java_major, java_vendor), heap)
+    if heap is not None:
+        # -Xms of the profile could be larger than the heap of the user
+        profile_arguments = [i for i in profile_arguments if not i.startswith("-Xms")]
+    return merge_jvm_arguments(user_arguments, profile_arguments, version_arguments)
@@ -0,0 +1,324 @@
+from typing import Dict, List, Any, Iterable, NamedTuple, Optional, Set, Tuple, TypedDict, Union
+from cml.registry import read_version_chain
+from cml.natives import get_cache_entries
+from cml.utils import get_cml_directory
+from cml import events, maven
+import concurrent.futures
+import tempfile
+import fnmatch
+import shutil
+import time
+import json
+import os
+
+__all__ = ["LiveReferences", "PruneReport", "get_live_references", "prune"]
+
+# What failed installs leave in the temp directory
+TEMP_PATTERNS = ("forge-installer-*.tmp", "fabric-installer-*.tmp", "lzma-*.tmp", "forge-root-*")
+
+# Unfinished downloads and writes
+PARTIAL_SUFFIXES = (".part", ".tmp", ".link")
+
+# Files that changed in the last hour are kept, because an install may still be running
+DEFAULT_MIN_AGE = 3600
+
+# The game arguments of forge and neoforge that name the versions of the files their installer created in libraries
+_LOADER_VERSION_ARGUMENTS = ("--fml.mcpVersion", "--fml.forgeVersion", "--fml.neoFormVersion", "--fml.neoForgeVersion")
+
+
+class LiveReferences(NamedTuple):
+    versions: Set[str]
+    libraries: Set[str]
+    library_versions: Set[str]
+    asset_indexes: Set[str]
+    assets: Set[str]
+    log_configs: Set[str]
+    natives: Set[str]
+    # Asset indexes that are referenced but not installed, so it is unknown which objects they need
+    missing_asset_indexes: Set[str]
+
+
+class PruneReport(TypedDict):
+    scanned_files: int
+    scanned_bytes: int
+    reclaimable_files: int
+    reclaimable_bytes: int
+    categories: Dict[str, int]
+    removed_files: int
+    freed_bytes: int
+    paths: List[str]
+    # Categories that were not pruned, because not all references could be read
+    skipped_categories: List[str]
+    # Paths that could not be removed
+    failed: List[str]
+
+
+def _get_library_files(data: Dict[str, Any]) -> Set[str]:
+    """
+    Returns the paths inside libraries of all libraries and native jars of a version json, for every system
+    """
+    files = set()
+    for i in data.get("libraries", []):
+        downloads = i.get("downloads", {})
+        if "path" in downloads.get("artifact", {}):
+            files.add(downloads["artifact"]["path"])
+        for classifier in downloads.get("classifiers", {}).values():
+            files.add(classifier["path"])
+        try:
+            coordinate = maven.parse_coordinate(i["name"])
+        except (KeyError, ValueError):
+            continue
+        files.add(coordinate.get_relative_path())
+        for native in i.get("natives", {}).values():
+            for arch in ("32", "64"):
+                files.add(coordinate._replace(classifier=native.replace("${arch}", arch), extension="jar").get_relative_path())
+    return files
+
+
+def _get_loader_versions(data: Dict[str, Any]) -> Set[str]:
+    """
+    The patched client and the forge jars are not in the version json, but their versions are in the game arguments
+    """
+    arguments = data.get("arguments", {}).get("game", [])
+    versions = set()
+    for pos, argument in enumerate(arguments[:-1]):
+        if argument in _LOADER_VERSION_ARGUMENTS and isinstance(arguments[pos + 1], str):
+            versions.add(arguments[pos + 1])
+    return versions
+
+
+def get_live_references(minecraft_directory: Union[str, os.PathLike]) -> LiveReferences:
+    """
+    Collects everything that the installed versions and the versions they inherit from need.
+    Raises a ValueError if a version json or an asset index is broken, because then it is unknown which files it needs.
+    Asset indexes that are not installed are listed in missing_asset_indexes.
+    """
+    path = str(minecraft_directory)
+    versions_path = os.path.join(path, "versions")
+    references = LiveReferences(set(), set(), set(), set(), set(), set(), set(), set())
+    for version in (os.listdir(versions_path) if os.path.isdir(versions_path) else []):
+        if not os.path.isfile(os.path.join(versions_path, version, version + ".json")):
+            continue
+        references.versions.add(version)
+        for data in read_version_chain(path, version):
+            references.libraries.update(_get_library_files(data))
+            references.library_versions.update(_get_loader_versions(data))
+            if "assetIndex" in data:
+                references.asset_indexes.add(data["assetIndex"]["id"])
+            elif "assets" in data:
+                references.asset_indexes.add(data["assets"])
+            logging_file = data.get("logging", {}).get("client", {}).get("file", {}).get("id")
+            if logging_file is not None:
+                references.log_configs.add(logging_file)
+        references.natives.update(get_cache_entries(os.path.join(versions_path, version, "natives")))
+    for index in references.asset_indexes:
+        try:
+            with open(os.path.join(path, "assets", "indexes", index + ".json"), "r", encoding="utf-8") as f:
+                references.assets.update(i["hash"] for i in json.load(f)["objects"].values())
+        except FileNotFoundError:
+            references.missing_asset_indexes.add(index)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"The asset index {index} is broken: {e!r}") from None
+    return references
+
+
+def _scan_tree(directory: str) -> List[Tuple[str, int, float]]:
+    """
+    Returns (path, size, mtime) of every file below directory
+    """
+    files = []
+    stack = [directory]
+    while len(stack) != 0:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            files.append((entry.path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def _scan(directories: Iterable[str], executor: concurrent.futures.Executor) -> List[Tuple[str, int, float]]:
+    """
+    Scans the subdirectories of every directory in parallel
+    """
+    files = []
+    subdirectories = []
+    for directory in directories:
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            files.append((entry.path, stat.st_size, stat.st_mtime))
+    for result in executor.map(_scan_tree, subdirectories):
+        files.extend(result)
+    return files
+
+
+def _get_size(file_path: str) -> Tuple[int, float]:
+    """
+    Returns the size and the newest mtime of a file or a whole directory
+    """
+    try:
+        if not os.path.isdir(file_path) or os.path.islink(file_path):
+            stat = os.lstat(file_path)
+            return stat.st_size, stat.st_mtime
+        files = _scan_tree(file_path)
+        return sum(i[1] for i in files), max([i[2] for i in files] + [os.stat(file_path).st_mtime])
+    except OSError:
+        # Removed in the meantime, so it counts as new and is kept
+        return 0, time.time()
+
+
+def _classify(path: str, file_path: str, references: LiveReferences) -> Optional[str]:
+    """
+    Returns the category of a file that is not needed anymore or None
+    """
+    parts = os.path.relpath(file_path, path).split(os.sep)
+    if parts[-1].endswith(PARTIAL_SUFFIXES):
+        return "partial"
+    if parts[0] == "libraries":
+        if "/".join(parts[1:]) in references.libraries:
+            return None
+        # The directory of the library version
+        if len(parts) >= 3 and any(parts[-2] == i or parts[-2].endswith("-" + i) for i in references.library_versions):
+            return None
+        return "libraries"
+    if parts[:2] == ["assets", "objects"]:
+        return None if parts[-1] in references.assets else "assets"
+    if parts[:2] == ["assets", "indexes"]:
+        return None if parts[-1][:-len(".json")] in references.asset_indexes else "assets"
+    if parts[:2] == ["assets", "log_configs"]:
+        return None if parts[-1] in references.log_configs else "assets"
+    return None
+
+
+def _get_cml_candidates(path: str, references: LiveReferences) -> List[Tuple[str, str]]:
+    """
+    Returns the natives in the cache that no version uses and the cached launch files of versions that were removed
+    """
+    cml_directory = get_cml_directory(path)
+    candidates = []
+    natives_cache = os.path.join(cml_directory, "natives")
+    for name in (os.listdir(natives_cache) if os.path.isdir(natives_cache) else []):
+        if name not in references.natives:
+            candidates.append((os.path.join(natives_cache, name), "natives"))
+    plans = os.path.join(cml_directory, "launch-plans")
+    for name in (os.listdir(plans) if os.path.isdir(plans) else []):
+        if name[:-len(".json")] not in references.versions:
+            candidates.append((os.path.join(plans, name), "launch-cache"))
+    argfiles = os.path.join(cml_directory, "argfiles")
+    for name in (os.listdir(argfiles) if os.path.isdir(argfiles) else []):
+        # <version>-<hash>.args or .jar
+        if name.rpartition(".")[0][:-17] not in references.versions:
+            candidates.append((os.path.join(argfiles, name), "launch-cache"))
+    return candidates
+
+
+def _get_temp_candidates() -> List[Tuple[str, str]]:
+    temp_directory = tempfile.gettempdir()
+    # The temp directory can be shared by all users, so only files of the current user are touched
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    candidates = []
+    for name in os.listdir(temp_directory):
+        if not any(fnmatch.fnmatch(name, i) for i in TEMP_PATTERNS):
+            continue
+        file_path = os.path.join(temp_directory, name)
+        try:
+            if uid is not None and os.lstat(file_path).st_uid != uid:
+                continue
+        except OSError:
+            continue
+        candidates.append((file_path, "temp"))
+    return candidates
+
+
+def _remove(file_path: str) -> bool:
+    """
+    Returns False if the path could not be removed
+    """
+    try:
+        if os.path.isdir(file_path) and not os.path.islink(file_path):
+            shutil.rmtree(file_path)
+        else:
+            os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return False
+    return True
+
+
+def _remove_empty_directories(directory: str) -> None:
+    # Bottom up, so parents are empty once their children are removed
+    for root, _, _ in os.walk(directory, topdown=False):
+        if root != directory and len(os.listdir(root)) == 0:
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+
+def prune(minecraft_directory: Union[str, os.PathLike], dry_run: bool = False, categories: Optional[Iterable[str]] = None, min_age: float = DEFAULT_MIN_AGE, include_temp: bool = True, max_workers: int = 8) -> PruneReport:
+    """
+    Removes the libraries, assets and natives that no installed version needs, unfinished downloads and what failed installs left in the temp directory.
+    With dry_run nothing is removed and the report only tells how many bytes could be freed.
+    categories limits what is removed: libraries, assets, natives, launch-cache, partial and temp.
+    Files that changed in the last min_age seconds are always kept. If an asset index is missing, no assets are removed.
+    Paths that can't be removed are listed in failed instead of raising.
+    """
+    path = str(minecraft_directory)
+    wanted = set(categories) if categories is not None else None
+    report: PruneReport = {"scanned_files": 0, "scanned_bytes": 0, "reclaimable_files": 0, "reclaimable_bytes": 0, "categories": {}, "removed_files": 0, "freed_bytes": 0, "paths": [],
+                           "skipped_categories": [], "failed": []}
+    with events.phase("prune", dry_run=dry_run) as info:
+        references = get_live_references(path)
+        if len(references.missing_asset_indexes) != 0:
+            # Any object could belong to a missing index
+            report["skipped_categories"].append("assets")
+        deadline = time.time() - min_age
+        candidates: List[Tuple[str, str, int]] = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            files = _scan([os.path.join(path, "libraries"), os.path.join(path, "assets", "objects"), os.path.join(path, "assets", "indexes"), os.path.join(path, "assets", "log_configs")], executor)
+            for file_path, size, mtime in files:
+                report["scanned_files"] += 1
+                report["scanned_bytes"] += size
+                category = _classify(path, file_path, references)
+                if category is not None and mtime < deadline:
+                    candidates.append((file_path, category, size))
+            others = _get_cml_candidates(path, references) + (_get_temp_candidates() if include_temp else [])
+            for (file_path, category), (size, mtime) in zip(others, executor.map(lambda i: _get_size(i[0]), others)):
+                if mtime < deadline:
+                    candidates.append((file_path, category, size))
+            candidates = [i for i in candidates if (wanted is None or i[1] in wanted) and i[1] not in report["skipped_categories"]]
+            for file_path, category, size in candidates:
+                report["reclaimable_files"] += 1
+                report["reclaimable_bytes"] += size
+                report["categories"][category] = report["categories"].get(category, 0) + size
+                report["paths"].append(file_path)
+            if not dry_run:
+                for (file_path, _, size), removed in zip(candidates, executor.map(lambda i: _remove(i[0]), candidates)):
+                    if removed:
+                        report["removed_files"] += 1
+                        report["freed_bytes"] += size
+                    else:
+                        report["failed"].append(file_path)
+        if not dry_run:
+            _remove_empty_directories(os.path.join(path, "libraries"))
+        info.update(scanned=report["scanned_files"], reclaimable_bytes=report["reclaimable_bytes"], freed_bytes=report["freed_bytes"])
+    return report
@@ -0,0 +1,321 @@
+from typing import Dict, List, Any, Union, Optional, Tuple, TypedDict
+from cml.utils import get_cml_directory, write_json_atomic, file_lock
+import contextlib
+import threading
+import logging
+import time
+import json
+import os
+
+__all__ = ["ServerEntry", "ClientEntry", "get_registry_path", "load_registry", "reconcile", "get_servers", "get_server", "register_server", "unregister_server",
+           "get_clients", "get_client", "register_client", "unregister_client", "mark_launched", "record_launch",
+           "read_version_chain"]
+
+REGISTRY_FORMAT = 2
+
+# The first library that matches decides the loader of a version
+LOADER_LIBRARIES = (
+    ("net.fabricmc:fabric-loader:", "fabric"),
+    ("org.quiltmc:quilt-loader:", "quilt"),
+    ("net.neoforged", "neoforge"),
+    ("net.minecraftforge:", "forge"),
+    ("com.mumfrey:liteloader:", "liteloader"),
+    ("optifine:", "optifine"),
+)
+
+_cache: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+class ServerEntry(TypedDict):
+    version: str
+    jar: str
+    sha1: Optional[str]
+    size: int
+    mtime: int
+    installed_at: float
+
+
+class ClientEntry(TypedDict):
+    # The name of the directory in versions
+    version: str
+    # The id in the version json. It is usually the same as version, but it doesn't have to.
+    id: str
+    type: str
+    release_time: str
+    compliance_level: int
+    loader: str
+    base_version: str
+    java: Optional[int]
+    # Bytes in versions/<id> only. Libraries and assets are shared with other versions, so they are not counted.
+    size: int
+    mtime: int
+    installed_at: float
+    last_launched: Optional[float]
+
+
+def get_registry_path(minecraft_directory: Union[str, os.PathLike]) -> str:
+    """
+    Returns the path of the registry of a minecraft directory
+    """
+    return os.path.join(get_cml_directory(minecraft_directory), "registry.json")
+
+
+def _read_registry(registry_path: str) -> Dict[str, Any]:
+    try:
+        with open(registry_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    if data.get("format") != REGISTRY_FORMAT:
+        data = {"format": REGISTRY_FORMAT}
+    data.setdefault("servers", {})
+    data.setdefault("clients", {})
+    return data
+
+
+def load_registry(minecraft_directory: Union[str, os.PathLike]) -> Dict[str, Any]:
+    """
+    Returns the content of the registry. The registry is only replaced atomically, so reading needs no lock.
+    The content is kept in memory until the file is replaced, so don't change the returned dict.
+    """
+    registry_path = get_registry_path(minecraft_directory)
+    try:
+        stat = os.stat(registry_path)
+    except OSError:
+        return _read_registry(registry_path)
+    # Every write replaces the file, so the inode changes even if mtime and size don't
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(registry_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    data = _read_registry(registry_path)
+    with _cache_lock:
+        _cache[registry_path] = (key, data)
+    return data
+
+
+@contextlib.contextmanager
+def _edit_registry(minecraft_directory: Union[str, os.PathLike]):
+    """
+    Yields the registry and saves it after the with block. Other processes wait until the edit is done.
+    """
+    registry_path = get_registry_path(minecraft_directory)
+    with file_lock(registry_path + ".lock"):
+        data = _read_registry(registry_path)
+        yield data
+        write_json_atomic(registry_path, data)
+
+
+def read_version_chain(path: str, version: str) -> List[Dict[str, Any]]:
+    """
+    Returns the version json and the jsons it inherits from. A missing parent ends the chain.
+    """
+    chain: List[Dict[str, Any]] = []
+    current: Optional[str] = version
+    while current is not None and len(chain) < 32:
+        try:
+            with open(os.path.join(path, "versions", current, current + ".json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except OSError:
+            if len(chain) == 0:
+                raise
+            break
+        chain.append(data)
+        current = data.get("inheritsFrom")
+    return chain
+
+
+def _get_loader(chain: List[Dict[str, Any]]) -> str:
+    for data in chain:
+        for library in data.get("libraries", []):
+            name = library.get("name", "")
+            for prefix, loader in LOADER_LIBRARIES:
+                if name.startswith(prefix):
+                    return loader
+    return "vanilla" if len(chain) == 1 else "custom"
+
+
+def _get_directory_size(directory: str) -> int:
+    size = 0
+    for root, _, files in os.walk(directory):
+        for i in files:
+            try:
+                size += os.lstat(os.path.join(root, i)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _create_client_entry(path: str, version: str, old: Optional[ClientEntry] = None) -> Optional[ClientEntry]:
+    """
+    Reads a version json and its parents. Returns None if the version is not installed or its json is broken.
+    """
+    try:
+        stat = os.stat(os.path.join(path, "versions", version, version + ".json"))
+        chain = read_version_chain(path, version)
+    except (OSError, ValueError):
+        return None
+    java = None
+    for data in chain:
+        if "javaVersion" in data:
+            java = data["javaVersion"].get("majorVersion")
+            break
+    return {
+        "version": version,
+        "id": chain[0].get("id", version),
+        "type": chain[0].get("type", "release"),
+        "release_time": chain[0].get("releaseTime", ""),
+        "compliance_level": chain[0].get("complianceLevel", 0),
+        "loader": _get_loader(chain),
+        "base_version": chain[-1].get("id", version),
+        "java": java,
+        "size": _get_directory_size(os.path.join(path, "versions", version)),
+        "mtime": stat.st_mtime_ns,
+        "installed_at": old["installed_at"] if old is not None else stat.st_mtime,
+        "last_launched": old["last_launched"] if old is not None else None,
+    }
+
+
+def reconcile(minecraft_directory: Union[str, os.PathLike]) -> Dict[str, Any]:
+    """
+    Brings the registry up to date with the versions directory. Only version jsons with a new mtime are read again.
+    Servers whose jar was deleted are removed. Returns the registry.
+    """
+    path = str(minecraft_directory)
+    data = load_registry(path)
+    versions_path = os.path.join(path, "versions")
+    mtimes = {}
+    for name in (os.listdir(versions_path) if os.path.isdir(versions_path) else []):
+        try:
+            mtimes[name] = os.stat(os.path.join(versions_path, name, name + ".json")).st_mtime_ns
+        except OSError:
+            continue
+    clients = data["clients"]
+    changed = {}
+    for name, mtime in mtimes.items():
+        if name not in clients or clients[name]["mtime"] != mtime:
+            entry = _create_client_entry(path, name, clients.get(name))
+            if entry is not None:
+                changed[name] = entry
+    removed = [name for name in clients if name not in mtimes]
+    missing_servers = [version for version, entry in data["servers"].items() if not os.path.isfile(os.path.join(path, entry["jar"]))]
+    if len(changed) == 0 and len(removed) == 0 and len(missing_servers) == 0:
+        return data
+    with _edit_registry(path) as data:
+        for name, entry in changed.items():
+            # Another process may have launched the version in the meantime
+            old = data["clients"].get(name)
+            if old is not None:
+                entry["last_launched"] = old["last_launched"]
+            data["clients"][name] = entry
+        for name in removed:
+            data["clients"].pop(name, None)
+        for version in missing_servers:
+            data["servers"].pop(version, None)
+    return data
+
+
+def get_servers(minecraft_directory: Union[str, os.PathLike]) -> List[ServerEntry]:
+    """
+    Returns all installed servers sorted by installation time
+    """
+    servers = load_registry(minecraft_directory)["servers"].values()
+    return sorted(servers, key=lambda i: i["installed_at"])
+
+
+def get_server(minecraft_directory: Union[str, os.PathLike], version: str) -> Optional[ServerEntry]:
+    """
+    Returns the entry of an installed server or None
+    """
+    return load_registry(minecraft_directory)["servers"].get(version)
+
+
+def register_server(minecraft_directory: Union[str, os.PathLike], version: str, jar: str, sha1: Optional[str] = None) -> ServerEntry:
+    """
+    Adds a server to the registry or updates its entry
+    """
+    stat = os.stat(jar)
+    entry: ServerEntry = {
+        "version": version,
+        "jar": os.path.relpath(jar, str(minecraft_directory)),
+        "sha1": sha1,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "installed_at": time.time(),
+    }
+    with _edit_registry(minecraft_directory) as data:
+        data["servers"][version] = entry
+    return entry
+
+
+def unregister_server(minecraft_directory: Union[str, os.PathLike], version: str) -> None:
+    """
+    Removes a server from the registry
+    """
+    with _edit_registry(minecraft_directory) as data:
+        data["servers"].pop(version, None)
+
+
+def get_clients(minecraft_directory: Union[str, os.PathLike], loader: Optional[str] = None, base_version: Optional[str] = None, java: Optional[int] = None, check: bool = True) -> List[ClientEntry]:
+    """
+    Returns the installed clients sorted by installation time. loader, base_version and java only return the clients that match.
+    The size of a client is the size of its versions/<id> directory without the libraries and assets.
+    If check is True, the registry is reconciled with the versions directory first, which only costs a stat per version.
+    """
+    data = reconcile(minecraft_directory) if check else load_registry(minecraft_directory)
+    clients = [i for i in data["clients"].values() if (loader is None or i["loader"] == loader) and (base_version is None or i["base_version"] == base_version) and (java is None or i["java"] == java)]
+    return sorted(clients, key=lambda i: i["installed_at"])
+
+
+def get_client(minecraft_directory: Union[str, os.PathLike], version: str) -> Optional[ClientEntry]:
+    """
+    Returns the entry of an installed client or None
+    """
+    return load_registry(minecraft_directory)["clients"].get(version)
+
+
+def register_client(minecraft_directory: Union[str, os.PathLike], version: str) -> Optional[ClientEntry]:
+    """
+    Adds an installed client to the registry or updates its entry. Returns None if the version is not installed.
+    """
+    path = str(minecraft_directory)
+    with _edit_registry(path) as data:
+        entry = _create_client_entry(path, version, data["clients"].get(version))
+        if entry is None:
+            data["clients"].pop(version, None)
+        else:
+            data["clients"][version] = entry
+    return entry
+
+
+def unregister_client(minecraft_directory: Union[str, os.PathLike], version: str) -> None:
+    """
+    Removes a client from the registry
+    """
+    with _edit_registry(minecraft_directory) as data:
+        data["clients"].pop(version, None)
+
+
+def mark_launched(minecraft_directory: Union[str, os.PathLike], version: str) -> None:
+    """
+    Stores that a client was started now
+    """
+    path = str(minecraft_directory)
+    with _edit_registry(path) as data:
+        entry = data["clients"].get(version) or _create_client_entry(path, version)
+        if entry is None:
+            return
+        entry["last_launched"] = time.time()
+        data["clients"][version] = entry
+
+
+def record_launch(minecraft_directory: Union[str, os.PathLike], version: str) -> None:
+    """
+    Calls mark_launched(), but only logs a warning if the registry can't be written, so the bookkeeping never stops a launch
+    """
+    try:
+        mark_launched(minecraft_directory, version)
+    except Exception as e:
+        logging.getLogger("cml").warning("Could not record the launch of %s: %s", version, e)
@@ -1,23 +1,292 @@
+from minecraft_launcher_lib.helper import empty
+from minecraft_launcher_lib.exceptions import UnsupportedVersion
+from minecraft_launcher_lib.types import CallbackDict
+from cml.downloader import DownloadTask, download_task, download_files, create_session, DEFAULT_WORKERS
+from cml.registry import get_server, register_server
+from cml.utils import put_dropping_oldest
+from cml.install import ensure_version_json
+from cml.launch_plan import get_java_info
+from cml.java import get_best_java
+from cml import events, profiles
+from typing import Dict, List, Any, Iterator, Union, Optional
+import concurrent.futures
+import subprocess
+import threading
+import requests
+import queue
+import time
+import json
+import re
 import os
 
 
-def downver(mc_dir,version):
-    import json,requests
-    with open(f'{mc_dir}\\versions\\{version}\\{version}.json','r') as json_file:
-        server_url=json.loads(json_file.read())
-    server_url=server_url["downloads"]['server']['url']
-    print(f"downloading {version}.jar URL:{server_url}")
-    server_jar=requests.get(url=server_url)
-    with open(f'{mc_dir}\\versions\\{version}\\{version}_server.jar','w') as file:
-        file.write(str(server_jar))
+SERVER_PRESETS = {
+    "g1": ["-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200"],
+    # The flags from https://docs.papermc.io/paper/aikars-flags
+    "aikar": [
+        "-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200", "-XX:+UnlockExperimentalVMOptions", "-XX:+DisableExplicitGC",
+        "-XX:+AlwaysPreTouch", "-XX:G1NewSizePercent=30", "-XX:G1MaxNewSizePercent=40", "-XX:G1HeapRegionSize=8M", "-XX:G1ReservePercent=20",
+        "-XX:G1HeapWastePercent=5", "-XX:G1MixedGCCountTarget=4", "-XX:InitiatingHeapOccupancyPercent=15", "-XX:G1MixedGCLiveThresholdPercent=90",
+        "-XX:G1RSetUpdatingPauseTimePercent=5", "-XX:SurvivorRatio=32", "-XX:+PerfDisableSharedMem", "-XX:MaxTenuringThreshold=1",
+    ],
+    # Needs Java 17 or newer, older JVMs get the g1 preset
+    "zgc": ["-XX:+UseZGC"],
+    "none": [],
+}
+
+# The line the server logs once it accepts players
+DONE_REGEX = re.compile(r"Done \((\d+(?:\.\d+)?)s\)!")
+
+# The oldest lines are dropped when nobody reads the output
+MAX_OUTPUT_LINES = 10000
+
+
+def _get_server_jar_path(mc_dir: str, version: str) -> str:
+    return os.path.join(mc_dir, "versions", version, version + "_server.jar")
+
+
+def get_server_download(mc_dir: Union[str, os.PathLike], version: str, session: Optional[requests.Session] = None) -> DownloadTask:
+    """
+    Returns the download of the server jar of a version. The version json is downloaded if needed.
+    """
+    path = str(mc_dir)
+    if session is None:
+        session = create_session(1)
+    data = ensure_version_json(version, path, session)
+    if "server" not in data.get("downloads", {}):
+        raise UnsupportedVersion(version)
+    server = data["downloads"]["server"]
+    return DownloadTask(server["url"], _get_server_jar_path(path, version), server.get("sha1"), server.get("size"))
+
+
+def _is_registered_jar(mc_dir: str, version: str, task: DownloadTask) -> bool:
+    """
+    Checks if the registry has the jar with the expected sha1 and the file was not touched since it was verified
+    """
+    entry = get_server(mc_dir, version)
+    if entry is None or entry["sha1"] != task.sha1:
+        return False
     try:
-        with open(f'{mc_dir}\\server.txt','a') as filae:
-            filae.write('\n'+str(version))
-    except FileNotFoundError:
-        with open(f'{mc_dir}\\server.txt','w') as filae:
-                filae.write(str(version))        
+        stat = os.stat(task.path)
+    except OSError:
+        return False
+    return stat.st_size == entry["size"] and stat.st_mtime_ns == entry.get("mtime")
+
+
+def downver(mc_dir, version, callback: Optional[CallbackDict] = None):
+    """
+    Downloads the server jar of a version and adds it to the registry. A jar that was already verified is not downloaded again.
+    """
+    if callback is None:
+        callback = {}
+    path = str(mc_dir)
+    task = get_server_download(path, version)
+    if not _is_registered_jar(path, version, task):
+        callback.get("setStatus", empty)(f"Download {version}_server.jar")
+        with events.phase("server.download", version=version):
+            download_task(task)
+        register_server(path, version, task.path, task.sha1)
     return 'exit'
 
-def run_server(mc_dir=str(),version=str()):
-     os.system(f'cd {mc_dir}\\version\\{version}')
-     os.system(f'{version}_server.jar')
\ No newline at end of file
+
+def downver_many(mc_dir: Union[str, os.PathLike], versions: List[str], callback: Optional[CallbackDict] = None, max_workers: int = DEFAULT_WORKERS) -> List[str]:
+    """
+    Downloads the server jars of many versions in parallel. Returns the paths of the jars.
+    """
+    path = str(mc_dir)
+    session = create_session(max_workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tasks = list(executor.map(lambda version: get_server_download(path, version, session=session), versions))
+    missing = [(version, task) for version, task in zip(versions, tasks) if not _is_registered_jar(path, version, task)]
+    download_files([task for _, task in missing], callback=callback, max_workers=max_workers, session=session)
+    for version, task in missing:
+        register_server(path, version, task.path, task.sha1)
+    return [task.path for task in tasks]
+
+
+class ServerProcess:
+    """
+    A running dedicated server. Commands can be sent to it and its log is read in the background.
+    """
+    def __init__(self, version: str, command: List[str], cwd: str, max_output_lines: int = MAX_OUTPUT_LINES) -> None:
+        self.version = version
+        self.command = command
+        self.cwd = cwd
+        self.started_at = time.monotonic()
+        self.ready_at: Optional[float] = None
+        # The time the server itself reports in the Done line
+        self.reported_startup_time: Optional[float] = None
+        self._ready = threading.Event()
+        self._output: "queue.Queue[str]" = queue.Queue(max_output_lines)
+        self._stdin_lock = threading.Lock()
+        self.process = subprocess.Popen(command, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+    def _read_output(self) -> None:
+        for raw_line in iter(self.process.stdout.readline, b""):
+            line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+            if self.ready_at is None:
+                match = DONE_REGEX.search(line)
+                if match is not None:
+                    self.ready_at = time.monotonic()
+                    self.reported_startup_time = float(match.group(1))
+                    self._ready.set()
+                    events.emit("server_ready", version=self.version, time_to_ready=self.time_to_ready, reported_startup_time=self.reported_startup_time)
+            put_dropping_oldest(self._output, line)
+        self.process.stdout.close()
+        # Wake up everyone who waits for a server that will never be ready
+        self._ready.set()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def time_to_ready(self) -> Optional[float]:
+        """
+        Seconds from starting the process until the server was ready
+        """
+        if self.ready_at is None:
+            return None
+        return self.ready_at - self.started_at
+
+    def is_running(self) -> bool:
+        return self.process.poll() is None
+
+    def is_ready(self) -> bool:
+        return self.ready_at is not None
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the server logged the Done line. Returns False if it exited or the timeout was reached first.
+        """
+        self._ready.wait(timeout)
+        return self.ready_at is not None
+
+    def send_command(self, command: str) -> None:
+        """
+        Writes a command like "say hi" into the server console
+        """
+        with self._stdin_lock:
+            self.process.stdin.write((command.rstrip("\n") + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+
+    def iter_output(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yields log lines as long as they arrive within timeout seconds. Never blocks with timeout=0.
+        """
+        while True:
+            try:
+                if timeout == 0:
+                    yield self._output.get_nowait()
+                else:
+                    yield self._output.get(timeout=timeout)
+            except queue.Empty:
+                return
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        return self.process.wait(timeout)
+
+    def stop(self, timeout: float = 30) -> int:
+        """
+        Stops the server with the stop command. The process is killed if it doesn't exit within timeout seconds.
+        """
+        if self.is_running():
+            try:
+                self.send_command("stop")
+            except OSError:
+                pass
+        try:
+            returncode = self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            returncode = self.process.wait()
+        self._reader.join()
+        return returncode
+
+
+def write_eula(server_dir: Union[str, os.PathLike]) -> None:
+    """
+    Accepts the Minecraft EULA (https://aka.ms/MinecraftEULA) for a server directory
+    """
+    eula_path = os.path.join(str(server_dir), "eula.txt")
+    with open(eula_path, "w", encoding="utf-8") as f:
+        f.write("eula=true\n")
+
+
+def write_server_properties(server_dir: Union[str, os.PathLike], properties: Dict[str, Any]) -> None:
+    """
+    Sets values in server.properties. Values that are not given are kept.
+    """
+    properties_path = os.path.join(str(server_dir), "server.properties")
+    lines = []
+    if os.path.isfile(properties_path):
+        with open(properties_path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    values = {key: str(value).lower() if isinstance(value, bool) else str(value) for key, value in properties.items()}
+    for pos, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if not line.startswith("#") and key in values:
+            lines[pos] = key + "=" + values.pop(key)
+    lines.extend(key + "=" + value for key, value in values.items())
+    with open(properties_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _get_preset_arguments(preset: str, java: str, data: Dict[str, Any]) -> List[str]:
+    """
+    Returns the flags of a preset for a java executable. Presets that need a GC the JVM doesn't have fall back to g1 like the launch profiles.
+    """
+    if preset == "zgc" and not profiles.supports_zgc(profiles.get_host_info(*get_java_info(java, data))):
+        return SERVER_PRESETS["g1"]
+    return SERVER_PRESETS[preset]
+
+
+def get_server_command(mc_dir: Union[str, os.PathLike], version: str, memory: str = "2G", preset: str = "g1", java: Optional[str] = None, jvm_arguments: Optional[List[str]] = None) -> List[str]:
+    """
+    Returns the command that runs the server jar of a version
+    """
+    path = str(mc_dir)
+    if preset not in SERVER_PRESETS:
+        raise ValueError(f"{preset} is not a valid preset")
+    entry = get_server(path, version)
+    jar = os.path.join(path, entry["jar"]) if entry is not None else _get_server_jar_path(path, version)
+    data = {}
+    json_path = os.path.join(path, "versions", version, version + ".json")
+    if os.path.isfile(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    if java is None:
+        java = get_best_java(data.get("javaVersion"), path) or "java"
+    # The same minimum and maximum heap avoids resizing the heap while the server runs
+    command = [java, "-Xms" + memory, "-Xmx" + memory]
+    command.extend(_get_preset_arguments(preset, java, data))
+    command.extend(jvm_arguments or [])
+    command.extend(["-jar", jar, "nogui"])
+    return command
+
+
+def start_server(mc_dir: Union[str, os.PathLike], version: str, memory: str = "2G", preset: str = "g1", java: Optional[str] = None, jvm_arguments: Optional[List[str]] = None, server_dir: Optional[Union[str, os.PathLike]] = None, properties: Optional[Dict[str, Any]] = None, accept_eula: bool = True) -> ServerProcess:
+    """
+    Starts the server of a version and returns its ServerProcess. The server runs in server_dir, which defaults to servers/<version> in mc_dir.
+    With accept_eula the Minecraft EULA is accepted, otherwise the server will exit at the first start.
+    """
+    path = str(mc_dir)
+    if server_dir is None:
+        server_dir = os.path.join(path, "servers", version)
+    server_dir = str(server_dir)
+    os.makedirs(server_dir, exist_ok=True)
+    if accept_eula and not os.path.isfile(os.path.join(server_dir, "eula.txt")):
+        write_eula(server_dir)
+    if properties:
+        write_server_properties(server_dir, properties)
+    command = get_server_command(path, version, memory=memory, preset=preset, java=java, jvm_arguments=jvm_arguments)
+    return ServerProcess(version, command, server_dir)
+
+
+def run_server(mc_dir=str(), version=str()):
+    """
+    Starts the server of a version with the default settings
+    """
+    return start_server(mc_dir, version)
@@ -0,0 +1,333 @@
+from minecraft_launcher_lib.helper import get_sha1_hash
+from typing import Dict, List, Union, Optional, Tuple, TypedDict
+from cml.utils import write_json_atomic
+import concurrent.futures
+import threading
+import shutil
+import errno
+import stat
+import json
+import os
+
+__all__ = ["init_store", "get_object_path", "has_object", "link_from_store", "store_file", "break_link", "place_link", "register_instance", "dedup_directory", "collect_garbage", "get_store_report"]
+
+LINK_MODES = ("hardlink", "reflink", "symlink")
+# A reflink is copy on write, so writing into the file never changes the object. Without reflink support the file is copied.
+DEFAULT_LINK_MODE = "reflink"
+
+# ioctl number of FICLONE on linux
+_FICLONE = 0x40049409
+
+# The directories of a minecraft directory that only contain content that can be shared
+SHARED_DIRECTORIES = (("libraries",), ("assets", "objects"))
+
+_config_cache: Dict[str, Dict[str, str]] = {}
+_config_lock = threading.Lock()
+
+
+class DedupResult(TypedDict):
+    files: int
+    linked: int
+    bytes_saved: int
+
+
+class StoreReport(TypedDict):
+    objects: int
+    store_bytes: int
+    references: int
+    bytes_saved: int
+
+
+def init_store(store_directory: Union[str, os.PathLike], link_mode: str = DEFAULT_LINK_MODE) -> None:
+    """
+    Creates a shared store. link_mode is how files in a minecraft directory point into the store: hardlink, reflink or symlink.
+    With hardlink and symlink the file and the object are the same data, so the objects are made read-only.
+    Programs that change a linked file in place, like mods that patch their jar, have to call break_link() first.
+    """
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"{link_mode} is not a valid link mode")
+    store = str(store_directory)
+    os.makedirs(os.path.join(store, "objects"), exist_ok=True)
+    config_path = os.path.join(store, "store.json")
+    config = _get_store_config(store)
+    config["link_mode"] = link_mode
+    write_json_atomic(config_path, config)
+    with _config_lock:
+        _config_cache[store] = config
+
+
+def _get_store_config(store: str) -> Dict[str, str]:
+    with _config_lock:
+        if store in _config_cache:
+            return _config_cache[store]
+    try:
+        with open(os.path.join(store, "store.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {"link_mode": DEFAULT_LINK_MODE}
+    with _config_lock:
+        _config_cache[store] = config
+    return config
+
+
+def get_object_path(store_directory: Union[str, os.PathLike], sha1: str) -> str:
+    """
+    Returns the path of an object in the store
+    """
+    return os.path.join(str(store_directory), "objects", sha1[:2], sha1)
+
+
+def has_object(store_directory: Union[str, os.PathLike], sha1: str) -> bool:
+    """
+    Checks if the store contains an object
+    """
+    return os.path.isfile(get_object_path(store_directory, sha1))
+
+
+def _reflink(source: str, destination: str) -> None:
+    import fcntl
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+def _protect_object(object_path: str, link_mode: str) -> None:
+    """
+    Makes an object read-only if files point to it directly, so writing into a linked file fails instead of changing the object
+    """
+    # Windows can't replace or remove a read-only file, so the objects stay writable there
+    if link_mode == "reflink" or os.name == "nt":
+        return
+    mode = stat.S_IMODE(os.stat(object_path).st_mode)
+    if mode & 0o222:
+        os.chmod(object_path, mode & ~0o222)
+
+
+def place_link(source: str, destination: str, link_mode: str) -> None:
+    """
+    Makes destination point to source. Falls back to a copy if the link mode is not supported here.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    tmp_path = "{}.{}-{}.link".format(destination, os.getpid(), threading.get_ident())
+    try:
+        if link_mode == "hardlink":
+            os.link(source, tmp_path)
+        elif link_mode == "symlink":
+            os.symlink(os.path.abspath(source), tmp_path)
+        else:
+            _reflink(source, tmp_path)
+    except (OSError, ImportError) as e:
+        if isinstance(e, OSError) and e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK):
+            raise
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+def link_from_store(store_directory: Union[str, os.PathLike], sha1: str, path: str) -> bool:
+    """
+    Places the object with the given sha1 at path. Returns False if the store doesn't have the object.
+    """
+    store = str(store_directory)
+    object_path = get_object_path(store, sha1)
+    if not os.path.isfile(object_path):
+        return False
+    link_mode = _get_store_config(store)["link_mode"]
+    _protect_object(object_path, link_mode)
+    place_link(object_path, path, link_mode)
+    return True
+
+
+def store_file(store_directory: Union[str, os.PathLike], path: str, sha1: Optional[str] = None) -> str:
+    """
+    Adds a file to the store and replaces it with a link to the stored object. Returns the sha1 of the file.
+    """
+    store = str(store_directory)
+    if sha1 is None:
+        sha1 = get_sha1_hash(path)
+    object_path = get_object_path(store, sha1)
+    link_mode = _get_store_config(store)["link_mode"]
+    if os.path.isfile(object_path):
+        _protect_object(object_path, link_mode)
+        if not _is_same_file(path, object_path):
+            place_link(object_path, path, link_mode)
+        return sha1
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    tmp_path = "{}.{}-{}.tmp".format(object_path, os.getpid(), threading.get_ident())
+    try:
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, object_path)
+    if link_mode != "hardlink" or not _is_same_file(path, object_path):
+        place_link(object_path, path, link_mode)
+    _protect_object(object_path, link_mode)
+    return sha1
+
+
+def break_link(path: str) -> bool:
+    """
+    Replaces a hardlink or symlink with a writable copy of its own, so the file can be changed in place without changing the store.
+    Returns False if the file is not a link.
+    """
+    if not os.path.islink(path) and not (os.path.isfile(path) and os.stat(path).st_nlink > 1):
+        return False
+    tmp_path = "{}.{}-{}.link".format(path, os.getpid(), threading.get_ident())
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _is_same_file(path: str, object_path: str) -> bool:
+    try:
+        return os.path.samefile(path, object_path)
+    except OSError:
+        return False
+
+
+def register_instance(store_directory: Union[str, os.PathLike], minecraft_directory: Union[str, os.PathLike]) -> None:
+    """
+    Remembers a minecraft directory that uses the store. collect_garbage() looks for symlinks in registered directories.
+    """
+    store = str(store_directory)
+    instances_path = os.path.join(store, "instances.json")
+    instances = _get_instances(store)
+    path = os.path.abspath(str(minecraft_directory))
+    if path not in instances:
+        instances.append(path)
+        write_json_atomic(instances_path, instances)
+
+
+def _get_instances(store: str) -> List[str]:
+    try:
+        with open(os.path.join(store, "instances.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def _walk_shared_files(minecraft_directory: str) -> List[str]:
+    files = []
+    for parts in SHARED_DIRECTORIES:
+        for root, dirs, filenames in os.walk(os.path.join(minecraft_directory, *parts)):
+            for filename in filenames:
+                if not filename.endswith((".part", ".tmp", ".link")):
+                    files.append(os.path.join(root, filename))
+    return files
+
+
+def dedup_directory(store_directory: Union[str, os.PathLike], minecraft_directory: Union[str, os.PathLike], max_workers: int = 8) -> DedupResult:
+    """
+    Moves all libraries and asset objects of a minecraft directory into the store and replaces them with links
+    """
+    store = str(store_directory)
+    path = str(minecraft_directory)
+    register_instance(store, path)
+    result: DedupResult = {"files": 0, "linked": 0, "bytes_saved": 0}
+    lock = threading.Lock()
+
+    def dedup_file(file_path: str) -> None:
+        if os.path.islink(file_path):
+            return
+        stat = os.stat(file_path)
+        # Asset objects are named after their sha1, but a broken file must never end up in the store
+        sha1 = get_sha1_hash(file_path)
+        object_path = get_object_path(store, sha1)
+        existed = os.path.isfile(object_path)
+        if existed and _is_same_file(file_path, object_path):
+            with lock:
+                result["files"] += 1
+            return
+        store_file(store, file_path, sha1)
+        with lock:
+            result["files"] += 1
+            if existed:
+                result["linked"] += 1
+                result["bytes_saved"] += stat.st_size
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(dedup_file, i) for i in _walk_shared_files(path)]:
+            future.result()
+    return result
+
+
+def _get_references(store: str) -> Dict[str, int]:
+    """
+    Returns how often every object is used by the registered minecraft directories. Symlinks are followed, hardlinks are found by their inode
+    and every other file by its sha1, so reflinks and copies count the same way as links.
+    """
+    objects_dir = os.path.realpath(os.path.join(store, "objects"))
+    inodes: Dict[Tuple[int, int], str] = {}
+    sizes = set()
+    for sha1, object_path in _iter_objects(store):
+        object_stat = os.stat(object_path)
+        inodes[(object_stat.st_dev, object_stat.st_ino)] = sha1
+        sizes.add(object_stat.st_size)
+    references: Dict[str, int] = {}
+    for instance in _get_instances(store):
+        for file_path in _walk_shared_files(instance):
+            sha1: Optional[str] = None
+            if os.path.islink(file_path):
+                target = os.path.realpath(file_path)
+                if os.path.dirname(os.path.dirname(target)) == objects_dir:
+                    sha1 = os.path.basename(target)
+            else:
+                try:
+                    file_stat = os.stat(file_path)
+                except OSError:
+                    continue
+                sha1 = inodes.get((file_stat.st_dev, file_stat.st_ino))
+                # Only files with the size of an object can be a reflink or copy of it
+                if sha1 is None and file_stat.st_size in sizes:
+                    sha1 = get_sha1_hash(file_path)
+            if sha1 is not None and has_object(store, sha1):
+                references[sha1] = references.get(sha1, 0) + 1
+    return references
+
+
+def _iter_objects(store: str):
+    objects_dir = os.path.join(store, "objects")
+    if not os.path.isdir(objects_dir):
+        return
+    for prefix in os.listdir(objects_dir):
+        prefix_dir = os.path.join(objects_dir, prefix)
+        for name in os.listdir(prefix_dir):
+            if len(name) == 40:
+                yield name, os.path.join(prefix_dir, name)
+
+
+def collect_garbage(store_directory: Union[str, os.PathLike], dry_run: bool = False) -> int:
+    """
+    Removes all objects that are not used by any minecraft directory. Returns the number of freed bytes.
+    """
+    store = str(store_directory)
+    references = _get_references(store)
+    freed = 0
+    for sha1, object_path in _iter_objects(store):
+        object_stat = os.stat(object_path)
+        # A hardlink outside of the registered directories still uses the object
+        if object_stat.st_nlink > 1 or sha1 in references:
+            continue
+        freed += object_stat.st_size
+        if not dry_run:
+            os.remove(object_path)
+    return freed
+
+
+def get_store_report(store_directory: Union[str, os.PathLike]) -> StoreReport:
+    """
+    Returns how many objects the store contains and how many bytes are saved by sharing them.
+    Every file in a registered minecraft directory with the content of an object is a reference, whatever the link mode is.
+    """
+    store = str(store_directory)
+    references = _get_references(store)
+    report: StoreReport = {"objects": 0, "store_bytes": 0, "references": 0, "bytes_saved": 0}
+    for sha1, object_path in _iter_objects(store):
+        size = os.path.getsize(object_path)
+        count = references.get(sha1, 0)
+        report["objects"] += 1
+        report["store_bytes"] += size
+        report["references"] += count
+        if count > 1:
+            report["bytes_saved"] += size * (count - 1)
+    return report
@@ -0,0 +1,245 @@
+from minecraft_launcher_lib.types import MinecraftOptions
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple, TypedDict
+from cml.utils import put_dropping_oldest
+from cml.command import minecraft_command
+from cml import events, registry
+import concurrent.futures
+import subprocess
+import threading
+import shutil
+import queue
+import time
+import copy
+import re
+import os
+
+__all__ = ["InstanceSpec", "Instance", "Supervisor", "launch_instances"]
+
+# Minecraft logs this once the client has finished starting
+DEFAULT_READY_PATTERN = r"Sound engine started|Backend library: LWJGL"
+
+# Lines iter_output() keeps for all instances together, older lines are dropped if nobody reads them
+MAX_OUTPUT_LINES = 10000
+
+
+class InstanceSpec(TypedDict, total=False):
+    version: str
+    minecraft_directory: str
+    options: MinecraftOptions
+    name: str
+    cpus: List[int]
+    max_memory: str
+    max_restarts: int
+
+
+class Instance:
+    """
+    A single client that is managed by a Supervisor
+    """
+    def __init__(self, name: str, spec: InstanceSpec, command: List[str]) -> None:
+        self.name = name
+        self.spec = spec
+        self.command = command
+        self.process: Optional[subprocess.Popen] = None
+        self.status = "pending"
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.startup_latencies: List[float] = []
+        self.exit_codes: List[int] = []
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process is not None else None
+
+    @property
+    def startup_latency(self) -> Optional[float]:
+        """
+        Seconds from spawning the current process until the ready line was logged
+        """
+        if self.started_at is None or self.ready_at is None:
+            return None
+        return self.ready_at - self.started_at
+
+    def get_report(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "pid": self.pid,
+            "status": self.status,
+            "restarts": self.restarts,
+            "startup_latency": self.startup_latency,
+            "startup_latencies": list(self.startup_latencies),
+            "exit_codes": list(self.exit_codes),
+        }
+
+
+def _apply_memory_budget(options: MinecraftOptions, max_memory: str) -> MinecraftOptions:
+    options = copy.copy(options)
+    jvm_arguments = [i for i in options.get("jvmArguments", []) if not i.startswith("-Xmx")]
+    options["jvmArguments"] = jvm_arguments + ["-Xmx" + max_memory]
+    return options
+
+
+class Supervisor:
+    """
+    Starts many clients at once, streams their output and restarts them when they crash
+    """
+    def __init__(self, specs: List[InstanceSpec], on_output: Optional[Callable[[str, str, str], None]] = None, ready_pattern: str = DEFAULT_READY_PATTERN, max_workers: int = 8, poll_interval: float = 0.2, max_output_lines: int = MAX_OUTPUT_LINES) -> None:
+        self._specs = specs
+        self._on_output = on_output
+        self._ready_regex = re.compile(ready_pattern)
+        self._max_workers = max_workers
+        self._poll_interval = poll_interval
+        self._output: "queue.Queue[Tuple[str, str, str]]" = queue.Queue(max_output_lines)
+        self._stopping = False
+        # Held while an instance is restarted, so stop() never misses a process that is spawned at the same time
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        self.instances: Dict[str, Instance] = {}
+
+    def _build_instance(self, pos: int, spec: InstanceSpec) -> Instance:
+        options = spec.get("options", {})
+        if "max_memory" in spec:
+            options = _apply_memory_budget(options, spec["max_memory"])
+        command = minecraft_command(spec["version"], spec["minecraft_directory"], options, False, assemble_natives=True)
+        return Instance(spec.get("name", f"{spec['version']}-{pos}"), spec, command)
+
+    def _read_stream(self, instance: Instance, process: subprocess.Popen, stream_name: str) -> None:
+        stream = process.stdout if stream_name == "stdout" else process.stderr
+        for raw_line in iter(stream.readline, b""):
+            line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+            if instance.ready_at is None and instance.process is process and self._ready_regex.search(line):
+                instance.ready_at = time.monotonic()
+                instance.status = "running"
+                instance.startup_latencies.append(instance.ready_at - instance.started_at)
+                events.emit("instance_ready", instance=instance.name, startup_latency=instance.startup_latency)
+            put_dropping_oldest(self._output, (instance.name, stream_name, line))
+            if self._on_output is not None:
+                self._on_output(instance.name, stream_name, line)
+        stream.close()
+
+    def _spawn(self, instance: Instance) -> None:
+        spec = instance.spec
+        cwd = spec.get("options", {}).get("gameDirectory", spec["minecraft_directory"])
+        instance.ready_at = None
+        command = instance.command
+        taskset = shutil.which("taskset") if "cpus" in spec else None
+        if taskset is not None:
+            # taskset sets the affinity before the JVM starts, so every thread of it inherits the affinity
+            command = [taskset, "-c", ",".join(str(i) for i in spec["cpus"])] + command
+        instance.started_at = time.monotonic()
+        process = subprocess.Popen(command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if "cpus" in spec and taskset is None and hasattr(os, "sched_setaffinity"):
+            # Threads the JVM started before this keep all CPUs
+            try:
+                os.sched_setaffinity(process.pid, spec["cpus"])
+            except ProcessLookupError:
+                pass
+        instance.process = process
+        instance.status = "starting"
+        registry.record_launch(spec["minecraft_directory"], spec["version"])
+        for stream_name in ("stdout", "stderr"):
+            threading.Thread(target=self._read_stream, args=(instance, process, stream_name), daemon=True).start()
+
+    def start(self) -> None:
+        """
+        Builds the commands of all instances and spawns them
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            instances = list(executor.map(lambda i: self._build_instance(*i), enumerate(self._specs)))
+        for instance in instances:
+            self.instances[instance.name] = instance
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            list(executor.map(self._spawn, instances))
+        self._monitor = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._monitor.start()
+
+    def _monitor_loop(self) -> None:
+        while not self._stopping:
+            alive = False
+            for instance in list(self.instances.values()):
+                process = instance.process
+                if process is None or instance.status in ("exited", "crashed", "stopped"):
+                    continue
+                returncode = process.poll()
+                if returncode is None:
+                    alive = True
+                    continue
+                instance.exit_codes.append(returncode)
+                events.emit("instance_exit", instance=instance.name, returncode=returncode)
+                with self._lock:
+                    if self._stopping:
+                        instance.status = "stopped"
+                    elif returncode == 0:
+                        instance.status = "exited"
+                    elif instance.restarts < instance.spec.get("max_restarts", 0):
+                        instance.restarts += 1
+                        self._spawn(instance)
+                        alive = True
+                    else:
+                        instance.status = "crashed"
+            if not alive:
+                return
+            time.sleep(self._poll_interval)
+
+    def iter_output(self, timeout: Optional[float] = None) -> Iterator[Tuple[str, str, str]]:
+        """
+        Yields (instance name, stream, line) as long as output arrives within timeout seconds. Never blocks with timeout=0.
+        Only the last max_output_lines lines are kept until they are read.
+        """
+        while True:
+            try:
+                if timeout == 0:
+                    yield self._output.get_nowait()
+                else:
+                    yield self._output.get(timeout=timeout)
+            except queue.Empty:
+                return
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every instance has exited for good. Returns False if the timeout was reached first.
+        """
+        if self._monitor is not None:
+            self._monitor.join(timeout)
+            return not self._monitor.is_alive()
+        return True
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Terminates all instances. Instances that don't exit within timeout seconds are killed.
+        """
+        with self._lock:
+            self._stopping = True
+            for instance in self.instances.values():
+                if instance.process is not None and instance.process.poll() is None:
+                    instance.process.terminate()
+        deadline = time.monotonic() + timeout
+        for instance in self.instances.values():
+            if instance.process is None:
+                continue
+            try:
+                returncode = instance.process.wait(max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                instance.process.kill()
+                returncode = instance.process.wait()
+            if instance.status not in ("exited", "crashed", "stopped"):
+                instance.exit_codes.append(returncode)
+                instance.status = "stopped"
+        if self._monitor is not None:
+            self._monitor.join()
+
+    def get_report(self) -> List[Dict[str, Any]]:
+        """
+        Returns status, restarts, startup latencies and exit codes of every instance
+        """
+        return [i.get_report() for i in self.instances.values()]
+
+
+def launch_instances(specs: List[InstanceSpec], **kwargs: Any) -> Supervisor:
+    """
+    Starts all instances and returns the Supervisor that manages them
+    """
+    supervisor = Supervisor(specs, **kwargs)
+    supervisor.start()
+    return supervisor
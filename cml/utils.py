@@ -1,10 +1,20 @@
-import minecraft_launcher_lib
+import contextlib
+import threading
+import queue
+import platform
+import json
+import os
 class NotServerError(Exception):
     def __init__(self, m):
         super().__init__(m)
 def get_server_list(mc_dir=str()):
+    from cml.registry import get_servers
+    servers = get_servers(mc_dir)
+    if len(servers) != 0:
+        return [i["version"] for i in servers]
+    # server.txt was used before the registry existed
     try:
-        with open(f'{mc_dir}\\server.txt') as server_file:
+        with open(os.path.join(mc_dir, 'server.txt')) as server_file:
             serverlist=server_file.read()
             # 使用 splitlines() 方法将其转换为列表
             server_version_list = serverlist.splitlines()
@@ -13,13 +23,108 @@ def get_server_list(mc_dir=str()):
         raise NotServerError(f'“{mc_dir}”中没有安装mc服务器')
 
 def get_options():
+    import minecraft_launcher_lib.utils
     return minecraft_launcher_lib.utils.generate_test_options()
 
-def get_installed_version(mc_dir=str()):    
-    return minecraft_launcher_lib.utils.get_installed_versions(minecraft_directory=mc_dir)
+def get_installed_version(mc_dir=str()):
+    # Same result as minecraft_launcher_lib.utils.get_installed_versions(), but only changed version jsons are read
+    from cml.registry import get_clients
+    from datetime import datetime
+    version_list = []
+    for i in get_clients(mc_dir):
+        try:
+            # fromisoformat() only knows the Z suffix since Python 3.11
+            release_time = datetime.fromisoformat(i["release_time"].replace("Z", "+00:00"))
+        except ValueError:
+            release_time = datetime.fromtimestamp(0)
+        version_list.append({"id": i["id"], "type": i["type"], "releaseTime": release_time, "complianceLevel": i["compliance_level"]})
+    return version_list
 
 def get_minecraft_directory():
-    return minecraft_launcher_lib.utils.get_minecraft_directory()
+    # Same as minecraft_launcher_lib.utils.get_minecraft_directory(), without importing minecraft_launcher_lib
+    if platform.system() == "Windows":
+        return os.path.join(os.getenv("APPDATA", os.path.join(os.path.expanduser("~"), "AppData", "Roaming")), ".minecraft")
+    if platform.system() == "Darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Application Support", "minecraft")
+    return os.path.join(os.path.expanduser("~"), ".minecraft")
 
 def get_install_version_list():
-    return minecraft_launcher_lib.utils.get_version_list()
\ No newline at end of file
+    import minecraft_launcher_lib.utils
+    return minecraft_launcher_lib.utils.get_version_list()
+
+
+def get_cml_directory(mc_dir=str()):
+    """
+    Returns the directory where cml keeps its own data for a minecraft directory
+    """
+    return os.path.join(str(mc_dir), ".cml")
+
+
+def get_cache_directory():
+    """
+    Returns the directory for caches that are shared by all minecraft directories of the user
+    """
+    if os.getenv("CML_CACHE_DIR"):
+        return os.getenv("CML_CACHE_DIR")
+    if platform.system() == "Windows":
+        return os.path.join(os.getenv("LOCALAPPDATA", os.path.expanduser("~")), "cml", "cache")
+    if platform.system() == "Darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Caches", "cml")
+    return os.path.join(os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "cml")
+
+
+def write_json_atomic(path, data):
+    """
+    Writes data as json into a temporary file and moves it over path
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}-{}.tmp".format(path, os.getpid(), threading.get_ident())
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def put_dropping_oldest(output, item):
+    """
+    Puts item into a bounded queue. If the queue is full, the oldest items are dropped, so nobody who produces output ever blocks.
+    """
+    while True:
+        try:
+            output.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                output.get_nowait()
+            except queue.Empty:
+                pass
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Locks path across processes while the with block runs. The lock file is created if needed.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+b") as f:
+        if platform.system() == "Windows":
+            import msvcrt
+            f.seek(0)
+            # LK_LOCK gives up after 10 seconds, so keep trying
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,128 @@
+from minecraft_launcher_lib.helper import get_sha1_hash, empty
+from minecraft_launcher_lib.types import CallbackDict
+from typing import Dict, List, Any, Union, Optional, TypedDict
+from cml.downloader import DownloadTask, download_files, create_session, DEFAULT_WORKERS
+from cml.utils import get_cml_directory, write_json_atomic
+from cml.install import get_version_downloads
+from cml import events, natives
+import concurrent.futures
+import json
+import os
+
+__all__ = ["VerifyResult", "verify_and_repair", "clear_verified_state"]
+
+STATE_FORMAT = 1
+
+
+class VerifyResult(TypedDict):
+    files: int
+    cached: int
+    hashed: int
+    # Optional files that don't exist. They are guesses from a maven repository, so they are not repaired.
+    skipped: List[str]
+    missing: List[str]
+    broken: List[str]
+    repaired: int
+
+
+def _get_state_path(path: str) -> str:
+    return os.path.join(get_cml_directory(path), "verified.json")
+
+
+def _load_state(path: str) -> Dict[str, List[Any]]:
+    try:
+        with open(_get_state_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data["files"] if data.get("format") == STATE_FORMAT else {}
+
+
+def clear_verified_state(minecraft_directory: Union[str, os.PathLike]) -> None:
+    """
+    Forgets which files were verified, so the next verification hashes every file again
+    """
+    state_path = _get_state_path(str(minecraft_directory))
+    if os.path.isfile(state_path):
+        os.remove(state_path)
+
+
+def _remember(state: Dict[str, List[Any]], key: str, file_path: str, sha1: Optional[str]) -> None:
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        state.pop(key, None)
+        return
+    state[key] = [stat.st_size, stat.st_mtime_ns, sha1]
+
+
+def verify_and_repair(version: str, minecraft_directory: Union[str, os.PathLike], callback: Optional[CallbackDict] = None, repair: bool = True, max_workers: int = DEFAULT_WORKERS, store_directory: Optional[Union[str, os.PathLike]] = None) -> VerifyResult:
+    """
+    Checks the libraries, natives, client jar and assets of a version, including the versions it inherits from, against their sizes and sha1s.
+    Files that are missing or broken are downloaded again if repair is True.
+    Files that were verified before and didn't change since are not hashed again. The natives directory is assembled again after a repair.
+    """
+    if callback is None:
+        callback = {}
+    with events.phase("verify", version=version) as info:
+        result = _verify_and_repair(version, str(minecraft_directory), callback, repair, max_workers, store_directory)
+        info.update(cached=result["cached"], hashed=result["hashed"], skipped=len(result["skipped"]), missing=len(result["missing"]), broken=len(result["broken"]), repaired=result["repaired"])
+    return result
+
+
+def _verify_and_repair(version: str, path: str, callback: CallbackDict, repair: bool, max_workers: int, store_directory: Optional[Union[str, os.PathLike]]) -> VerifyResult:
+    session = create_session(max_workers)
+    callback.get("setStatus", empty)("Resolve " + version)
+    tasks = list({os.path.normpath(i.path): i for i in get_version_downloads(version, path, session=session)}.values())
+    state = _load_state(path)
+    result: VerifyResult = {"files": len(tasks), "cached": 0, "hashed": 0, "skipped": [], "missing": [], "broken": [], "repaired": 0}
+    to_hash: List[DownloadTask] = []
+    bad: List[DownloadTask] = []
+    callback.get("setStatus", empty)(f"Verify {len(tasks)} files")
+    for task in tasks:
+        key = os.path.relpath(task.path, path)
+        try:
+            stat = os.stat(task.path)
+        except OSError:
+            if task.optional:
+                # Optional files are guesses from a maven repository and may not exist at all
+                result["skipped"].append(task.path)
+                continue
+            result["missing"].append(task.path)
+            bad.append(task)
+            continue
+        if task.size is not None and stat.st_size != task.size:
+            result["broken"].append(task.path)
+            bad.append(task)
+            continue
+        if task.sha1 is None or state.get(key) == [stat.st_size, stat.st_mtime_ns, task.sha1]:
+            result["cached"] += 1
+            continue
+        to_hash.append(task)
+
+    def hash_task(task: DownloadTask) -> bool:
+        return get_sha1_hash(task.path) == task.sha1
+
+    callback.get("setMax", empty)(len(to_hash))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for count, (task, valid) in enumerate(zip(to_hash, executor.map(hash_task, to_hash)), start=1):
+            result["hashed"] += 1
+            if valid:
+                _remember(state, os.path.relpath(task.path, path), task.path, task.sha1)
+            else:
+                result["broken"].append(task.path)
+                bad.append(task)
+            callback.get("setProgress", empty)(count)
+    try:
+        if repair and len(bad) != 0:
+            for task in bad:
+                state.pop(os.path.relpath(task.path, path), None)
+            result["repaired"] = download_files(bad, callback=callback, max_workers=max_workers, session=session, store_directory=store_directory)
+            for task in bad:
+                if task.sha1 is not None:
+                    _remember(state, os.path.relpath(task.path, path), task.path, task.sha1)
+            # Re-downloaded native jars change the marker, otherwise this returns early
+            natives.ensure_natives(version, path)
+    finally:
+        write_json_atomic(_get_state_path(path), {"format": STATE_FORMAT, "files": state})
+    return result
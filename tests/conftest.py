@@ -0,0 +1,86 @@
+import http.server
+import threading
+import hashlib
+import json
+import os
+
+import pytest
+
+DATA = os.urandom(200 * 1024)
+SHA1 = hashlib.sha1(DATA).hexdigest()
+JSON_DATA = {"versions": ["1.20.1", "1.19.4"]}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        state["requests"].append(self.headers.get("Range"))
+        if state["failures"] > 0:
+            state["failures"] -= 1
+            self.send_body(503, b"")
+            return
+        if self.path == "/data.json":
+            self.send_body(200, json.dumps(JSON_DATA).encode("utf-8"))
+            return
+        if self.path != "/file":
+            self.send_body(404, b"")
+            return
+        range_header = self.headers.get("Range")
+        if range_header is None:
+            self.send_body(200, DATA)
+            return
+        offset = int(range_header[len("bytes="):-1])
+        if offset >= len(DATA):
+            self.send_body(416, b"", [("Content-Range", f"bytes */{len(DATA)}")])
+            return
+        self.send_body(206, DATA[offset:], [("Content-Range", f"bytes {offset}-{len(DATA) - 1}/{len(DATA)}")])
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.state = {"requests": [], "failures": 0}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def cache_directory(tmp_path, monkeypatch):
+    """
+    Keeps the metadata cache away from the real one
+    """
+    from cml import metadata
+    monkeypatch.setenv("CML_CACHE_DIR", str(tmp_path / "cache"))
+    metadata.clear_cache()
+    yield
+    metadata.clear_cache()
+
+
+def get_url(server, path="/file"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
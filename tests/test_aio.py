@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from cml import aio
+from cml.downloader import DownloadTask
+from conftest import DATA, SHA1, JSON_DATA, get_url, read, write
+
+
+@pytest.fixture(params=["threads", "aiohttp"])
+def backend(request, monkeypatch):
+    """
+    Runs a test with the thread pool fallback and, if it is installed, with aiohttp
+    """
+    if request.param == "aiohttp":
+        pytest.importorskip("aiohttp")
+    else:
+        monkeypatch.setattr(aio, "aiohttp", None)
+    return request.param
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await aio.close()
+
+    return asyncio.run(main())
+
+
+def test_download_files(backend, server, tmp_path):
+    path = str(tmp_path / "file")
+    write(str(tmp_path / "other.part"), DATA[:1000])
+    tasks = [DownloadTask(get_url(server), path, SHA1), DownloadTask(get_url(server), str(tmp_path / "other"), SHA1)]
+    assert run(aio.download_files(tasks, retries=0)) == 2
+    assert sorted(server.state["requests"], key=str) == [None, "bytes=1000-"]
+    assert read(path) == DATA
+    assert read(str(tmp_path / "other")) == DATA
+    # Valid files are not downloaded again
+    assert run(aio.download_files(tasks, retries=0)) == 0
+    assert len(server.state["requests"]) == 2
+
+
+def test_stale_part_without_sha1(backend, server, tmp_path):
+    path = str(tmp_path / "file")
+    write(path + ".part", b"x" * (len(DATA) + 10))
+    assert run(aio.download_task(DownloadTask(get_url(server), path), retries=0))
+    assert server.state["requests"] == [f"bytes={len(DATA) + 10}-", None]
+    assert read(path) == DATA
+
+
+def test_fetch_json(backend, server, cache_directory):
+    url = get_url(server, "/data.json")
+
+    async def fetch_twice():
+        return await asyncio.gather(aio.fetch_json(url), aio.fetch_json(url))
+
+    assert run(fetch_twice()) == [JSON_DATA, JSON_DATA]
+    # Both callers share one request and the second call is answered from the cache
+    assert run(aio.fetch_json(url)) == JSON_DATA
+    assert len(server.state["requests"]) == 1
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from cml import downloader
+from cml.downloader import DownloadTask, InvalidChecksum, DownloadError
+from conftest import DATA, SHA1, get_url, read, write
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(downloader.time, "sleep", delays.append)
+    return delays
+
+
+def test_download(server, tmp_path):
+    path = str(tmp_path / "a" / "file")
+    assert downloader.download_task(DownloadTask(get_url(server), path, SHA1, len(DATA)))
+    assert read(path) == DATA
+    assert not os.path.exists(path + ".part")
+    # A valid file is not downloaded again
+    assert not downloader.download_task(DownloadTask(get_url(server), path, SHA1, len(DATA)))
+    assert len(server.state["requests"]) == 1
+
+
+def test_resume_with_range(server, tmp_path):
+    path = str(tmp_path / "file")
+    write(path + ".part", DATA[:1000])
+    assert downloader.download_task(DownloadTask(get_url(server), path, SHA1))
+    assert server.state["requests"] == ["bytes=1000-"]
+    assert read(path) == DATA
+    assert not os.path.exists(path + ".part")
+
+
+def test_retry_with_backoff(server, tmp_path, sleeps):
+    server.state["failures"] = 2
+    path = str(tmp_path / "file")
+    assert downloader.download_task(DownloadTask(get_url(server), path, SHA1), retries=3, backoff=0.5)
+    assert sleeps == [0.5, 1.0]
+    assert len(server.state["requests"]) == 3
+    assert read(path) == DATA
+
+
+def test_retry_gives_up(server, tmp_path, sleeps):
+    server.state["failures"] = 10
+    path = str(tmp_path / "file")
+    with pytest.raises(DownloadError) as info:
+        downloader.download_task(DownloadTask(get_url(server), path, SHA1), retries=2, backoff=0.5)
+    assert info.value.status_code == 503
+    assert sleeps == [0.5, 1.0]
+    assert not os.path.exists(path)
+
+
+def test_client_error_is_not_retried(server, tmp_path, sleeps):
+    with pytest.raises(DownloadError) as info:
+        downloader.download_task(DownloadTask(get_url(server, "/missing"), str(tmp_path / "file")))
+    assert info.value.status_code == 404
+    assert sleeps == []
+    assert len(server.state["requests"]) == 1
+
+
+def test_sha1_mismatch(server, tmp_path, sleeps):
+    path = str(tmp_path / "file")
+    with pytest.raises(InvalidChecksum) as info:
+        downloader.download_task(DownloadTask(get_url(server), path, "0" * 40), retries=1)
+    assert info.value.actual == SHA1
+    # Every attempt starts from scratch, because the part file is removed
+    assert server.state["requests"] == [None, None]
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+
+
+def test_complete_part_with_sha1(server, tmp_path):
+    path = str(tmp_path / "file")
+    write(path + ".part", DATA)
+    assert downloader.download_task(DownloadTask(get_url(server), path, SHA1))
+    assert server.state["requests"] == [f"bytes={len(DATA)}-"]
+    assert read(path) == DATA
+
+
+def test_stale_part_with_sha1(server, tmp_path, sleeps):
+    path = str(tmp_path / "file")
+    write(path + ".part", b"x" * (len(DATA) + 10))
+    assert downloader.download_task(DownloadTask(get_url(server), path, SHA1), retries=1)
+    # The 416 is followed by a checksum error, the retry downloads the whole file
+    assert server.state["requests"] == [f"bytes={len(DATA) + 10}-", None]
+    assert read(path) == DATA
+
+
+def test_stale_part_without_sha1(server, tmp_path):
+    path = str(tmp_path / "file")
+    write(path + ".part", b"x" * (len(DATA) + 10))
+    assert downloader.download_task(DownloadTask(get_url(server), path), retries=0)
+    assert server.state["requests"] == [f"bytes={len(DATA) + 10}-", None]
+    assert read(path) == DATA
+    assert not os.path.exists(path + ".part")
+
+
+def test_download_files(server, tmp_path):
+    tasks = [DownloadTask(get_url(server), str(tmp_path / str(i)), SHA1) for i in range(4)]
+    tasks.append(DownloadTask(get_url(server, "/missing"), str(tmp_path / "optional"), optional=True))
+    assert downloader.download_files(tasks, max_workers=2) == 4
+    for task in tasks[:4]:
+        assert read(task.path) == DATA
+    assert not os.path.exists(str(tmp_path / "optional"))
@@ -0,0 +1,52 @@
+import json
+
+from cml import mod
+
+CATALOG = {
+    "forge": [
+        {"name": "Alpha", "url": "https://example.com/alpha.jar", "game_versions": ["1.20.1", "1.19.4"]},
+        {"name": "beta", "mcversion": "1.20.1"},
+        {"name": "Gamma", "versions": ["1.19.4"]},
+    ],
+    "fabric": [
+        {"name": "Delta", "game_versions": ["1.20.1"]},
+        "Epsilon",
+    ],
+}
+
+
+def write_catalog(tmp_path, catalog=CATALOG):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(catalog), encoding="utf-8")
+    return str(path)
+
+
+def test_query_mods_filters_by_game_version(tmp_path):
+    catalog_url = write_catalog(tmp_path)
+    database_path = str(tmp_path / "mods.sqlite")
+    mods = mod.query_mods(game_version="1.20.1", catalog_url=catalog_url, database_path=database_path)
+    assert [i["name"] for i in mods] == ["Alpha", "beta", "Delta"]
+    assert mods[0]["game_versions"] == ["1.20.1", "1.19.4"]
+    assert mods[0]["filename"] == "alpha.jar"
+    assert mod.count_mods(game_version="1.20.1", catalog_url=catalog_url, database_path=database_path) == 3
+    assert mod.count_mods(loader="forge", game_version="1.19.4", catalog_url=catalog_url, database_path=database_path) == 2
+    assert mod.count_mods(game_version="1.8.9", catalog_url=catalog_url, database_path=database_path) == 0
+
+
+def test_query_mods_pages(tmp_path):
+    catalog_url = write_catalog(tmp_path)
+    database_path = str(tmp_path / "mods.sqlite")
+    pages = [mod.query_mods(limit=2, offset=offset, catalog_url=catalog_url, database_path=database_path) for offset in (0, 2, 4)]
+    assert [[i["name"] for i in page] for page in pages] == [["Alpha", "beta"], ["Delta", "Epsilon"], ["Gamma"]]
+    assert pages[1][1]["game_versions"] == []
+    assert mod.count_mods(catalog_url=catalog_url, database_path=database_path) == 5
+
+
+def test_sync_catalog_only_rebuilds_changed_catalogs(tmp_path):
+    catalog_url = write_catalog(tmp_path)
+    database_path = str(tmp_path / "mods.sqlite")
+    assert mod.sync_catalog(catalog_url, database_path=database_path)
+    assert not mod.sync_catalog(catalog_url, database_path=database_path)
+    write_catalog(tmp_path, {"forge": ["Zeta"], "fabric": []})
+    assert mod.sync_catalog(catalog_url, database_path=database_path)
+    assert [i["name"] for i in mod.query_mods(sync=False, database_path=database_path)] == ["Zeta"]
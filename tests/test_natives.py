@@ -0,0 +1,48 @@
+import hashlib
+import zipfile
+import json
+import os
+
+from cml import natives
+
+
+def make_native_jar(minecraft_directory, name, files):
+    relative = f"org/example/{name}/1/{name}-1-natives.jar"
+    path = os.path.join(minecraft_directory, "libraries", *relative.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with zipfile.ZipFile(path, "w") as zf:
+        for filename, content in files.items():
+            zf.writestr(filename, content)
+    with open(path, "rb") as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+    classifier = {"path": relative, "sha1": sha1}
+    return {
+        "name": f"org.example:{name}:1",
+        "natives": {"linux": "natives", "windows": "natives", "osx": "natives"},
+        "extract": {"exclude": ["META-INF/"]},
+        "downloads": {"classifiers": {"natives": classifier}},
+    }
+
+
+def test_assemble_natives_removes_files_of_old_jars(tmp_path):
+    minecraft_directory = str(tmp_path / "mc")
+    old = make_native_jar(minecraft_directory, "old", {"libold.so": b"old", "old/nested.so": b"nested", "META-INF/MANIFEST.MF": b""})
+    new = make_native_jar(minecraft_directory, "new", {"libnew.so": b"new"})
+    natives_directory = natives.assemble_natives({"id": "test", "libraries": [old]}, minecraft_directory)
+    assert sorted(os.listdir(natives_directory)) == [natives.MARKER_FILENAME, "libold.so", "old"]
+
+    assert natives.assemble_natives({"id": "test", "libraries": [new]}, minecraft_directory) == natives_directory
+    assert sorted(os.listdir(natives_directory)) == [natives.MARKER_FILENAME, "libnew.so"]
+    with open(os.path.join(natives_directory, natives.MARKER_FILENAME), "r", encoding="utf-8") as f:
+        assert [i[3] for i in json.load(f)["jars"]] == [new["downloads"]["classifiers"]["natives"]["sha1"]]
+
+
+def test_assemble_natives_keeps_unknown_files_without_marker(tmp_path):
+    minecraft_directory = str(tmp_path / "mc")
+    natives_directory = str(tmp_path / "natives")
+    os.makedirs(natives_directory)
+    with open(os.path.join(natives_directory, "extracted.so"), "wb") as f:
+        f.write(b"extracted")
+    library = make_native_jar(minecraft_directory, "lib", {"lib.so": b"lib"})
+    natives.assemble_natives({"id": "test", "libraries": [library]}, minecraft_directory, natives_directory)
+    assert sorted(os.listdir(natives_directory)) == [natives.MARKER_FILENAME, "extracted.so", "lib.so"]
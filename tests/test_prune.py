@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import time
+
+import pytest
+
+from cml import prune
+
+OLD = time.time() - 2 * prune.DEFAULT_MIN_AGE
+
+
+def write_file(path, data=b"x", mtime=OLD):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def write_json(path, data):
+    return write_file(path, json.dumps(data).encode("utf-8"))
+
+
+def get_object_path(minecraft_directory, data):
+    sha1 = hashlib.sha1(data).hexdigest()
+    return os.path.join(minecraft_directory, "assets", "objects", sha1[:2], sha1)
+
+
+@pytest.fixture
+def minecraft_directory(tmp_path):
+    """
+    A vanilla version, a forge version that inherits from it and some files that no version needs
+    """
+    path = str(tmp_path / "mc")
+    write_json(os.path.join(path, "versions", "1.20.1", "1.20.1.json"), {
+        "id": "1.20.1",
+        "assetIndex": {"id": "5"},
+        "libraries": [{"name": "org.lwjgl:lwjgl:3.3.1", "downloads": {"artifact": {"path": "org/lwjgl/lwjgl/3.3.1/lwjgl-3.3.1.jar"}}}],
+    })
+    write_json(os.path.join(path, "versions", "1.20.1-forge-47.2.0", "1.20.1-forge-47.2.0.json"), {
+        "id": "1.20.1-forge-47.2.0",
+        "inheritsFrom": "1.20.1",
+        "libraries": [{"name": "net.minecraftforge:fmlcore:1.20.1-47.2.0"}],
+        "arguments": {"game": ["--fml.forgeVersion", "47.2.0", "--fml.mcpVersion", "20230612.114412"]},
+    })
+    write_json(os.path.join(path, "assets", "indexes", "5.json"), {"objects": {"a": {"hash": hashlib.sha1(b"live").hexdigest()}}})
+    write_file(get_object_path(path, b"live"), b"live")
+    for relative in ("org/lwjgl/lwjgl/3.3.1/lwjgl-3.3.1.jar", "net/minecraftforge/fmlcore/1.20.1-47.2.0/fmlcore-1.20.1-47.2.0.jar",
+                     "net/minecraftforge/forge/1.20.1-47.2.0/forge-1.20.1-47.2.0-client.jar", "net/minecraft/client/1.20.1-20230612.114412/client-1.20.1-20230612.114412-srg.jar"):
+        write_file(os.path.join(path, "libraries", *relative.split("/")))
+    return path
+
+
+def get_garbage(path):
+    return sorted([
+        write_file(os.path.join(path, "libraries", "org", "lwjgl", "lwjgl", "3.2.2", "lwjgl-3.2.2.jar")),
+        # Only a substring of the forge version
+        write_file(os.path.join(path, "libraries", "net", "minecraftforge", "forge", "1.20.1-147.2.0", "forge-1.20.1-147.2.0-client.jar")),
+        write_file(get_object_path(path, b"removed"), b"removed"),
+        write_file(os.path.join(path, "libraries", "a.jar.part")),
+    ])
+
+
+def test_dry_run_removes_nothing(minecraft_directory):
+    garbage = get_garbage(minecraft_directory)
+    report = prune.prune(minecraft_directory, dry_run=True, include_temp=False)
+    assert sorted(report["paths"]) == garbage
+    assert report["reclaimable_files"] == len(garbage)
+    assert report["removed_files"] == 0
+    assert all(os.path.isfile(i) for i in garbage)
+
+
+def test_prune_keeps_inherited_and_forge_files(minecraft_directory):
+    garbage = get_garbage(minecraft_directory)
+    report = prune.prune(minecraft_directory, include_temp=False)
+    assert sorted(report["paths"]) == garbage
+    assert report["removed_files"] == len(garbage)
+    assert report["failed"] == []
+    assert not any(os.path.exists(i) for i in garbage)
+    libraries = os.path.join(minecraft_directory, "libraries")
+    remaining = sorted(os.path.relpath(os.path.join(root, i), libraries).replace(os.sep, "/") for root, _, files in os.walk(libraries) for i in files)
+    assert remaining == [
+        "net/minecraft/client/1.20.1-20230612.114412/client-1.20.1-20230612.114412-srg.jar",
+        "net/minecraftforge/fmlcore/1.20.1-47.2.0/fmlcore-1.20.1-47.2.0.jar",
+        "net/minecraftforge/forge/1.20.1-47.2.0/forge-1.20.1-47.2.0-client.jar",
+        "org/lwjgl/lwjgl/3.3.1/lwjgl-3.3.1.jar",
+    ]
+    assert os.path.isfile(get_object_path(minecraft_directory, b"live"))
+    # Empty directories of removed libraries are removed as well
+    assert not os.path.exists(os.path.join(libraries, "org", "lwjgl", "lwjgl", "3.2.2"))
+
+
+def test_young_files_survive(minecraft_directory):
+    young = write_file(os.path.join(minecraft_directory, "libraries", "org", "new", "new", "1", "new-1.jar"), mtime=time.time())
+    report = prune.prune(minecraft_directory, include_temp=False, min_age=600)
+    assert young not in report["paths"]
+    assert os.path.isfile(young)
+    report = prune.prune(minecraft_directory, include_temp=False, min_age=0)
+    assert report["paths"] == [young]
+
+
+def test_missing_asset_index_keeps_assets(minecraft_directory):
+    garbage_object = write_file(get_object_path(minecraft_directory, b"removed"), b"removed")
+    os.remove(os.path.join(minecraft_directory, "assets", "indexes", "5.json"))
+    report = prune.prune(minecraft_directory, include_temp=False)
+    assert report["skipped_categories"] == ["assets"]
+    assert os.path.isfile(garbage_object)
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="Files of another user can only be created as root")
+def test_temp_files_of_other_users_are_skipped(minecraft_directory, tmp_path, monkeypatch):
+    temp_directory = tmp_path / "temp"
+    monkeypatch.setattr(prune.tempfile, "gettempdir", lambda: str(temp_directory))
+    own = write_file(str(temp_directory / "forge-installer-1234.tmp"))
+    other = write_file(str(temp_directory / "fabric-installer-5678.tmp"))
+    os.chown(other, 12345, 12345)
+    unrelated = write_file(str(temp_directory / "something-else.tmp"))
+    report = prune.prune(minecraft_directory, categories=["temp"])
+    assert report["paths"] == [own]
+    assert not os.path.exists(own)
+    assert os.path.isfile(other)
+    assert os.path.isfile(unrelated)
@@ -0,0 +1,113 @@
+import textwrap
+import sys
+import os
+
+import pytest
+
+from cml import java, server
+
+STUB = textwrap.dedent('''
+    import sys
+    import time
+    print("[Server thread/INFO]: Starting minecraft server", flush=True)
+    time.sleep(0.2)
+    print('[Server thread/INFO]: Done (1.234s)! For help, type "help"', flush=True)
+    for line in sys.stdin:
+        command = line.strip()
+        print("command: " + command, flush=True)
+        if command == "stop":
+            print("[Server thread/INFO]: Stopping the server", flush=True)
+            break
+''')
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("CML_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(java, "_index", None)
+
+
+def write_stub(tmp_path, source=STUB):
+    path = tmp_path / "stub.py"
+    path.write_text(source, encoding="utf-8")
+    return [sys.executable, str(path)]
+
+
+def make_java(tmp_path, name, version):
+    """
+    A JDK with a release file and a java executable that runs the stub server
+    """
+    home = tmp_path / name
+    (home / "bin").mkdir(parents=True)
+    (home / "release").write_text(f'JAVA_VERSION="{version}"\nIMPLEMENTOR="Eclipse Adoptium"\nOS_ARCH="amd64"\n', encoding="utf-8")
+    executable = home / "bin" / "java"
+    executable.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{tmp_path / "stub.py"}"\n', encoding="utf-8")
+    executable.chmod(0o755)
+    return str(executable)
+
+
+def test_ready_and_stop(tmp_path):
+    process = server.ServerProcess("1.20.1", write_stub(tmp_path), str(tmp_path))
+    try:
+        assert process.wait_until_ready(30)
+        assert process.is_ready()
+        assert process.reported_startup_time == 1.234
+        assert 0.2 <= process.time_to_ready < 30
+        assert list(process.iter_output(0))[-1].endswith('Done (1.234s)! For help, type "help"')
+        process.send_command("say hi")
+        assert "command: say hi" in process.iter_output(10)
+    finally:
+        assert process.stop(10) == 0
+    assert not process.is_running()
+    assert list(process.iter_output(0))[-2:] == ["command: stop", "[Server thread/INFO]: Stopping the server"]
+
+
+def test_exit_before_ready(tmp_path):
+    process = server.ServerProcess("1.20.1", write_stub(tmp_path, "print('Failed to load eula.txt')"), str(tmp_path))
+    assert not process.wait_until_ready(30)
+    assert process.time_to_ready is None
+    assert process.wait(10) == 0
+    assert process.stop(10) == 0
+
+
+def test_output_keeps_the_newest_lines(tmp_path):
+    process = server.ServerProcess("1.20.1", write_stub(tmp_path, "for i in range(100):\n    print(i)"), str(tmp_path), max_output_lines=10)
+    assert process.wait(10) == 0
+    process._reader.join(10)
+    assert list(process.iter_output(0)) == [str(i) for i in range(90, 100)]
+
+
+def test_stop_kills_a_stuck_server(tmp_path):
+    process = server.ServerProcess("1.20.1", write_stub(tmp_path, "import time\ntime.sleep(60)"), str(tmp_path))
+    assert process.stop(0.5) != 0
+
+
+@pytest.mark.skipif(os.name == "nt", reason="The stub java is a shell script")
+def test_start_server(tmp_path):
+    write_stub(tmp_path)
+    java_path = make_java(tmp_path, "jdk21", "21.0.1")
+    process = server.start_server(str(tmp_path / "mc"), "1.20.1", memory="1G", java=java_path, properties={"online-mode": False})
+    try:
+        assert process.wait_until_ready(30)
+    finally:
+        process.stop(10)
+    server_dir = tmp_path / "mc" / "servers" / "1.20.1"
+    assert (server_dir / "eula.txt").read_text(encoding="utf-8") == "eula=true\n"
+    assert (server_dir / "server.properties").read_text(encoding="utf-8") == "online-mode=false\n"
+    assert process.command[:3] == [java_path, "-Xms1G", "-Xmx1G"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="The stub java is a shell script")
+def test_zgc_needs_java_17(tmp_path):
+    java8 = make_java(tmp_path, "jdk8", "1.8.0_392")
+    java21 = make_java(tmp_path, "jdk21", "21.0.1")
+    command = server.get_server_command(str(tmp_path), "1.20.1", preset="zgc", java=java21)
+    assert "-XX:+UseZGC" in command
+    command = server.get_server_command(str(tmp_path), "1.20.1", preset="zgc", java=java8)
+    assert "-XX:+UseZGC" not in command
+    assert "-XX:+UseG1GC" in command
+
+
+def test_invalid_preset(tmp_path):
+    with pytest.raises(ValueError):
+        server.get_server_command(str(tmp_path), "1.20.1", preset="cms")
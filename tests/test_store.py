@@ -0,0 +1,56 @@
+import hashlib
+import os
+
+import pytest
+
+from cml import store
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("link_mode", store.LINK_MODES)
+def test_collect_garbage_removes_only_orphans(tmp_path, link_mode):
+    store_directory = str(tmp_path / "store")
+    minecraft_directory = str(tmp_path / "mc")
+    store.init_store(store_directory, link_mode)
+    library = b"library " * 100
+    asset = b"asset " * 100
+    asset_sha1 = hashlib.sha1(asset).hexdigest()
+    write(os.path.join(minecraft_directory, "libraries", "a", "a.jar"), library)
+    write(os.path.join(minecraft_directory, "assets", "objects", asset_sha1[:2], asset_sha1), asset)
+    assert store.dedup_directory(store_directory, minecraft_directory)["files"] == 2
+    # An object whose only file is gone
+    orphan = b"orphan " * 100
+    orphan_path = str(tmp_path / "orphan.bin")
+    write(orphan_path, orphan)
+    orphan_sha1 = store.store_file(store_directory, orphan_path)
+    os.remove(orphan_path)
+
+    assert store.collect_garbage(store_directory, dry_run=True) == len(orphan)
+    assert store.has_object(store_directory, orphan_sha1)
+    assert store.collect_garbage(store_directory) == len(orphan)
+    assert not store.has_object(store_directory, orphan_sha1)
+    assert store.has_object(store_directory, hashlib.sha1(library).hexdigest())
+    assert store.has_object(store_directory, asset_sha1)
+    assert read(os.path.join(minecraft_directory, "libraries", "a", "a.jar")) == library
+    assert store.collect_garbage(store_directory) == 0
+
+
+def test_place_link_supports_every_link_mode(tmp_path):
+    source = str(tmp_path / "source")
+    write(source, b"data")
+    for link_mode in store.LINK_MODES:
+        destination = str(tmp_path / link_mode / "file")
+        store.place_link(source, destination, link_mode)
+        assert read(destination) == b"data"
+    assert os.path.samefile(source, str(tmp_path / "hardlink" / "file"))
+    assert os.path.islink(str(tmp_path / "symlink" / "file"))
@@ -0,0 +1,45 @@
+import json
+import os
+
+from cml import natives, verify
+from conftest import DATA, SHA1, get_url, read, write
+
+
+def write_version(minecraft_directory, server):
+    data = {
+        "id": "test",
+        "libraries": [
+            {"name": "org.example:lib:1", "downloads": {"artifact": {"url": get_url(server), "path": "org/example/lib/1/lib-1.jar", "sha1": SHA1, "size": len(DATA)}}},
+            # Without downloads the jar is only guessed from the maven repository
+            {"name": "org.example:guess:1", "url": get_url(server, "/maven/")},
+        ],
+    }
+    os.makedirs(os.path.join(minecraft_directory, "versions", "test"))
+    with open(os.path.join(minecraft_directory, "versions", "test", "test.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    return os.path.join(minecraft_directory, "libraries", "org", "example", "lib", "1", "lib-1.jar")
+
+
+def test_verify_repairs_and_skips_missing_optional_files(tmp_path, server, monkeypatch):
+    minecraft_directory = str(tmp_path / "mc")
+    library_path = write_version(minecraft_directory, server)
+    assembled = []
+    monkeypatch.setattr(natives, "ensure_natives", lambda version, path: assembled.append(version))
+
+    result = verify.verify_and_repair("test", minecraft_directory)
+    assert result["missing"] == [library_path]
+    assert result["skipped"] == [os.path.join(minecraft_directory, "libraries", "org", "example", "guess", "1", "guess-1.jar")]
+    assert result["cached"] == 0
+    assert result["repaired"] == 1
+    assert read(library_path) == DATA
+    assert assembled == ["test"]
+
+    result = verify.verify_and_repair("test", minecraft_directory)
+    assert (result["cached"], result["hashed"], result["missing"], result["broken"]) == (1, 0, [], [])
+    assert assembled == ["test"]
+
+    write(library_path, DATA[:-1] + b"x")
+    result = verify.verify_and_repair("test", minecraft_directory, repair=False)
+    assert result["broken"] == [library_path]
+    assert result["repaired"] == 0
+    assert assembled == ["test"]